@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import database as db
+
+# Bootstrap confidence intervals for Elo ratings. Each resample draws a season's matches
+# with replacement, keeps them in their original order and replays them with the rating
+# rules in elo.rate_match. All resamples in a chunk are replayed together, one match
+# position at a time, as operations on a (resamples, players) array of ratings; the
+# chunks are spread over a process pool. Results are kept per data version, so they are
+# only recomputed after the data changes.
+
+RESAMPLES = 1000
+CONFIDENCE = 0.95
+CHECKPOINTS = 40 # Points along the season at which the intervals are taken, for the graph's bands
+
+_pool = None
+_runner = ThreadPoolExecutor(max_workers=1) # Collects the pool's results off the UI thread
+_requests = {} # (season_id, data version) -> Future of SeasonIntervals
+
+class SeasonIntervals:
+    """
+    Bootstrap intervals for a season's players.
+
+    `low` and `high` are (checkpoints, players) arrays of the interval bounds after
+    `games[i]` of the season's matches (NaN before a player's first game), and `ts`
+    holds the timestamp of the last of those matches. Columns follow `names`.
+    """
+
+    def __init__(self, names, games, ts, low, high):
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+        self.games = games
+        self.ts = ts
+        self.low = low
+        self.high = high
+
+    def final(self, name):
+        """Returns (low, high) of a player's rating at the end of the season, or None."""
+        code = self.codes.get(name)
+        if code is None or np.isnan(self.low[-1, code]):
+            return None
+        return self.low[-1, code], self.high[-1, code]
+
+def replay_resamples(teams, winner, k_factors, games_before, order, checkpoints):
+    """
+    Replays resampled match orders and takes every resample's ratings at each checkpoint.
+    Args:
+        teams: (4, n) array of player codes (player1, player1b, player2, player2b), -1 where empty.
+        winner: (n,) array of 1 or 2.
+        k_factors: (k_factor, k_new_player, games_new_player).
+        games_before: (players,) array of lifetime games before the season.
+        order: (resamples, n) array of match indices, sorted along each row.
+        checkpoints: Match counts to take the ratings after.
+    Returns:
+        (checkpoints, resamples, players) array of ratings, NaN where the player hadn't played yet.
+    """
+    k_factor, k_new_player, games_new_player = k_factors
+    count, n = order.shape
+    rows = np.arange(count)
+    ratings = np.full((count, len(games_before)), float(db.INITIAL_ELO))
+    games = np.tile(games_before, (count, 1))
+    snapshots = np.full((len(checkpoints), count, len(games_before)), np.nan)
+
+    # Step at which each resample passes each checkpoint, found with one searchsorted
+    # over all rows by offsetting each row's indices past the previous row's
+    offsets = rows[:, None] * n
+    passed = np.searchsorted((order + offsets).ravel(), checkpoints[None, :] + offsets) - offsets
+    events = np.argsort(passed.ravel(), kind='stable')
+    bounds = np.searchsorted(passed.ravel()[events], np.arange(n + 2))
+
+    # Winners first; in singles the partner columns repeat the player, so every update
+    # below writes the same value twice instead of needing a mask
+    winner_first = winner == 1
+    win_a = np.where(winner_first, teams[0], teams[2])
+    win_b = np.where(winner_first, teams[1], teams[3])
+    lose_a = np.where(winner_first, teams[2], teams[0])
+    lose_b = np.where(winner_first, teams[3], teams[1])
+    doubles = win_b >= 0
+    win_b = np.where(doubles, win_b, win_a)
+    lose_b = np.where(lose_b >= 0, lose_b, lose_a)
+
+    def snapshot(step):
+        event = events[bounds[step]:bounds[step + 1]]
+        if len(event):
+            b, c = np.divmod(event, len(checkpoints))
+            snapshots[c, b] = np.where(games[b] > games_before, ratings[b], np.nan)
+
+    for step in range(n):
+        snapshot(step)
+        m = order[:, step]
+        wa, wb, la, lb = win_a[m], win_b[m], lose_a[m], lose_b[m]
+        ra, rb, rc, rd = ratings[rows, wa], ratings[rows, wb], ratings[rows, la], ratings[rows, lb]
+        ga, gb, gc, gd = games[rows, wa], games[rows, wb], games[rows, la], games[rows, lb]
+        # The highest K-factor of the four players, as in elo.rate_match
+        any_new = np.minimum(np.minimum(ga, gb), np.minimum(gc, gd)) < games_new_player
+        any_established = np.maximum(np.maximum(ga, gb), np.maximum(gc, gd)) >= games_new_player
+        k = np.where(any_new, np.where(any_established, max(k_new_player, k_factor), k_new_player), k_factor)
+
+        winner_avg = (ra + rb) / 2
+        loser_avg = (rc + rd) / 2
+        winner_new = np.round(winner_avg + k * (1 - 1 / (1 + 10 ** ((loser_avg - winner_avg) / 400))))
+        loser_new = np.round(loser_avg - k / (1 + 10 ** ((winner_avg - loser_avg) / 400)))
+        # Doubles members each get the team's rounded change; in singles this is exact
+        winner_diff = np.round(winner_new - winner_avg)
+        loser_diff = np.round(loser_new - loser_avg)
+        ratings[rows, wa] = ra + winner_diff
+        ratings[rows, wb] = rb + winner_diff
+        ratings[rows, la] = rc + loser_diff
+        ratings[rows, lb] = rd + loser_diff
+        games[rows, wa] = ga + 1
+        games[rows, wb] = gb + 1
+        games[rows, la] = gc + 1
+        games[rows, lb] = gd + 1
+    snapshot(n)
+    return snapshots
+
+def _bootstrap_chunk(teams, winner, k_factors, games_before, count, seed, checkpoints):
+    # Runs in a pool worker: draws count resamples and replays them
+    rng = np.random.default_rng(seed)
+    n = teams.shape[1]
+    order = np.sort(rng.integers(0, n, size=(count, n)), axis=1)
+    return replay_resamples(teams, winner, k_factors, games_before, order, checkpoints)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Workers are started fresh rather than forked from the Tk process
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def bootstrap(teams, winner, k_factors, games_before, resamples=RESAMPLES, checkpoints=None, seed=None, workers=None):
+    """
+    Replays resamples of a season's matches over the process pool.
+    Returns (checkpoints, low, high), the CONFIDENCE interval bounds at each checkpoint.
+    """
+    n = teams.shape[1]
+    if checkpoints is None:
+        checkpoints = np.unique(np.linspace(1, n, min(CHECKPOINTS, n)).round().astype(np.int64))
+    workers = workers or os.cpu_count() or 1
+    sizes = [len(part) for part in np.array_split(np.arange(resamples), workers) if len(part)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if len(sizes) == 1:
+        parts = [_bootstrap_chunk(teams, winner, k_factors, games_before, sizes[0], seeds[0], checkpoints)]
+    else:
+        pool = _get_pool()
+        futures = [
+            pool.submit(_bootstrap_chunk, teams, winner, k_factors, games_before, size, chunk_seed, checkpoints)
+            for size, chunk_seed in zip(sizes, seeds)
+        ]
+        parts = [future.result() for future in futures]
+    ratings = np.concatenate(parts, axis=1)
+
+    tail = (1 - CONFIDENCE) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # All-NaN before a player's first game
+        low, high = np.nanpercentile(ratings, [tail, 100 - tail], axis=1)
+    return checkpoints, low, high
+
+def _season_inputs(season_id):
+    # Reads what a replay of the season needs (on the calling thread, through the read cache)
+    matches = db.get_match_columns(season_id)
+    rated = np.isin(matches.winner, (1, 2))
+    teams = matches.players()[:, rated]
+    games_before = db.get_games_before_season(season_id)
+    games = np.array([games_before.get(name, 0) for name in matches.names], dtype=np.int64)
+    params = db.get_season_rating_params(season_id)
+    return matches.names, matches.ts[rated], teams, matches.winner[rated], tuple(params), games
+
+def _compute_intervals(season_id, names, ts, teams, winner, k_factors, games_before):
+    checkpoints, low, high = bootstrap(teams, winner, k_factors, games_before, seed=season_id)
+    return SeasonIntervals(names, checkpoints, ts[checkpoints - 1], low, high)
+
+def request_intervals(season_id):
+    """
+    Returns a Future of the season's SeasonIntervals for the current data, starting the
+    computation in the background if it hasn't been requested since the data last changed.
+    The result is None for a season with no matches.
+    """
+    key = (season_id, db.get_data_version())
+    future = _requests.get(key)
+    if future is None:
+        for old_key in [k for k in _requests if k[1] != key[1]]:
+            del _requests[old_key]
+        names, ts, teams, winner, k_factors, games_before = _season_inputs(season_id)
+        if not len(ts):
+            future = _runner.submit(lambda: None)
+        else:
+            future = _runner.submit(_compute_intervals, season_id, names, ts, teams, winner, k_factors, games_before)
+        _requests[key] = future
+    return future
+
+def season_intervals(season_id):
+    """Blocking version of request_intervals."""
+    return request_intervals(season_id).result()
@@ -1,12 +1,31 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+import functools
 import os
+import pathlib
+import re
 import shutil
+import time
+import json
+import uuid
 from tkinter import messagebox
+import numpy as np
+import metrics
+from elo import RatingParams, DEFAULT_PARAMS, rate_match
 
 DB_FILE = "elo_tracker.db"
+DEFAULT_VENUE = "Default" # The default venue uses DB_FILE above
+VENUES_DIR = "venues" # Other venues each have their own DB file in here
 INITIAL_ELO = 1200
-DB_VERSION = 2
+DB_VERSION = 12
+ARCHIVE_DIR = "archive" # Cold-season archive files, relative to the DB file
+READ_CACHE_SIZE = 128 # Max number of cached read query results
+JOURNAL_FILE = "journal.jsonl" # Append-only copy of the oplog, kept in the backup directory
+FORM_GAMES = 10 # Number of recent games the leaderboard's form columns cover
+BUSY_TIMEOUT = 15 # Seconds a connection waits for another process's lock before "database is locked"
 
 # --- Database Initialization ---
 
@@ -19,15 +38,7 @@ def init_db():
         # Check database schema version
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM dbinfo WHERE key = 'version'")
-            row = cursor.fetchone()
-            if row:
-                current_version = int(row['value'])
-            else:
-                current_version = 0
-        except:
-            current_version = 0 # dbinfo table doesn't exist
+            current_version = read_db_version(conn)
         finally:
             conn.close()
         if current_version != DB_VERSION:
@@ -57,6 +68,7 @@ def create_new_db():
             )
         """)
         cursor.execute("INSERT INTO dbinfo (key, value) VALUES (?, ?)", ("version", str(DB_VERSION)))
+        cursor.execute("INSERT INTO dbinfo (key, value) VALUES (?, ?)", ("install_id", uuid.uuid4().hex))
         
         # Seasons Table: Stores the name of each season
         cursor.execute("""
@@ -100,24 +112,348 @@ def create_new_db():
                 player2b_elo_before INTEGER,
                 player2b_elo_after INTEGER,
                 winner INTEGER NOT NULL,
+                ts INTEGER,
+                FOREIGN KEY (season_id) REFERENCES seasons (id)
+            )
+        """)
+        # ts orders matches strictly (with id breaking ties) and serves date range queries
+        cursor.execute("CREATE INDEX idx_matches_ts ON matches (ts, id)")
+        cursor.execute("CREATE INDEX idx_matches_season_ts ON matches (season_id, ts, id)")
+
+        # Season Rating Params Table: The K-factor rules each season is rated with
+        cursor.execute("""
+            CREATE TABLE season_rating_params (
+                season_id INTEGER PRIMARY KEY,
+                k_factor INTEGER NOT NULL,
+                k_new_player INTEGER NOT NULL,
+                games_new_player INTEGER NOT NULL,
+                FOREIGN KEY (season_id) REFERENCES seasons (id)
+            )
+        """)
+
+        # Player Timeline Table: One row per player per match, clustered by player so a
+        # player's whole career can be read with a single range scan. Rows are ordered by
+        # (ts, match_id) like matches, as synced matches get ids out of play order
+        cursor.execute("""
+            CREATE TABLE player_timeline (
+                player_name TEXT NOT NULL,
+                match_id INTEGER NOT NULL,
+                season_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                ts INTEGER,
+                elo_before INTEGER,
+                elo_after INTEGER,
+                won BOOLEAN NOT NULL,
+                partner_name TEXT,
+                opponent1_name TEXT NOT NULL,
+                opponent2_name TEXT,
+                PRIMARY KEY (player_name, match_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX idx_player_timeline_season ON player_timeline (season_id, player_name, ts, match_id)")
+        cursor.execute("CREATE INDEX idx_player_timeline_ts ON player_timeline (player_name, ts, match_id)")
+        cursor.execute("CREATE INDEX idx_player_timeline_match ON player_timeline (match_id)")
+
+        # Operation Log Table: Append-only record of every write, exchanged by sync.py.
+        # match_id is the local id of the match a record_match op created
+        cursor.execute("""
+            CREATE TABLE oplog (
+                op_id TEXT PRIMARY KEY,
+                origin TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                ts TEXT NOT NULL,
+                op TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                match_id INTEGER
+            )
+        """)
+        cursor.execute("CREATE INDEX idx_oplog_match ON oplog (match_id)")
+        # Legacy ops (logged by the v7 migration) reuse table ids as seq, so they are left out
+        cursor.execute("CREATE UNIQUE INDEX idx_oplog_origin_seq ON oplog (origin, seq) WHERE origin <> 'legacy'")
+
+        # Tournament Tables: Brackets played within a season (see tournament.py).
+        # In tournament_matches a NULL player is not known yet and '' is a bye
+        cursor.execute("""
+            CREATE TABLE tournaments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                season_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                format TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                finished_at TEXT,
+                FOREIGN KEY (season_id) REFERENCES seasons (id)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE tournament_players (
+                tournament_id INTEGER NOT NULL,
+                seed INTEGER NOT NULL,
+                player_name TEXT NOT NULL,
+                PRIMARY KEY (tournament_id, seed)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE tournament_matches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tournament_id INTEGER NOT NULL,
+                bracket TEXT NOT NULL,
+                round INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                player1_name TEXT,
+                player2_name TEXT,
+                winner INTEGER,
+                match_id INTEGER,
+                winner_to INTEGER,
+                winner_to_slot INTEGER,
+                loser_to INTEGER,
+                loser_to_slot INTEGER
+            )
+        """)
+        cursor.execute("CREATE INDEX idx_tournament_matches ON tournament_matches (tournament_id, bracket, round, slot)")
+
+        # Activity Rollup Tables: Per-player games, wins and Elo gained per day and per ISO
+        # week, and matches per day, for each season (see update_rollups)
+        cursor.execute("""
+            CREATE TABLE player_daily_stats (
+                season_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                player_name TEXT NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                elo_delta INTEGER NOT NULL,
+                PRIMARY KEY (season_id, day, player_name)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE player_weekly_stats (
+                season_id INTEGER NOT NULL,
+                week TEXT NOT NULL,
+                player_name TEXT NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                elo_delta INTEGER NOT NULL,
+                PRIMARY KEY (season_id, week, player_name)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE season_daily_stats (
+                season_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                matches INTEGER NOT NULL,
+                PRIMARY KEY (season_id, day)
+            ) WITHOUT ROWID
+        """)
+
+        # Archived Seasons Table: Completed seasons whose matches were moved to an archive file
+        cursor.execute("""
+            CREATE TABLE archived_seasons (
+                season_id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                match_count INTEGER NOT NULL,
+                archived_at TEXT NOT NULL,
                 FOREIGN KEY (season_id) REFERENCES seasons (id)
             )
         """)
         
         conn.commit()
+        mark_data_changed()
         print("Database tables created.")
     finally:
         conn.close()
 
 def get_db_connection():
-    """Returns a database connection object."""
-    conn = sqlite3.connect(DB_FILE)
+    """Returns a database connection object (read-only after set_read_only())."""
+    if _read_only:
+        conn = sqlite3.connect(f"{pathlib.Path(DB_FILE).resolve().as_uri()}?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+    else:
+        conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
     # Allows accessing columns by name (e.g., row['name'])
     conn.row_factory = sqlite3.Row
     return conn
 
+# --- Read Cache ---
+# Read queries are memoized until the data changes. Every write in this module bumps
+# _data_version, and the DB file's size/mtime are part of the version too, so writes
+# made by another process (or another copy of the app) also invalidate the cache.
+# Cached results are shared between callers and must be treated as read-only.
+
+_data_version = 0
+
+class ReadCache:
+    """A bounded LRU cache of query results, cleared whenever the data version changes."""
+
+    def __init__(self, maxsize=READ_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, key, version):
+        """Returns (True, value) on a hit, (False, None) on a miss."""
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, self.entries[key]
+        self.misses += 1
+        return False, None
+
+    def store(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.version = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+_read_cache = ReadCache()
+
+def get_data_version():
+    """
+    Returns a token that changes whenever the database contents change,
+    either through this module or through another process writing to DB_FILE.
+    """
+    try:
+        st = os.stat(DB_FILE)
+        file_state = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        file_state = None
+    return (_data_version, DB_FILE, file_state)
+
+def mark_data_changed():
+    # Called by every write function after it commits. Writes that append ops also call
+    # flush_journal afterwards
+    global _data_version
+    _data_version += 1
+
+def cached_read(func):
+    """Decorator that memoizes a read query function in the shared read cache."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        found, value = _read_cache.lookup(key, get_data_version())
+        if found:
+            return value
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        metrics.DB_CALL_SECONDS.observe(time.perf_counter() - start, function=func.__name__)
+        _read_cache.store(key, value)
+        return value
+    wrapper.uncached = func
+    return wrapper
+
+metrics.Gauge("elo_db_file_bytes", "Size of the selected venue's database file.",
+              lambda: os.path.getsize(DB_FILE) if os.path.exists(DB_FILE) else None)
+metrics.Gauge("elo_read_cache_hit_ratio", "Fraction of read queries served from the read cache.",
+              lambda: _read_cache.stats()['hit_rate'])
+
+def get_cache_stats():
+    """Returns hit/miss statistics for the read cache."""
+    return _read_cache.stats()
+
+def clear_read_cache():
+    _read_cache.clear()
+
+# --- Read-only Access ---
+# Display-only instances (main.py --kiosk) open the DB read-only, so they never take a
+# write lock, and watch for commits by other processes with PRAGMA data_version on one
+# long-lived connection. That only reads the page cache's change counter, so polling it
+# every few seconds costs next to nothing.
+
+_read_only = False
+
+def set_read_only(read_only=True):
+    """Makes get_db_connection open DB_FILE read-only."""
+    global _read_only
+    _read_only = read_only
+
+class ChangeWatcher:
+    """Detects commits made to DB_FILE by other connections."""
+
+    def __init__(self):
+        self.conn = None
+        self.db_file = None
+        self.version = None
+
+    def changed(self):
+        """Returns True on the first call and whenever another connection has committed since the last call."""
+        global _data_version
+        if self.db_file != DB_FILE:
+            self.close()
+            self.conn = get_db_connection()
+            self.db_file = DB_FILE
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version:
+            return False
+        self.version = version
+        # The file's mtime can miss quick successive writes, so drop cached reads too
+        _data_version += 1
+        return True
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+        self.conn = None
+        self.db_file = None
+        self.version = None
+
+# --- Operation Log ---
+# Every write appends an op to the oplog table so separate installs can exchange and merge
+# their histories (see sync.py). Op ids are "<install id>:<seq>", so they are unique across
+# installs and stable once written. Ops name seasons and players rather than using row ids,
+# which differ between installs.
+
+def get_install_id(conn):
+    """Returns this database's install id, which identifies the ops it created."""
+    return conn.execute("SELECT value FROM dbinfo WHERE key = 'install_id'").fetchone()[0]
+
+def append_op(conn, op, payload, ts=None, match_id=None):
+    """
+    Appends an operation to the oplog, inside the caller's transaction.
+    Args:
+        op (str): Operation name, e.g. 'record_match'.
+        payload (dict): JSON-serializable arguments of the operation.
+        ts (str, optional): ISO timestamp of the operation. Defaults to now.
+        match_id (int, optional): Local id of the match the operation created.
+    Returns:
+        str: The new op id.
+    """
+    origin = get_install_id(conn)
+    # The origin <> 'legacy' term lets SQLite use the partial index idx_oplog_origin_seq
+    seq = conn.execute("""
+        SELECT COALESCE(MAX(seq), 0) + 1 FROM oplog WHERE origin = ? AND origin <> 'legacy'
+    """, (origin,)).fetchone()[0]
+    op_id = f"{origin}:{seq}"
+    conn.execute("""
+        INSERT INTO oplog (op_id, origin, seq, ts, op, payload, match_id) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (op_id, origin, seq, ts or datetime.now().isoformat(), op, json.dumps(payload), match_id))
+    return op_id
+
 # --- Season Management ---
 
+@metrics.timed(metrics.DB_CALL_SECONDS)
 def start_new_season(name):
     """
     Creates a new season and resets all player stats for the new season.
@@ -126,11 +462,15 @@ def start_new_season(name):
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
+        # The new season keeps the rating rules of the previous one
+        previous = conn.execute("SELECT id FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+        params = read_season_rating_params(conn, previous['id']) if previous else DEFAULT_PARAMS
+
         # 1. Add the new season to the seasons table
-        cursor.execute(
-            "INSERT INTO seasons (name, created_at) VALUES (?, ?)",
-            (name, datetime.now().isoformat())
-        )
+        created_at = datetime.now().isoformat()
+        cursor.execute("INSERT INTO seasons (name, created_at) VALUES (?, ?)", (name, created_at))
+        write_season_rating_params(conn, cursor.lastrowid, params)
+        append_op(conn, 'start_new_season', {'name': name}, ts=created_at)
         print(f"Started new season: '{name}'")
         
         # 2. Reset stats for all existing players
@@ -142,9 +482,12 @@ def start_new_season(name):
         """, (INITIAL_ELO,))
         
         conn.commit()
+        mark_data_changed()
+        flush_journal()
     finally:
         conn.close()
 
+@cached_read
 def get_seasons():
     """Returns a list of all seasons, most recent first."""
     conn = get_db_connection()
@@ -154,6 +497,7 @@ def get_seasons():
     finally:
         conn.close()
 
+@cached_read
 def get_current_season():
     """Returns the most recent season record."""
     conn = get_db_connection()
@@ -164,8 +508,48 @@ def get_current_season():
     finally:
         conn.close()
 
+def read_season_rating_params(conn, season_id):
+    row = conn.execute("""
+        SELECT k_factor, k_new_player, games_new_player FROM season_rating_params WHERE season_id = ?
+    """, (season_id,)).fetchone()
+    return RatingParams(*row) if row else DEFAULT_PARAMS
+
+def write_season_rating_params(conn, season_id, params):
+    conn.execute("""
+        INSERT OR REPLACE INTO season_rating_params (season_id, k_factor, k_new_player, games_new_player)
+        VALUES (?, ?, ?, ?)
+    """, (season_id, *params))
+
+@cached_read
+def get_season_rating_params(season_id):
+    """Returns the RatingParams for a season (the defaults if none were stored)."""
+    conn = get_db_connection()
+    try:
+        return read_season_rating_params(conn, season_id)
+    finally:
+        conn.close()
+
+def log_season_rating_params(conn, season_id, params, rerated):
+    """Appends a set_rating_params op. rerated says whether the season's matches were re-rated with them."""
+    season_name = conn.execute("SELECT name FROM seasons WHERE id = ?", (season_id,)).fetchone()[0]
+    append_op(conn, 'set_rating_params', {'season': season_name, **params._asdict(), 'rerated': rerated})
+
+@metrics.timed(metrics.DB_CALL_SECONDS)
+def set_season_rating_params(season_id, params):
+    """Stores the rating params for a season. Existing matches are not re-rated."""
+    conn = get_db_connection()
+    try:
+        write_season_rating_params(conn, season_id, params)
+        log_season_rating_params(conn, season_id, params, rerated=False)
+        conn.commit()
+        mark_data_changed()
+        flush_journal()
+    finally:
+        conn.close()
+
 # --- Player Management ---
 
+@cached_read
 def get_leaderboard_players():
     """Returns a list of all players with their current season stats, sorted by Elo."""
     conn = get_db_connection()
@@ -180,24 +564,74 @@ def get_leaderboard_players():
     finally:
         conn.close()
 
+@cached_read
+def get_player_ratings():
+    """Returns {name: (current_elo, total_lifetime_games)} for every player, archived included."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT name, current_elo, total_lifetime_games FROM players").fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+    finally:
+        conn.close()
+
+@cached_read
 def get_all_player_names(season_id=None):
     # Returns a simple list of all player names in a season, if no season specified, all players (including archived)
     conn = get_db_connection()
     try:
         if season_id is not None:
             # Select all unique player names from matches in the given season
-            names = conn.execute("""
-                SELECT DISTINCT p.name FROM players p
-                JOIN matches m ON (p.name = m.player1_name OR p.name = m.player2_name)
-                WHERE m.season_id = ? AND p.archive = 0
-                ORDER BY p.name
-            """, (season_id,)).fetchall()
+            with season_matches_table(conn, season_id) as matches_table:
+                names = conn.execute(f"""
+                    SELECT DISTINCT p.name FROM players p
+                    JOIN {matches_table} m ON (p.name = m.player1_name OR p.name = m.player2_name)
+                    WHERE m.season_id = ? AND p.archive = 0
+                    ORDER BY p.name
+                """, (season_id,)).fetchall()
         else:
             names = conn.execute("SELECT name FROM players ORDER BY name").fetchall()
         return [row['name'] for row in names]
     finally:
         conn.close()
 
+@cached_read
+def get_player_list_version():
+    """
+    Returns a token that changes when the set of players (or their archive flags) changes,
+    including changes made by another process. Player ids are never reused and players
+    are never unarchived, so the count, highest id and number archived are enough.
+    """
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT COUNT(*), MAX(id), SUM(archive) FROM players").fetchone()
+        return (DB_FILE, *row)
+    finally:
+        conn.close()
+
+@cached_read
+def get_player_activity():
+    """
+    Returns every player (including archived) with their archive flag and the date
+    of their most recent match in the live database, or None if they haven't played.
+    """
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT p.name, p.archive, MAX(m.date) AS last_played
+            FROM players p
+            LEFT JOIN (
+                SELECT player1_name AS name, date FROM matches
+                UNION ALL SELECT player2_name, date FROM matches
+                UNION ALL SELECT player1b_name, date FROM matches WHERE player1b_name IS NOT NULL
+                UNION ALL SELECT player2b_name, date FROM matches WHERE player2b_name IS NOT NULL
+            ) m ON m.name = p.name
+            GROUP BY p.name
+        """).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+@cached_read
 def get_player_by_name(name):
     """Fetches a single player's full record by name."""
     conn = get_db_connection()
@@ -207,6 +641,7 @@ def get_player_by_name(name):
     finally:
         conn.close()
 
+@metrics.timed(metrics.DB_CALL_SECONDS)
 def add_player(name):
     """Adds a new player to the database with initial stats."""
     if get_player_by_name(name):
@@ -218,25 +653,39 @@ def add_player(name):
             INSERT INTO players (name, current_elo, current_wins, current_losses, total_lifetime_games)
             VALUES (?, ?, 0, 0, 0)
         """, (name, INITIAL_ELO))
+        append_op(conn, 'add_player', {'name': name})
         conn.commit()
+        mark_data_changed()
+        flush_journal()
         print(f"Player {name} added")
     finally:
         conn.close()
 
+@metrics.timed(metrics.DB_CALL_SECONDS)
 def delete_player(name):
     #Deletes a player and all their associated matches from the database
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        # Delete matches involving the player
-        cursor.execute("DELETE FROM matches WHERE player1_name = ? OR player2_name = ?", (name, name))
-        # Delete the player record
-        cursor.execute("DELETE FROM players WHERE name = ?", (name,))
-        conn.commit()
+        # Delete matches involving the player, including those in archive files, all in
+        # one transaction committed before the archives are detached
+        with attached_matches_tables(conn) as matches_tables:
+            for matches_table in matches_tables:
+                delete_timeline_rows(
+                    conn, f"match_id IN (SELECT id FROM {matches_table} WHERE player1_name = ? OR player2_name = ?)", (name, name)
+                )
+                cursor.execute(f"DELETE FROM {matches_table} WHERE player1_name = ? OR player2_name = ?", (name, name))
+            # Delete the player record
+            cursor.execute("DELETE FROM players WHERE name = ?", (name,))
+            append_op(conn, 'delete_player', {'name': name})
+            conn.commit()
+        mark_data_changed()
+        flush_journal()
         print(f"Player {name} deleted")
     finally:
         conn.close()
 
+@metrics.timed(metrics.DB_CALL_SECONDS)
 def archive_player(name):
     """Archives a player, preventing them from appearing in active lists."""
     conn = get_db_connection()
@@ -244,97 +693,741 @@ def archive_player(name):
         cursor = conn.cursor()
         # Set the archive flag to true
         cursor.execute("UPDATE players SET archive = 1 WHERE name = ?", (name,))
+        append_op(conn, 'archive_player', {'name': name})
         conn.commit()
+        mark_data_changed()
+        flush_journal()
         print(f"Payer {name} archived")
     finally:
         conn.close()
 
 # --- Match Management ---
 
-def record_match(season_id, p1_name, p2_name, winner_int, elo_changes,
-                 doubles_match=False, p1b_name=None, p2b_name=None,
-                 p1b_elo_before=None, p1b_elo_after=None,
-                 p2b_elo_before=None, p2b_elo_after=None):
+def insert_match(conn, season_id, season_name, names, elos, winner_int, doubles_match):
     """
-    Records a match and updates player stats in a single transaction.
-    Supports new schema: winner_int (1 or 2), new ELO columns, doubles fields.
+    Inserts a match with its timeline rows and oplog entry, inside the caller's transaction.
+    Args:
+        names: (player1, player1b, player2, player2b), None for empty doubles slots.
+        elos: (elo_before, elo_after) for each slot, (None, None) for empty slots.
+    Returns:
+        int: The new match id.
     """
-    loser_name = p2_name if winner_int == 1 else p1_name
-    winner_name = p1_name if winner_int == 1 else p2_name
-    winner_data = elo_changes[winner_name]
-    loser_data = elo_changes[loser_name]
+    date = datetime.now().isoformat()
+    cursor = conn.execute("""
+        INSERT INTO matches (
+            season_id, date, doubles_match,
+            player1_name, player1b_name, player2_name, player2b_name,
+            player1_elo_before, player1_elo_after, player1b_elo_before, player1b_elo_after,
+            player2_elo_before, player2_elo_after, player2b_elo_before, player2b_elo_after,
+            winner, ts
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (season_id, date, int(doubles_match), *names, *elos[0], *elos[1], *elos[2], *elos[3], winner_int, to_ts(date)))
+    match_id = cursor.lastrowid
+    insert_timeline_rows(conn, "matches", "id = ?", (match_id,))
+    p1_name, p1b_name, p2_name, p2b_name = names
+    append_op(conn, 'record_match', {
+        'season': season_name, 'date': date, 'doubles': int(doubles_match),
+        'player1': p1_name, 'player1b': p1b_name, 'player2': p2_name, 'player2b': p2b_name,
+        'winner': winner_int,
+    }, ts=date, match_id=match_id)
+    return match_id
+
+# A match result to record. winner is 1 or 2; player1b/player2b are only set for doubles
+MatchResult = namedtuple('MatchResult', ['player1', 'player2', 'winner', 'player1b', 'player2b'], defaults=(None, None))
 
+@metrics.timed(metrics.DB_CALL_SECONDS)
+def record_results(results):
+    """
+    Rates and records a batch of matches (one or a whole league night) in the current
+    season, in one transaction.
+    Ratings are read after taking the write lock, so two devices recording at once can't
+    both rate from the same stale Elo, and each match is rated from the one before it.
+    Args:
+        results: List of MatchResult, oldest first.
+    Returns:
+        A list with a dict per result: 'match_id', 'k', 'winners' and 'losers' (lists of
+        names) and 'elo' ({name: (elo_before, elo_after)}).
+    Raises:
+        ValueError: If a result is invalid. Nothing is recorded.
+    """
     conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        # Use a transaction to ensure data integrity
-        cursor.execute("BEGIN TRANSACTION")
-
-        # 1. Insert the match record
-        cursor.execute("""
-            INSERT INTO matches (
-                season_id, date, doubles_match,
-                player1_name, player1b_name, player2_name, player2b_name,
-                player1_elo_before, player1_elo_after, player1b_elo_before, player1b_elo_after,
-                player2_elo_before, player2_elo_after, player2b_elo_before, player2b_elo_after,
-                winner
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            season_id, datetime.now().isoformat(), int(doubles_match),
-            p1_name, p1b_name, p2_name, p2b_name,
-            winner_data['elo_before'] if winner_int == 1 else loser_data['elo_before'],
-            winner_data['elo_after'] if winner_int == 1 else loser_data['elo_after'],
-            p1b_elo_before, p1b_elo_after,
-            loser_data['elo_before'] if winner_int == 1 else winner_data['elo_before'],
-            loser_data['elo_after'] if winner_int == 1 else winner_data['elo_after'],
-            p2b_elo_before, p2b_elo_after,
-            winner_int
-        ))
-
-        # Update winner's stats
-        cursor.execute("""
-            UPDATE players SET current_elo = ?, current_wins = ?, total_lifetime_games = ?
-            WHERE name = ?
-        """, (
-            winner_data['elo_after'], winner_data.get('wins_after', 0),
-            winner_data.get('lifetime_games_after', 0), winner_name
-        ))
-
-        # Update loser's stats
-        cursor.execute("""
-            UPDATE players SET current_elo = ?, current_losses = ?, total_lifetime_games = ?
-            WHERE name = ?
-        """, (
-            loser_data['elo_after'], loser_data.get('losses_after', 0),
-            loser_data.get('lifetime_games_after', 0), loser_name
-        ))
-
+        # IMMEDIATE takes the write lock now, before the ratings are read
+        conn.execute("BEGIN IMMEDIATE")
+        recorded = apply_results(conn, results)
         conn.commit()
-    except Exception as e:
-        print(f"Database error: {e}")
+    except Exception:
         conn.rollback()
+        raise
     finally:
         conn.close()
+    mark_data_changed()
+    flush_journal()
+    metrics.MATCHES_RECORDED.inc(len(recorded))
+    return recorded
+
+def apply_results(conn, results):
+    """
+    The body of record_results, for callers that record other changes in the same
+    transaction. The caller begins (BEGIN IMMEDIATE) and commits the transaction, and
+    calls mark_data_changed afterwards.
+    """
+    season = conn.execute("SELECT id, name FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+    if not season:
+        raise ValueError("No active season found. Please start a new season from the Admin tab.")
+    params = read_season_rating_params(conn, season['id'])
+
+    names = {name for result in results for name in result if isinstance(name, str)}
+    players = {
+        row['name']: dict(row) for row in conn.execute(f"""
+            SELECT name, current_elo, current_wins, current_losses, total_lifetime_games
+            FROM players WHERE name IN ({', '.join('?' * len(names))})
+        """, tuple(names)).fetchall()
+    }
+
+    recorded = []
+    for result in results:
+        team1 = [name for name in (result.player1, result.player1b) if name]
+        team2 = [name for name in (result.player2, result.player2b) if name]
+        for name in team1 + team2:
+            if name not in players:
+                raise ValueError(f"Unknown player: {name}")
+        if len(set(team1 + team2)) < len(team1 + team2) or len(team1) != len(team2):
+            raise ValueError(f"Invalid teams: {' & '.join(team1)} vs {' & '.join(team2)}")
+        if result.winner not in (1, 2):
+            raise ValueError(f"Invalid winner for {' & '.join(team1)} vs {' & '.join(team2)}")
+
+        winners, losers = (team1, team2) if result.winner == 1 else (team2, team1)
+        k, winner_elos, loser_elos = rate_match(
+            [(players[name]['current_elo'], players[name]['total_lifetime_games']) for name in winners],
+            [(players[name]['current_elo'], players[name]['total_lifetime_games']) for name in losers],
+            params
+        )
+        elo = {name: (players[name]['current_elo'], after) for name, after in zip(winners, winner_elos)}
+        elo.update({name: (players[name]['current_elo'], after) for name, after in zip(losers, loser_elos)})
+
+        slots = (result.player1, result.player1b, result.player2, result.player2b)
+        match_id = insert_match(
+            conn, season['id'], season['name'], slots,
+            [elo.get(name, (None, None)) for name in slots],
+            result.winner, len(team1) > 1
+        )
+        for name in winners + losers:
+            player = players[name]
+            player['current_elo'] = elo[name][1]
+            player['current_wins' if name in winners else 'current_losses'] += 1
+            player['total_lifetime_games'] += 1
+        recorded.append({'match_id': match_id, 'k': k, 'winners': winners, 'losers': losers, 'elo': elo})
 
+    conn.executemany("""
+        UPDATE players SET current_elo = ?, current_wins = ?, current_losses = ?, total_lifetime_games = ?
+        WHERE name = ?
+    """, [
+        (p['current_elo'], p['current_wins'], p['current_losses'], p['total_lifetime_games'], p['name'])
+        for p in players.values()
+    ])
+    return recorded
+
+@cached_read
 def get_matches_for_season(season_id):
     """Returns all match records for a specific season, oldest first."""
     conn = get_db_connection()
     try:
-        matches = conn.execute(
-            "SELECT * FROM matches WHERE season_id = ? ORDER BY date ASC",
-            (season_id,)
-        ).fetchall()
+        with season_matches_table(conn, season_id) as matches_table:
+            matches = conn.execute(
+                f"SELECT * FROM {matches_table} WHERE season_id = ? ORDER BY ts ASC, id ASC",
+                (season_id,)
+            ).fetchall()
         return [dict(m) for m in matches]
     finally:
         conn.close()
 
+# --- Player Timeline ---
+# player_timeline is an index of every player's matches, maintained alongside the
+# matches table, so per-player views don't have to scan all matches with OR conditions
+# on four name columns.
+
+TIMELINE_SLOTS = (
+    # (player, partner, opponent 1, opponent 2, winning team)
+    ("player1", "player1b", "player2", "player2b", 1),
+    ("player1b", "player1", "player2", "player2b", 1),
+    ("player2", "player2b", "player1", "player1b", 2),
+    ("player2b", "player2", "player1", "player1b", 2),
+)
+
+def insert_timeline_rows(conn, matches_table, where, params=()):
+    """Adds the player_timeline rows for the matches in matches_table selected by where."""
+    for player, partner, opponent1, opponent2, team in TIMELINE_SLOTS:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO player_timeline (
+                player_name, match_id, season_id, date, ts, elo_before, elo_after,
+                won, partner_name, opponent1_name, opponent2_name
+            )
+            SELECT {player}_name, id, season_id, date, ts, {player}_elo_before, {player}_elo_after,
+                   winner = {team}, {partner}_name, {opponent1}_name, {opponent2}_name
+            FROM {matches_table}
+            WHERE {player}_name IS NOT NULL AND ({where})
+        """, params)
+    update_rollups(conn, f"match_id IN (SELECT id FROM {matches_table} WHERE {where})", params)
+
+def delete_timeline_rows(conn, where, params=()):
+    """Deletes the player_timeline rows selected by where, and takes them out of the rollups."""
+    update_rollups(conn, where, params, sign=-1)
+    conn.execute(f"DELETE FROM player_timeline WHERE {where}", params)
+
+@cached_read
+def get_player_timeline(name):
+    """Returns all of a player's matches across every season, oldest first."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT match_id, season_id, date, elo_before, elo_after, won,
+                   partner_name, opponent1_name, opponent2_name
+            FROM player_timeline
+            WHERE player_name = ?
+            ORDER BY ts, match_id
+        """, (name,)).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+@cached_read
+def get_form_stats(season_id, last_n=FORM_GAMES):
+    """
+    Returns {name: stats} of recent form in a season, computed in one query.
+    stats has 'streak' (positive for a current win streak, negative for a loss streak),
+    'longest_win_streak', 'longest_loss_streak', 'recent_games', 'recent_wins' and
+    'recent_elo_delta' (Elo change over the last last_n games).
+    """
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            WITH games AS (
+                SELECT player_name, won, elo_before, elo_after,
+                       ROW_NUMBER() OVER (PARTITION BY player_name ORDER BY ts DESC, match_id DESC) AS recent,
+                       COUNT(*) OVER (PARTITION BY player_name) AS played,
+                       -- Consecutive results of the same kind share a run number
+                       ROW_NUMBER() OVER (PARTITION BY player_name ORDER BY ts, match_id)
+                         - ROW_NUMBER() OVER (PARTITION BY player_name, won ORDER BY ts, match_id) AS run
+                FROM player_timeline
+                WHERE season_id = :season_id
+            ),
+            runs AS (
+                SELECT player_name, won, COUNT(*) AS length, MIN(recent) AS newest
+                FROM games
+                GROUP BY player_name, won, run
+            ),
+            streaks AS (
+                SELECT player_name,
+                       MAX(CASE WHEN newest = 1 THEN CASE WHEN won THEN length ELSE -length END END) AS streak,
+                       MAX(CASE WHEN won THEN length ELSE 0 END) AS longest_win_streak,
+                       MAX(CASE WHEN won THEN 0 ELSE length END) AS longest_loss_streak
+                FROM runs
+                GROUP BY player_name
+            ),
+            recent AS (
+                SELECT player_name,
+                       COUNT(*) AS recent_games,
+                       SUM(won) AS recent_wins,
+                       MAX(CASE WHEN recent = 1 THEN elo_after END)
+                         - MAX(CASE WHEN recent = MIN(:last_n, played) THEN elo_before END) AS recent_elo_delta
+                FROM games
+                WHERE recent <= :last_n
+                GROUP BY player_name
+            )
+            SELECT * FROM streaks JOIN recent USING (player_name)
+        """, {'season_id': season_id, 'last_n': last_n}).fetchall()
+        return {row['player_name']: dict(row) for row in rows}
+    finally:
+        conn.close()
+
+@cached_read
+def get_games_before_season(season_id):
+    """Returns {name: games played in earlier seasons}, the lifetime games a replay of the season starts from."""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT player_name, COUNT(*) FROM player_timeline WHERE season_id < ? GROUP BY player_name
+        """, (season_id,)).fetchall()
+        return {row[0]: row[1] for row in rows}
+    finally:
+        conn.close()
+
+# --- Activity Rollups ---
+# Games, wins and Elo gained per player per day and per ISO week, and matches per day,
+# for each season. They are kept up to date by insert_timeline_rows and
+# delete_timeline_rows, so activity stats read a handful of rows instead of parsing the
+# date of every match.
+
+ROLLUP_TABLES = (
+    # (table, period column, SQL expression for the period of a player_timeline date)
+    ("player_daily_stats", "day", "substr(date, 1, 10)"),
+    ("player_weekly_stats", "week", "iso_week(date)"),
+)
+
+def iso_week(date):
+    """'YYYY-Www' ISO week of an ISO date string."""
+    year, week, _ = datetime.fromisoformat(date[:10]).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def update_rollups(conn, where, params=(), sign=1):
+    """Adds (sign=1) or removes (sign=-1) the player_timeline rows selected by where to the rollups."""
+    conn.create_function("iso_week", 1, iso_week, deterministic=True)
+    for table, period, expression in ROLLUP_TABLES:
+        conn.execute(f"""
+            INSERT INTO {table} (season_id, {period}, player_name, games, wins, elo_delta)
+            SELECT season_id, {expression}, player_name,
+                   {sign} * COUNT(*), {sign} * SUM(won), {sign} * COALESCE(SUM(elo_after - elo_before), 0)
+            FROM player_timeline
+            WHERE {where}
+            GROUP BY 1, 2, 3
+            ON CONFLICT (season_id, {period}, player_name) DO UPDATE SET
+                games = games + excluded.games,
+                wins = wins + excluded.wins,
+                elo_delta = elo_delta + excluded.elo_delta
+        """, params)
+        conn.execute(f"DELETE FROM {table} WHERE games <= 0")
+    conn.execute(f"""
+        INSERT INTO season_daily_stats (season_id, day, matches)
+        SELECT season_id, substr(date, 1, 10), {sign} * COUNT(DISTINCT match_id)
+        FROM player_timeline
+        WHERE {where}
+        GROUP BY 1, 2
+        ON CONFLICT (season_id, day) DO UPDATE SET matches = matches + excluded.matches
+    """, params)
+    conn.execute("DELETE FROM season_daily_stats WHERE matches <= 0")
+
+def rebuild_rollups(conn, season_ids=None):
+    """Rebuilds the rollups of the given seasons (or all of them) from player_timeline."""
+    if season_ids is None:
+        where, params = "1", ()
+    else:
+        season_ids = tuple(season_ids)
+        where, params = f"season_id IN ({', '.join('?' * len(season_ids))})", season_ids
+    for table, _, _ in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE {where}", params)
+    conn.execute(f"DELETE FROM season_daily_stats WHERE {where}", params)
+    update_rollups(conn, where, params)
+
+@cached_read
+def get_daily_activity(season_id, limit=30):
+    """
+    Returns the last limit match days of a season, newest first, as dicts with 'day',
+    'matches', 'players' (number of players) and 'top' (the player with the most games).
+    """
+    conn = get_db_connection()
+    try:
+        days = conn.execute(
+            "SELECT day, matches FROM season_daily_stats WHERE season_id = ? ORDER BY day DESC LIMIT ?",
+            (season_id, limit)
+        ).fetchall()
+        activity = []
+        for day in days:
+            players = conn.execute("""
+                SELECT player_name, games, wins, elo_delta FROM player_daily_stats
+                WHERE season_id = ? AND day = ?
+                ORDER BY games DESC, elo_delta DESC
+            """, (season_id, day['day'])).fetchall()
+            activity.append({
+                'day': day['day'], 'matches': day['matches'], 'players': len(players),
+                'top': dict(players[0]) if players else None,
+            })
+        return activity
+    finally:
+        conn.close()
+
+@cached_read
+def get_weekly_activity(season_id, week=None):
+    """
+    Returns (week, rows) for an ISO week of a season ('YYYY-Www', default the season's
+    latest week). rows are dicts with 'player_name', 'games', 'wins' and 'elo_delta',
+    most active first.
+    """
+    conn = get_db_connection()
+    try:
+        if week is None:
+            row = conn.execute(
+                "SELECT MAX(week) FROM player_weekly_stats WHERE season_id = ?", (season_id,)
+            ).fetchone()
+            week = row[0]
+        rows = conn.execute("""
+            SELECT player_name, games, wins, elo_delta FROM player_weekly_stats
+            WHERE season_id = ? AND week = ?
+            ORDER BY games DESC, elo_delta DESC
+        """, (season_id, week)).fetchall()
+        return week, [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+# --- Match Timestamps ---
+# matches.ts is the match time in milliseconds since 1970-01-01, on the same local
+# wall clock as matches.date, so it converts both ways without time zone information.
+# Matches are ordered by (ts, id): matches recorded in the same millisecond keep the
+# order they were inserted in.
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_ts(value):
+    """Converts a datetime or ISO date string to a matches.ts value."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value.replace(tzinfo=None) - EPOCH) // timedelta(milliseconds=1)
+
+def from_ts(ts):
+    """Converts a matches.ts value back to a datetime."""
+    return EPOCH + timedelta(milliseconds=ts)
+
+# --- Low-allocation Match Access ---
+# get_matches_for_season builds a dict per row, which is fine for small seasons but
+# expensive for lifetime scans. The functions below stream rows as compact __slots__
+# records, or load a whole season as NumPy columns so analytics can work on arrays.
+
+MATCH_FIELDS = (
+    'id', 'season_id', 'date', 'doubles_match',
+    'player1_name', 'player1b_name', 'player2_name', 'player2b_name',
+    'player1_elo_before', 'player1_elo_after', 'player1b_elo_before', 'player1b_elo_after',
+    'player2_elo_before', 'player2_elo_after', 'player2b_elo_before', 'player2b_elo_after',
+    'winner', 'ts'
+)
+SLOTS = ('player1', 'player1b', 'player2', 'player2b')
+
+class MatchRecord:
+    """A single match row. Attribute names match the matches table columns."""
+    __slots__ = MATCH_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(MATCH_FIELDS, values):
+            setattr(self, field, value)
+
+def _match_record_factory(cursor, row):
+    return MatchRecord(*row)
+
+def _match_query(matches_table, season_id, newest_first=False, since=None, until=None):
+    # Builds the SELECT used by the streaming and columnar readers. since and until are
+    # ts bounds, so the (season_id, ts, id) and (ts, id) indexes serve both the range
+    # and the order
+    sql = f"SELECT {', '.join(MATCH_FIELDS)} FROM {matches_table}"
+    conditions, params = [], []
+    if season_id is not None:
+        conditions.append("season_id = ?")
+        params.append(season_id)
+    if since is not None:
+        conditions.append("ts >= ?")
+        params.append(to_ts(since))
+    if until is not None:
+        conditions.append("ts < ?")
+        params.append(to_ts(until))
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    order = "DESC" if newest_first else "ASC"
+    sql += f" ORDER BY ts {order}, id {order}"
+    return sql, tuple(params)
+
+def iter_matches(season_id=None, newest_first=False, since=None, until=None):
+    """
+    Lazily yields MatchRecord objects for a season (or all seasons if season_id is None).
+    Rows are read from the cursor as they are consumed.
+    Args:
+        since, until (datetime or ISO string, optional): Only matches played at or after
+            since and before until.
+    """
+    conn = get_db_connection()
+    try:
+        if season_id is not None:
+            with season_matches_table(conn, season_id) as matches_table:
+                yield from _stream_records(conn, *_match_query(matches_table, season_id, newest_first, since, until))
+        else:
+            # Archive files hold older seasons, so reading them in order keeps the scan chronological
+            for matches_table in all_matches_tables(conn, newest_first):
+                yield from _stream_records(conn, *_match_query(matches_table, None, newest_first, since, until))
+    finally:
+        conn.close()
+
+@cached_read
+def get_matches_between(start, end=None, season_id=None):
+    """
+    Returns the matches played at or after start and before end (datetimes or ISO
+    strings; end None for no limit), optionally in one season, oldest first, as dicts.
+    """
+    return [
+        {field: getattr(record, field) for field in MATCH_FIELDS}
+        for record in iter_matches(season_id, since=start, until=end)
+    ]
+
+def get_matches_since(since, season_id=None):
+    """Returns the matches played at or after since, oldest first, as dicts."""
+    return get_matches_between(since, None, season_id)
+
+def _stream_records(conn, sql, params):
+    cursor = conn.cursor()
+    cursor.row_factory = _match_record_factory
+    return cursor.execute(sql, params)
+
+class MatchColumns:
+    """
+    A season's matches stored column-wise in NumPy arrays, oldest first.
+
+    Player columns (player1, player1b, player2, player2b) hold integer codes into
+    `names`, with -1 where there is no player. Elo columns use -1 when empty.
+    """
+
+    def __init__(self, names, columns):
+        self.names = names
+        self.codes = {name: code for code, name in enumerate(names)}
+        self.__dict__.update(columns)
+        for array in columns.values():
+            array.setflags(write=False) # Shared via the read cache
+
+    def __len__(self):
+        return len(self.id)
+
+    def players(self):
+        """Returns a stacked (4, n) array of the player code columns."""
+        return np.stack([getattr(self, slot) for slot in SLOTS])
+
+    def elo_after(self):
+        """Returns a stacked (4, n) array of the elo_after columns, aligned with players()."""
+        return np.stack([getattr(self, f"{slot}_elo_after") for slot in SLOTS])
+
+@cached_read
+def get_match_columns(season_id=None, chunk_size=4096, since=None, until=None):
+    """
+    Loads the matches for a season (or all seasons if season_id is None) into a MatchColumns.
+    Rows are copied into preallocated arrays a chunk at a time. since and until window
+    the matches by date as in iter_matches.
+    """
+    names = []
+    codes = {None: -1}
+    def encode(name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def load(conn, matches_table):
+        # Reads one matches table into a dict of arrays
+        sql, params = _match_query(matches_table, season_id, since=since, until=until)
+        count = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+        columns = {
+            'id': np.empty(count, dtype=np.int64),
+            'season_id': np.empty(count, dtype=np.int32),
+            'date': np.empty(count, dtype='datetime64[us]'),
+            'doubles_match': np.empty(count, dtype=bool),
+            'winner': np.empty(count, dtype=np.int8),
+            'ts': np.empty(count, dtype=np.int64),
+        }
+        for slot in SLOTS:
+            columns[slot] = np.empty(count, dtype=np.int32)
+            columns[f"{slot}_elo_before"] = np.empty(count, dtype=np.int32)
+            columns[f"{slot}_elo_after"] = np.empty(count, dtype=np.int32)
+
+        cursor = conn.execute(sql, params)
+        start = 0
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            end = start + len(chunk)
+            for index, field in enumerate(MATCH_FIELDS):
+                values = [row[index] for row in chunk]
+                if field.endswith('_name'):
+                    columns[field[:-len('_name')]][start:end] = [encode(v) for v in values]
+                elif field.endswith(('_before', '_after')):
+                    columns[field][start:end] = [-1 if v is None else v for v in values]
+                else:
+                    columns[field][start:end] = values
+            start = end
+        return columns
+
+    conn = get_db_connection()
+    try:
+        conn.row_factory = None
+        if season_id is not None:
+            with season_matches_table(conn, season_id) as matches_table:
+                parts = [load(conn, matches_table)]
+        else:
+            parts = [load(conn, matches_table) for matches_table in all_matches_tables(conn)]
+    finally:
+        conn.close()
+
+    if len(parts) == 1:
+        return MatchColumns(names, parts[0])
+    return MatchColumns(names, {key: np.concatenate([part[key] for part in parts]) for key in parts[0]})
+
+# --- Season Archives ---
+# Completed seasons can be moved out of the live DB into per-year archive files
+# (archive/<db name>-<year>.db). The live DB keeps a row in archived_seasons for each one,
+# and an archive file is only ATTACHed while one of its seasons is being read, so day to
+# day queries, backups and migrations only pay for the current season.
+
+def _archive_path(path):
+    # Archive paths are stored relative to the DB file's directory
+    return os.path.join(os.path.dirname(DB_FILE), path)
+
+def _archived_season_path(conn, season_id):
+    row = conn.execute("SELECT path FROM archived_seasons WHERE season_id = ?", (season_id,)).fetchone()
+    return _archive_path(row[0]) if row else None
+
+@contextmanager
+def attached_archive(conn, path, alias="archive"):
+    """
+    Attaches an archive file to conn for the duration of the block. DETACH is not allowed
+    inside an open transaction, so callers that write must commit before the block exits;
+    if it exits with an exception the transaction is rolled back.
+    """
+    conn.execute("ATTACH DATABASE ? AS " + alias, (path,))
+    try:
+        yield alias
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE " + alias)
+
+@contextmanager
+def season_matches_table(conn, season_id):
+    """
+    Yields the name of the table holding a season's matches: 'matches' for live seasons,
+    or the matches table of its attached archive file for archived ones.
+    """
+    path = _archived_season_path(conn, season_id)
+    if path is None:
+        yield "matches"
+        return
+    with attached_archive(conn, path) as alias:
+        yield f"{alias}.matches"
+
+@contextmanager
+def seasons_matches_tables(conn, season_ids):
+    """
+    Like season_matches_table for several seasons at once, so they can be read and
+    written in one transaction. Yields {season_id: table name}.
+    Each archive file needed is attached once (SQLite allows 10 attached files by default).
+    """
+    with ExitStack() as stack:
+        tables = {}
+        aliases = {}
+        for season_id in season_ids:
+            path = _archived_season_path(conn, season_id)
+            if path is None:
+                tables[season_id] = "matches"
+                continue
+            if path not in aliases:
+                aliases[path] = stack.enter_context(attached_archive(conn, path, f"archive{len(aliases)}"))
+            tables[season_id] = f"{aliases[path]}.matches"
+        yield tables
+
+def _archive_files(conn):
+    # Archive file paths (as stored), oldest seasons first
+    return [row[0] for row in conn.execute("""
+        SELECT path FROM archived_seasons GROUP BY path ORDER BY MIN(season_id)
+    """).fetchall()]
+
+@contextmanager
+def attached_matches_tables(conn):
+    """
+    Yields every matches table (archive files oldest first, then the live table) with all
+    the archives attached at once, so writes to them can be committed in one transaction.
+    """
+    with ExitStack() as stack:
+        tables = [
+            f"{stack.enter_context(attached_archive(conn, _archive_path(path), f'archive{i}'))}.matches"
+            for i, path in enumerate(_archive_files(conn))
+        ]
+        yield tables + ["matches"]
+
+def all_matches_tables(conn, newest_first=False):
+    """
+    Generator over every matches table (archive files oldest first, then the live table),
+    attaching each archive only while it is being used. For reads only; writers should
+    use attached_matches_tables.
+    """
+    paths = _archive_files(conn)
+    if newest_first:
+        yield "matches"
+    for path in (reversed(paths) if newest_first else paths):
+        with attached_archive(conn, _archive_path(path)) as alias:
+            yield f"{alias}.matches"
+    if not newest_first:
+        yield "matches"
+
+def get_archived_seasons():
+    """Returns the archived_seasons rows, oldest season first."""
+    conn = get_db_connection()
+    try:
+        return [dict(r) for r in conn.execute("SELECT * FROM archived_seasons ORDER BY season_id").fetchall()]
+    finally:
+        conn.close()
+
+@metrics.timed(metrics.DB_CALL_SECONDS)
+def archive_completed_seasons(vacuum=True):
+    """
+    Moves the matches of every completed season (all seasons before the current one)
+    into per-year archive files. Each year is copied and removed from the live DB in a
+    single transaction. Returns the number of seasons archived.
+    """
+    current_season = get_current_season()
+    if not current_season:
+        return 0
+
+    archived = 0
+    conn = get_db_connection()
+    try:
+        seasons = conn.execute("""
+            SELECT id, created_at FROM seasons
+            WHERE id < ? AND id NOT IN (SELECT season_id FROM archived_seasons)
+            ORDER BY id
+        """, (current_season['id'],)).fetchall()
+        by_year = {}
+        for season in seasons:
+            by_year.setdefault(season['created_at'][:4], []).append(season['id'])
+        if not by_year:
+            return 0
+
+        matches_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'matches'").fetchone()[0]
+        stem = os.path.splitext(os.path.basename(DB_FILE))[0]
+        os.makedirs(_archive_path(ARCHIVE_DIR), exist_ok=True)
+
+        for year, season_ids in by_year.items():
+            path = os.path.join(ARCHIVE_DIR, f"{stem}-{year}.db")
+            with attached_archive(conn, _archive_path(path)) as alias:
+                has_table = conn.execute(
+                    f"SELECT 1 FROM {alias}.sqlite_master WHERE type = 'table' AND name = 'matches'"
+                ).fetchone()
+                if not has_table:
+                    # Create the archive table from the live schema so the columns line up
+                    create_sql = matches_sql.split("(", 1)[1]
+                    conn.execute(f"CREATE TABLE {alias}.matches ({create_sql}")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_matches_ts ON matches (ts, id)")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_matches_season_ts ON matches (season_id, ts, id)")
+                for season_id in season_ids:
+                    cursor = conn.execute(f"INSERT INTO {alias}.matches SELECT * FROM matches WHERE season_id = ?", (season_id,))
+                    conn.execute("DELETE FROM matches WHERE season_id = ?", (season_id,))
+                    conn.execute("""
+                        INSERT INTO archived_seasons (season_id, path, match_count, archived_at)
+                        VALUES (?, ?, ?, ?)
+                    """, (season_id, path, cursor.rowcount, datetime.now().isoformat()))
+                    archived += 1
+                conn.commit() # Before the archive is detached
+            print(f"Archived {len(season_ids)} season(s) from {year} to {path}")
+        mark_data_changed()
+        if vacuum:
+            conn.execute("VACUUM") # Shrink the live file so backups stay small
+            forget_journal_position() # VACUUM may renumber oplog rowids
+    finally:
+        conn.close()
+    return archived
+
+@metrics.timed(metrics.DB_CALL_SECONDS)
 def delete_last_match(season_id):
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
         # Find the last match for the given season
         last_match = cursor.execute(
-            "SELECT * FROM matches WHERE season_id = ? ORDER BY date DESC LIMIT 1",
+            "SELECT * FROM matches WHERE season_id = ? ORDER BY ts DESC, id DESC LIMIT 1",
             (season_id,)
         ).fetchone()
         if not last_match:
@@ -345,6 +1438,13 @@ def delete_last_match(season_id):
             messagebox.showerror("Error", "Cannot delete last match: Doubles match deletion not supported. Must be handled manually.")
             return False
 
+        # A tournament result is taken back out of the bracket, unless the bracket has moved on
+        import tournament
+        if not tournament.reopen_match(conn, last_match['id']):
+            conn.rollback()
+            messagebox.showerror("Error", "Cannot delete last match: it decided a tournament match, and the next match in the bracket has already been played.")
+            return False
+
         # Reverse the stats update for both players
         p1_name = last_match['player1_name']
         p2_name = last_match['player2_name']
@@ -380,9 +1480,15 @@ def delete_last_match(season_id):
         """, (new_loser_elo, new_loser_losses, new_loser_lifetime_games, loser_name))
 
         # Delete the match record
+        match_op = cursor.execute("SELECT op_id FROM oplog WHERE match_id = ?", (last_match['id'],)).fetchone()
+        if match_op:
+            append_op(cursor, 'delete_match', {'match_op': match_op['op_id']})
         cursor.execute("DELETE FROM matches WHERE id = ?", (last_match['id'],))
+        delete_timeline_rows(conn, "match_id = ?", (last_match['id'],))
 
         conn.commit()
+        mark_data_changed()
+        flush_journal()
         print(f"Match {last_match['id']} deleted between {p1_name} and {p2_name}")
         messagebox.showinfo("Deleted", "The last recorded match has been deleted.")
         return True
@@ -391,33 +1497,122 @@ def delete_last_match(season_id):
 
 # --- Statistics ---
 
+@cached_read
 def get_head_to_head_wins(player_a, player_b, season_id):
     """Returns the number of wins player_a has over player_b in the given season."""
     conn = get_db_connection()
     try:
-        wins = conn.execute("""
-            SELECT COUNT(*) as win_count
-            FROM matches
-            WHERE season_id = ?
-              AND ((player1_name = ? AND player2_name = ? AND winner = 1)
-                   OR (player1_name = ? AND player2_name = ? AND winner = 2))
-        """, (season_id, player_a, player_b, player_b, player_a)).fetchone()
+        with season_matches_table(conn, season_id) as matches_table:
+            wins = conn.execute(f"""
+                SELECT COUNT(*) as win_count
+                FROM {matches_table}
+                WHERE season_id = ?
+                  AND ((player1_name = ? AND player2_name = ? AND winner = 1)
+                       OR (player1_name = ? AND player2_name = ? AND winner = 2))
+            """, (season_id, player_a, player_b, player_b, player_a)).fetchone()
         return wins['win_count'] if wins else 0
     finally:
         conn.close()
 
+# --- Venues ---
+# Each venue has its own DB file with its own seasons and players. The default venue
+# is DB_FILE; others live in VENUES_DIR/<name>.db. Selecting a venue points DB_FILE at
+# its file, so every other function in this module works on the selected venue.
+# Venue files are only listed at startup, never opened, until they are selected or
+# a cross-venue query runs.
+
+_current_venue = DEFAULT_VENUE
+_default_db_file = DB_FILE
+VENUE_NAME_PATTERN = re.compile(r"^[\w\- ]+$")
+
+def get_venue_db_file(venue):
+    if venue == DEFAULT_VENUE:
+        return _default_db_file
+    return os.path.join(VENUES_DIR, f"{venue}.db")
+
+def list_venues():
+    """Returns the names of all venues, default first."""
+    venues = [DEFAULT_VENUE]
+    if os.path.isdir(VENUES_DIR):
+        venues += sorted(os.path.splitext(f)[0] for f in os.listdir(VENUES_DIR) if f.endswith('.db'))
+    return venues
+
+def get_current_venue():
+    return _current_venue
+
+def select_venue(venue):
+    """
+    Switches all database functions to the given venue's DB file,
+    creating and initializing it if it doesn't exist yet.
+    """
+    global DB_FILE, _current_venue
+    if not VENUE_NAME_PATTERN.match(venue):
+        raise ValueError(f"Invalid venue name: '{venue}'")
+    if venue != DEFAULT_VENUE:
+        os.makedirs(VENUES_DIR, exist_ok=True)
+    DB_FILE = get_venue_db_file(venue)
+    _current_venue = venue
+    init_db()
+    print(f"Selected venue: '{venue}'")
+
+def _read_only_connection(db_file):
+    # Used for cross-venue reads so other venues' files are never locked for writing
+    conn = sqlite3.connect(f"{pathlib.Path(db_file).resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _query_venue(venue, sql, params):
+    conn = _read_only_connection(get_venue_db_file(venue))
+    try:
+        return [dict(row, venue=venue) for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.Error as e:
+        print(f"Failed to read venue '{venue}': {e}")
+        return []
+    finally:
+        conn.close()
+
+def _query_all_venues(sql, params=()):
+    # Runs the same read query against every venue DB in parallel and concatenates the rows
+    venues = [v for v in list_venues() if os.path.exists(get_venue_db_file(v))]
+    if not venues:
+        return []
+    with ThreadPoolExecutor(max_workers=min(8, len(venues))) as pool:
+        results = pool.map(lambda v: _query_venue(v, sql, params), venues)
+    return [row for rows in results for row in rows]
+
+def get_global_leaderboard():
+    """Returns the active players of every venue, each tagged with its venue, sorted by Elo."""
+    players = _query_all_venues("""
+        SELECT name, current_elo, current_wins, current_losses
+        FROM players
+        WHERE archive = 0
+    """)
+    return sorted(players, key=lambda p: p['current_elo'], reverse=True)
+
+def find_player_in_all_venues(name):
+    """Returns the player's record from every venue they appear in."""
+    return _query_all_venues("SELECT * FROM players WHERE name = ?", (name,))
+
 # --- Backup Management ---
 
-def backup_database(db_path=DB_FILE, backup_dir='backups', prefix=None):
+def get_backup_dir():
+    """Returns the backup directory for the selected venue."""
+    if _current_venue == DEFAULT_VENUE:
+        return 'backups'
+    return os.path.join('backups', _current_venue)
+
+def backup_database(db_path=None, backup_dir=None, prefix=None):
     """
     Creates a backup of the database file.
     Args:
-        db_path (str): Path to the database file.
-        backup_dir (str): Directory to store backups. Defaults to 'backups'.
+        db_path (str, optional): Path to the database file. Defaults to the selected venue's DB.
+        backup_dir (str, optional): Directory to store backups. Defaults to the venue's backup directory.
         prefix (str, optional): Prefix for backup filename. If None, uses 'backup-YYYYMMDD-HHMMSS'.
     Returns:
         str: The name of the backup file created, or None if failed.
     """
+    db_path = db_path or DB_FILE
+    backup_dir = backup_dir or get_backup_dir()
     try:
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir)
@@ -427,88 +1622,223 @@ def backup_database(db_path=DB_FILE, backup_dir='backups', prefix=None):
         else:
             backup_name = f"backup-{timestamp}.db"
         backup_path = os.path.join(backup_dir, backup_name)
-        shutil.copy2(db_path, backup_path)
+        with metrics.timer(metrics.BACKUP_SECONDS):
+            if db_path == DB_FILE:
+                flush_journal()
+            shutil.copy2(db_path, backup_path)
+            if db_path == DB_FILE:
+                _stamp_journal_offset(backup_path)
         print(f"Backup created: {backup_path}")
         return backup_name
     except Exception as e:
         print(f"Failed to backup database: {e}")
         return None
 
-def get_last_backup_time(backup_dir='backups'):
+def _stamp_journal_offset(backup_path):
+    # Records how much of the journal the backup already contains, so a restore from it
+    # only replays what came after
+    journal_path = get_journal_path()
+    offset = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+    conn = sqlite3.connect(backup_path)
+    try:
+        conn.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES ('journal_offset', ?)", (str(offset),))
+        conn.commit()
+    finally:
+        conn.close()
+
+def backup_file_time(fname):
+    """Returns the time in a backup file name (prefix-YYYYMMDD-HHMMSS.db), or None."""
+    try:
+        parts = fname.split('-')
+        if len(parts) >= 3:
+            # e.g. backup-20251005-153000.db or customprefix-20251005-153000.db
+            date_str = parts[-2] + '-' + parts[-1].split('.')[0] # YYYYMMDD-HHMMSS
+            return datetime.strptime(date_str, '%Y%m%d-%H%M%S')
+    except ValueError:
+        pass
+    return None
+
+def get_last_backup_time(backup_dir=None):
     """
     Returns the datetime of the most recent backup file in the backup_dir, or None if none exist.
     """
+    backup_dir = backup_dir or get_backup_dir()
     if not os.path.exists(backup_dir):
         return None
-    files = [f for f in os.listdir(backup_dir) if f.endswith('.db')]
-    if not files:
-        return None
-    # Extract timestamp from filename (assumes format: prefix-YYYYMMDD-HHMMSS.db or backup-YYYYMMDD-HHMMSS.db)
-    times = []
-    for fname in files:
-        try:
-            parts = fname.split('-')
-            if len(parts) >= 3:
-                # e.g. backup-20251005-153000.db or customprefix-20251005-153000.db
-                date_str = parts[-2] + '-' + parts[-1].split('.')[0] # YYYYMMDD-HHMMSS
-                dt = datetime.strptime(date_str, '%Y%m%d-%H%M%S')
-                times.append(dt)
-        except Exception:
-            continue
+    times = [t for t in (backup_file_time(f) for f in os.listdir(backup_dir) if f.endswith('.db')) if t]
     return max(times) if times else None
 
 
-# --- Database Migration Manager ---
-# This function handles migrating the database schema and data from an old version to the current version.
-# It creates a backup before attempting migration, and rolls back if anything goes wrong.
-# Starting from the old version it finds in the dbinfo table, it applies each migration function in sequence until reaching the current version.
+# --- Journal ---
+# Every committed op is also appended to a JSON-lines journal in the backup directory and
+# fsynced, so matches recorded since the last backup survive losing the DB file, and the DB
+# can be rebuilt as of any point in time (see journal.py). Writes that append ops call
+# flush_journal after they commit. The first flush in a process carries on after the last
+# op in the journal; if the DB doesn't have that op it writes every op not already in the
+# journal, so the journal plus any older backup always covers the full history.
+
+_journal_positions = {} # DB file -> rowid of the last oplog row known to be in the journal
+
+def forget_journal_position():
+    # Makes the next flush re-check the journal, for when the DB file was rewritten or replaced
+    _journal_positions.pop(DB_FILE, None)
+
+def get_journal_path():
+    """Returns the journal file for the selected venue."""
+    return os.path.join(get_backup_dir(), JOURNAL_FILE)
+
+def read_journal(path=None, offset=0):
+    """Yields the ops in a journal file as dicts, oldest first, starting at byte offset."""
+    path = path or get_journal_path()
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        f.seek(offset)
+        for line in f:
+            if line.endswith("\n"): # A torn last line from a crash mid-write is skipped
+                yield json.loads(line)
 
-def migrate_db(db_path):
-    # Make a copy of the existing database before migration
-    rollback_db = backup_database(db_path, backup_dir='backups', prefix='migration')
+def _last_journaled_op_id(path, chunk_size=64 * 1024):
+    # Reads only the end of the journal; ops are far smaller than chunk_size
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - chunk_size, 0))
+            lines = f.read().split(b"\n")[:-1] # The last complete line is before the final newline
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            return json.loads(line)['op_id']
+        except (ValueError, KeyError):
+            continue # The start of the chunk, or a torn line
+    return None
+
+def flush_journal():
+    """
+    Appends committed ops that aren't in the journal yet with a single write and fsync.
+    Errors are printed rather than raised, so a missing backup drive doesn't stop play.
+    """
+    path = get_journal_path()
+    if not os.path.exists(DB_FILE):
+        return
     try:
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            # Determine current version and handle non-existent dbinfo table
-            try:
-                cursor.execute("SELECT value FROM dbinfo WHERE key = 'version'") # This will fail if dbinfo doesn't exist
-                row = cursor.fetchone()
-                current_version = int(row['value'])
-            except:
-                current_version = 0 # dbinfo table doesn't exist, so version is 0  
-            print(f"Current DB version: {current_version}, Target version: {DB_VERSION}")
-            if current_version >= DB_VERSION:
-                print("Database is already up-to-date.")
-                return
-            # Import migration functions
-            import helper_scripts.db_migration_rules as migration_rules
-            # Apply migrations in sequence
-            for version in range(current_version, DB_VERSION):
-                next_version = version + 1
-                migrate_func_name = f"migrate_v{version}_to_v{next_version}"
-                migrate_func = getattr(migration_rules, migrate_func_name, None)
-                if migrate_func:
-                    print(f"Migrating from v{version} to v{next_version}...")
-                    migrate_func(conn)
-                    # Update the version in dbinfo table
-                    cursor.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES ('version', ?)", (str(next_version),))
-                    conn.commit()
-                    print(f"Migration to v{next_version} completed.")
-                else:
-                    raise Exception(f"No migration function found for v{version} to v{next_version}")
-            print("Database migration completed.")
-        except Exception as e:
-            raise e
+            position = _journal_positions.get(DB_FILE)
+            if position is None:
+                # First flush in this process: carry on after the newest op an earlier run
+                # wrote, if this DB has it
+                last = _last_journaled_op_id(path)
+                row = conn.execute("SELECT rowid FROM oplog WHERE op_id = ?", (last,)).fetchone() if last else None
+                position = row[0] if row else None
+            if position is None:
+                # The journal is empty or from another DB (e.g. after a restore): skip
+                # whatever is already in it
+                journaled = {op['op_id'] for op in read_journal(path)}
+                rows = conn.execute("""
+                    SELECT rowid, op_id, origin, seq, ts, op, payload FROM oplog ORDER BY rowid
+                """).fetchall()
+            else:
+                journaled = ()
+                rows = conn.execute("""
+                    SELECT rowid, op_id, origin, seq, ts, op, payload FROM oplog WHERE rowid > ? ORDER BY rowid
+                """, (position,)).fetchall()
         finally:
             conn.close()
-    except Exception as e:
-        print(f"Database migration failed: {e}")
-        # If migration fails, restore from backup (rollback_db)
-        os.remove(db_path)
-        if rollback_db:
-            shutil.copy2(os.path.join('backups', rollback_db), db_path)
-            print("Database restored from backup.")
-        else:
-            print("No backup available to restore automatically. Check backup directory.")
-        raise
+        lines = [
+            json.dumps({key: row[key] for key in ('op_id', 'origin', 'seq', 'ts', 'op', 'payload')}) + "\n"
+            for row in rows if row['op_id'] not in journaled
+        ]
+        if lines:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+        _journal_positions[DB_FILE] = rows[-1]['rowid'] if rows else position or 0
+    except (OSError, sqlite3.Error) as e:
+        print(f"Journal write failed: {e}")
+
+# --- Database Migration Manager ---
+# This function handles migrating the database schema and data from an old version to the current version.
+# Starting from the old version it finds in the dbinfo table, it applies the steps for each version
+# (from helper_scripts/db_migration_rules.py) in sequence until reaching the current version.
+# Each version runs inside a SAVEPOINT together with its dbinfo version bump, so if a step fails
+# the version is rolled back in place, and if the process is interrupted SQLite discards the
+# partial version on next open. Either way, running the migration again resumes from the last
+# completed version.
+
+def read_db_version(conn):
+    """Returns the schema version recorded in dbinfo, or 0 if there is none."""
+    try:
+        row = conn.execute("SELECT value FROM dbinfo WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+    except sqlite3.Error:
+        return 0 # dbinfo table doesn't exist, so version is 0
+
+def _print_migration_progress(version, step, step_count, description):
+    print(f"Migrating to v{version} [{step}/{step_count}]: {description}")
+
+def migrate_db(db_path, dry_run=False, progress=None):
+    """
+    Migrates the database at db_path to DB_VERSION.
+    Args:
+        db_path (str): Path to the database file.
+        dry_run (bool): If True, the migration runs against an in-memory copy and the file is left untouched.
+        progress (callable, optional): Called as progress(version, step, step_count, description)
+            before each step. Defaults to printing the step.
+    Returns:
+        int: The version the database (or its in-memory copy) was migrated to.
+    """
+    import helper_scripts.db_migration_rules as migration_rules
+    progress = progress or _print_migration_progress
+
+    # Autocommit mode, so transactions are controlled only by the SAVEPOINTs below
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    if dry_run:
+        memory_conn = sqlite3.connect(":memory:", isolation_level=None)
+        conn.backup(memory_conn)
+        conn.close()
+        conn = memory_conn
+
+    migrated = False
+    try:
+        current_version = read_db_version(conn)
+        print(f"Current DB version: {current_version}, Target version: {DB_VERSION}" + (" (dry run)" if dry_run else ""))
+        if current_version >= DB_VERSION:
+            print("Database is already up-to-date.")
+            return current_version
+
+        for version in range(current_version + 1, DB_VERSION + 1):
+            steps = migration_rules.MIGRATIONS.get(version)
+            if steps is None:
+                raise Exception(f"No migration found for v{version - 1} to v{version}")
+            savepoint = f"migrate_v{version}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                for step, (description, action) in enumerate(steps, start=1):
+                    progress(version, step, len(steps), description)
+                    if callable(action):
+                        action(conn)
+                    else:
+                        for sql in action:
+                            conn.execute(sql)
+                conn.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES ('version', ?)", (str(version),))
+            except Exception as e:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                print(f"Database migration to v{version} failed and was rolled back: {e}")
+                print(f"Database remains at v{version - 1}.")
+                raise
+            conn.execute(f"RELEASE {savepoint}") # Commits this version
+            current_version = version
+            migrated = True
+            print(f"Migration to v{version} completed.")
+        print("Database migration completed.")
+        return current_version
+    finally:
+        conn.close()
+        if not dry_run and migrated:
+            mark_data_changed()
+            flush_journal() # Migrations may log ops (v7 logs the existing history)
@@ -0,0 +1,118 @@
+from collections import namedtuple
+import numpy as np
+
+# --- Constants ---
+# Defaults for new seasons. Each season stores its own copy in season_rating_params.
+K_FACTOR = 32
+K_NEW_PLAYER = 40
+GAMES_NEW_PLAYER = 10
+
+RatingParams = namedtuple('RatingParams', ['k_factor', 'k_new_player', 'games_new_player'])
+DEFAULT_PARAMS = RatingParams(K_FACTOR, K_NEW_PLAYER, GAMES_NEW_PLAYER)
+
+# --- Core Elo Logic ---
+def expected_score(r1, r2):
+    return 1 / (1 + 10 ** ((r2 - r1) / 400))
+
+def update_elo(winner_elo, loser_elo, k):
+    expected_win = expected_score(winner_elo, loser_elo)
+    winner_elo_new = winner_elo + k * (1 - expected_win)
+    loser_elo_new = loser_elo + k * (0 - expected_score(loser_elo, winner_elo))
+    return round(winner_elo_new), round(loser_elo_new)
+
+def k_factor_for(lifetime_games, params=DEFAULT_PARAMS):
+    """Players get a higher K-factor until they have played games_new_player games."""
+    return params.k_new_player if lifetime_games < params.games_new_player else params.k_factor
+
+def rate_match(winners, losers, params=DEFAULT_PARAMS):
+    """
+    Calculates the result of a singles or doubles match.
+    Args:
+        winners, losers: Lists of (elo, lifetime_games) for each team member.
+        params: RatingParams to use.
+    Returns:
+        (k, winner_elos_after, loser_elos_after)
+
+    The highest K-factor of all players is used. In doubles the teams play at their
+    average Elo and every team member gets the team's (rounded) Elo change.
+    """
+    k = max(k_factor_for(games, params) for _, games in winners + losers)
+    if len(winners) == 1 and len(losers) == 1:
+        winner_elo_new, loser_elo_new = update_elo(winners[0][0], losers[0][0], k)
+        return k, [winner_elo_new], [loser_elo_new]
+
+    winner_avg_elo = sum(elo for elo, _ in winners) / len(winners)
+    loser_avg_elo = sum(elo for elo, _ in losers) / len(losers)
+    winner_elo_new, loser_elo_new = update_elo(winner_avg_elo, loser_avg_elo, k)
+    winner_elo_diff = round(winner_elo_new - winner_avg_elo)
+    loser_elo_diff = round(loser_elo_new - loser_avg_elo)
+    return k, [elo + winner_elo_diff for elo, _ in winners], [elo + loser_elo_diff for elo, _ in losers]
+
+# --- Predictions ---
+class ExpectationMatrix:
+    """
+    Expected scores between every pair of players, kept up to date as ratings change.
+
+    matrix[i, j] is expected_score(elo of names[i], elo of names[j]). update() only
+    recomputes the rows and columns of players whose rating changed, so after a match
+    that is at most four of each.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+        self.elos = np.empty(0)
+        self.games = {}
+        self.matrix = np.empty((0, 0))
+
+    def update(self, ratings):
+        """
+        Args:
+            ratings: {name: (elo, lifetime_games)} for every player.
+        Returns:
+            The number of players whose row and column were recomputed.
+        """
+        self.games = {name: games for name, (_, games) in ratings.items()}
+        if set(ratings) != set(self.codes):
+            # Players were added or removed, so rebuild from scratch
+            self.names = sorted(ratings)
+            self.codes = {name: code for code, name in enumerate(self.names)}
+            self.elos = np.array([ratings[name][0] for name in self.names], dtype=float)
+            self.matrix = expected_score(self.elos[:, None], self.elos[None, :])
+            return len(self.names)
+        elos = np.array([ratings[name][0] for name in self.names], dtype=float)
+        changed = np.flatnonzero(elos != self.elos)
+        if len(changed):
+            self.elos = elos
+            self.matrix[changed, :] = expected_score(elos[changed, None], elos[None, :])
+            self.matrix[:, changed] = expected_score(elos[:, None], elos[None, changed])
+        return len(changed)
+
+    def __contains__(self, name):
+        return name in self.codes
+
+    def expected(self, team1, team2):
+        """
+        Expected score of team1 against team2 (lists of names). In doubles the teams
+        play at their average Elo, as in rate_match, which isn't a pairwise entry.
+        """
+        if len(team1) == 1 and len(team2) == 1:
+            return float(self.matrix[self.codes[team1[0]], self.codes[team2[0]]])
+        team1_avg = sum(self.elos[self.codes[name]] for name in team1) / len(team1)
+        team2_avg = sum(self.elos[self.codes[name]] for name in team2) / len(team2)
+        return float(expected_score(team1_avg, team2_avg))
+
+    def predict(self, team1, team2, params=DEFAULT_PARAMS):
+        """
+        Predicts a match between two teams of names.
+        Returns:
+            {'expected': team1's expected score, 'k': K-factor,
+             'team1_wins': {name: elo change}, 'team2_wins': {name: elo change}}
+        """
+        rated1 = [(int(self.elos[self.codes[name]]), self.games[name]) for name in team1]
+        rated2 = [(int(self.elos[self.codes[name]]), self.games[name]) for name in team2]
+        k, winners, losers = rate_match(rated1, rated2, params)
+        team1_wins = dict(zip(team1 + team2, [after - elo for after, (elo, _) in zip(winners + losers, rated1 + rated2)]))
+        _, winners, losers = rate_match(rated2, rated1, params)
+        team2_wins = dict(zip(team2 + team1, [after - elo for after, (elo, _) in zip(winners + losers, rated2 + rated1)]))
+        return {'expected': self.expected(team1, team2), 'k': k, 'team1_wins': team1_wins, 'team2_wins': team2_wins}
@@ -0,0 +1,229 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import database as db
+from elo import RatingParams, DEFAULT_PARAMS
+
+# Measures how well the rating rules predict results. The whole match history is replayed
+# under each candidate RatingParams (seasons start from INITIAL_ELO, lifetime games carry
+# over, as in rerate.py) and the expected score before every match is scored against the
+# result. Lifetime games don't depend on the params, so every candidate is replayed at
+# once as a column of a (params, players) rating array. Searches split the candidates over
+# a process pool; each worker is handed the loaded history once, when it starts.
+
+CALIBRATION_BINS = 10
+EPSILON = 1e-12 # Keeps log-loss finite for predictions of exactly 0 or 1
+
+# Default search space: 15 x 9 x 5 = 675 parameter sets
+GRID = {
+    'k_factor': range(8, 65, 4),
+    'k_new_player': range(16, 81, 8),
+    'games_new_player': (0, 5, 10, 20, 30),
+}
+
+History = namedtuple('History', ['teams', 'winner', 'new_season'])
+History.__doc__ = """
+The match history, oldest first: teams is a (4, n) array of player codes (player1,
+player1b, player2, player2b; -1 where empty), winner is 1 or 2 (0 if unrated) and
+new_season marks the first match of each season.
+"""
+
+def load_history():
+    """Reads every season's matches, archives included, into a History."""
+    matches = db.get_match_columns()
+    order = np.lexsort((matches.id, matches.ts, matches.season_id))
+    season_ids = matches.season_id[order]
+    new_season = np.ones(len(order), dtype=bool)
+    new_season[1:] = season_ids[1:] != season_ids[:-1]
+    winner = np.where(np.isin(matches.winner, (1, 2)), matches.winner, 0)[order]
+    return History(matches.players()[:, order], winner, new_season)
+
+def replay_predictions(history, params_list):
+    """
+    Replays the history under each of params_list.
+    Returns:
+        (predictions, outcomes): predictions is a (params, rated matches) array of team 1's
+        expected score before each rated match, outcomes is 1 where team 1 won, else 0.
+    """
+    params = np.array(params_list, dtype=float).reshape(-1, 3)
+    k_factor, k_new_player, games_new_player = params.T
+    k_both = np.maximum(k_factor, k_new_player)
+    teams = history.teams
+    players = teams.max() + 1 if teams.size else 0
+    ratings = np.full((len(params), players), float(db.INITIAL_ELO))
+    games = np.zeros(players, dtype=np.int64)
+    rated = np.flatnonzero(history.winner)
+    predictions = np.empty((len(params), len(rated)))
+
+    # In singles the partner columns repeat the player, as in bootstrap.py
+    team1 = np.stack([teams[0], np.where(teams[1] >= 0, teams[1], teams[0])])
+    team2 = np.stack([teams[2], np.where(teams[3] >= 0, teams[3], teams[2])])
+    column = 0
+    for m in range(teams.shape[1]):
+        if history.new_season[m]:
+            ratings[:] = db.INITIAL_ELO
+        a, b, c, d = team1[0, m], team1[1, m], team2[0, m], team2[1, m]
+        if not history.winner[m]:
+            # Players are listed twice in singles, but a fancy-indexed += counts them once
+            games[[a, b, c, d]] += 1
+            continue
+        # Fancy indexing copies, so the updates below can't change these through a view
+        ra, rb, rc, rd = ratings[:, [a, b, c, d]].T
+        team1_avg = (ra + rb) / 2
+        team2_avg = (rc + rd) / 2
+        expected = 1 / (1 + 10 ** ((team2_avg - team1_avg) / 400))
+        predictions[:, column] = expected
+        column += 1
+
+        # The highest K-factor of the players, as in elo.rate_match
+        fewest = min(games[a], games[b], games[c], games[d])
+        most = max(games[a], games[b], games[c], games[d])
+        k = np.where(fewest < games_new_player, np.where(most >= games_new_player, k_both, k_new_player), k_factor)
+
+        if history.winner[m] == 1:
+            winner_avg, loser_avg, winner_expected = team1_avg, team2_avg, expected
+        else:
+            winner_avg, loser_avg, winner_expected = team2_avg, team1_avg, 1 - expected
+        winner_diff = np.round(np.round(winner_avg + k * (1 - winner_expected)) - winner_avg)
+        loser_diff = np.round(np.round(loser_avg - k / (1 + 10 ** ((winner_avg - loser_avg) / 400))) - loser_avg)
+        team1_diff, team2_diff = (winner_diff, loser_diff) if history.winner[m] == 1 else (loser_diff, winner_diff)
+        ratings[:, a] = ra + team1_diff
+        ratings[:, b] = rb + team1_diff
+        ratings[:, c] = rc + team2_diff
+        ratings[:, d] = rd + team2_diff
+        games[[a, b, c, d]] += 1
+    outcomes = (history.winner[rated] == 1).astype(float)
+    return predictions, outcomes
+
+def score(predictions, outcomes, bins=CALIBRATION_BINS):
+    """
+    Scores each row of predictions against outcomes.
+    Returns a list of dicts with 'log_loss', 'brier', 'ece' (expected calibration error)
+    and 'calibration', a list of (bin low, bin high, predictions, mean prediction, win rate).
+    """
+    count = predictions.shape[1]
+    p = np.clip(predictions, EPSILON, 1 - EPSILON)
+    log_loss = -(outcomes * np.log(p) + (1 - outcomes) * np.log(1 - p)).mean(axis=1) if count else np.full(len(p), np.nan)
+    brier = ((predictions - outcomes) ** 2).mean(axis=1) if count else np.full(len(p), np.nan)
+
+    # Calibration counts each match from both sides, so it doesn't depend on which team
+    # was entered first. All rows are binned at once with one bincount over (row, bin) pairs.
+    sides = np.concatenate([predictions, 1 - predictions], axis=1)
+    side_outcomes = np.concatenate([outcomes, 1 - outcomes])
+    bin_index = np.minimum((sides * bins).astype(np.int64), bins - 1)
+    flat = (np.arange(len(sides))[:, None] * bins + bin_index).ravel()
+    size = len(sides) * bins
+    counts = np.bincount(flat, minlength=size).reshape(-1, bins)
+    predicted = np.bincount(flat, weights=sides.ravel(), minlength=size).reshape(-1, bins)
+    wins = np.bincount(flat, weights=np.broadcast_to(side_outcomes, sides.shape).ravel(), minlength=size).reshape(-1, bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_predicted = predicted / counts
+        win_rate = wins / counts
+    ece = np.nansum(counts * np.abs(mean_predicted - win_rate), axis=1) / max(2 * count, 1)
+
+    results = []
+    for row in range(len(predictions)):
+        calibration = [
+            (i / bins, (i + 1) / bins, int(counts[row, i]), mean_predicted[row, i], win_rate[row, i])
+            for i in range(bins) if counts[row, i]
+        ]
+        results.append({
+            'log_loss': float(log_loss[row]),
+            'brier': float(brier[row]),
+            'ece': float(ece[row]),
+            'calibration': calibration,
+            'matches': count,
+        })
+    return results
+
+_history = None # Set in each pool worker by _init_worker
+
+def _init_worker(history):
+    global _history
+    _history = history
+
+def _evaluate_chunk(params_list):
+    # Runs in a pool worker, against the history it was started with
+    return score(*replay_predictions(_history, params_list))
+
+def evaluate(params_list, history=None, workers=None):
+    """
+    Replays the history under each of params_list and scores the predictions.
+    Returns a list of score() dicts, each with its 'params', sorted by log-loss.
+    """
+    params_list = [RatingParams(*params) for params in params_list]
+    if history is None:
+        history = load_history()
+    workers = min(workers or os.cpu_count() or 1, len(params_list))
+    chunks = [list(chunk) for chunk in np.array_split(np.arange(len(params_list)), workers) if len(chunk)]
+    if len(chunks) <= 1:
+        scores = score(*replay_predictions(history, params_list))
+    else:
+        # Workers are started fresh rather than forked from the Tk process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=context, initializer=_init_worker, initargs=(history,)) as pool:
+            parts = pool.map(_evaluate_chunk, [[params_list[i] for i in chunk] for chunk in chunks])
+            scores = [s for part in parts for s in part]
+    for params, result in zip(params_list, scores):
+        result['params'] = params
+    return sorted(scores, key=lambda r: r['log_loss'])
+
+def grid_params(grid=GRID):
+    """Every combination of the values in grid, a dict of RatingParams field -> values."""
+    return [RatingParams(*values) for values in itertools.product(*(grid[field] for field in RatingParams._fields))]
+
+def random_params(count, grid=GRID, seed=None):
+    """count parameter sets drawn uniformly from the ranges spanned by grid's values."""
+    rng = np.random.default_rng(seed)
+    columns = [rng.integers(min(grid[field]), max(grid[field]) + 1, size=count) for field in RatingParams._fields]
+    return [RatingParams(*(int(v) for v in values)) for values in zip(*columns)]
+
+def format_report(results, top=10, baseline=DEFAULT_PARAMS):
+    """Returns a text report of the best results, the baseline params and the best calibration."""
+    if not results or not results[0]['matches']:
+        return "No rated matches to evaluate."
+    header = f"{'Rank':>4}  {'K':>3} {'K new':>5} {'New for':>7}  {'Log-loss':>8} {'Brier':>7} {'ECE':>6}"
+    def row(rank, r):
+        p = r['params']
+        return f"{rank:>4}  {p.k_factor:>3} {p.k_new_player:>5} {p.games_new_player:>7}  {r['log_loss']:>8.4f} {r['brier']:>7.4f} {r['ece']:>6.3f}"
+
+    lines = [f"{len(results)} parameter sets evaluated over {results[0]['matches']} matches (lower is better)", "", header]
+    lines += [row(rank, r) for rank, r in enumerate(results[:top], start=1)]
+    ranks = {r['params']: rank for rank, r in enumerate(results, start=1)}
+    if baseline in ranks:
+        lines += ["", "Current defaults:", row(ranks[baseline], results[ranks[baseline] - 1])]
+
+    lines += ["", "Calibration of the best parameter set:", f"{'Predicted':<11} {'Sides':>7} {'Mean':>6} {'Won':>6}"]
+    for low, high, count, mean_predicted, win_rate in results[0]['calibration']:
+        lines.append(f"{low:.0%}-{high:.0%}".ljust(11) + f" {count:>7} {mean_predicted:>6.1%} {win_rate:>6.1%}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the rating rules' predictions over the match history.")
+    parser.add_argument("--db", default=db.DB_FILE, help="Database file")
+    parser.add_argument("--top", type=int, default=10, help="Number of parameter sets to list")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("grid", help="Evaluate every parameter set in the default grid")
+    random_cmd = commands.add_parser("random", help="Evaluate parameter sets drawn at random")
+    random_cmd.add_argument("--count", type=int, default=500)
+    random_cmd.add_argument("--seed", type=int, default=None)
+    single_cmd = commands.add_parser("params", help="Evaluate one parameter set")
+    single_cmd.add_argument("k_factor", type=int)
+    single_cmd.add_argument("k_new_player", type=int)
+    single_cmd.add_argument("games_new_player", type=int)
+    args = parser.parse_args()
+
+    db.DB_FILE = args.db
+    db.init_db()
+    if args.command == "grid":
+        candidates = grid_params()
+    elif args.command == "random":
+        candidates = random_params(args.count, seed=args.seed) + [DEFAULT_PARAMS]
+    else:
+        candidates = [RatingParams(args.k_factor, args.k_new_player, args.games_new_player)]
+    print(format_report(evaluate(candidates, workers=args.workers), top=args.top))
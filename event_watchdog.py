@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+import metrics
+
+# Everything in the app runs on the Tk main thread, so a slow query or plot freezes input.
+# The watchdog schedules a heartbeat with after() and measures how late each one runs.
+# While a heartbeat is overdue a background thread samples the main thread's stack, so
+# each stall in the log shows which handler was blocking.
+
+HEARTBEAT_MS = 200 # How often the heartbeat is scheduled
+LAG_THRESHOLD_MS = 500 # Lateness that counts as a stall
+MAX_SAMPLES_PER_STALL = 20
+MAX_EVENTS = 100 # Stalls kept in the log
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EVENT_LOOP_LAG_SECONDS = metrics.Histogram(
+    "elo_event_loop_lag_seconds", "How late each Tk heartbeat ran.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+def _blocking_frame(stack):
+    """Returns 'file.py:function' for the innermost frame of the app's own code in stack."""
+    for frame in reversed(stack):
+        if frame.filename.startswith(APP_DIR) and frame.filename != __file__:
+            return f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.name}"
+    return f"{os.path.basename(stack[-1].filename)}:{stack[-1].name}" if stack else "unknown"
+
+class Watchdog:
+    def __init__(self, root, interval_ms=HEARTBEAT_MS, threshold_ms=LAG_THRESHOLD_MS, max_events=MAX_EVENTS):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.events = deque(maxlen=max_events)
+        self._main_thread_id = threading.get_ident() # Created from the Tk thread
+        self._lock = threading.Lock()
+        self._samples = [] # Stacks sampled during the current stall
+        self._last_beat = time.monotonic()
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._last_beat = time.monotonic()
+        self.root.after(int(self.interval * 1000), self._beat)
+        threading.Thread(target=self._sample_loop, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            lag = now - self._last_beat - self.interval
+            samples, self._samples = self._samples, []
+            self._last_beat = now
+        EVENT_LOOP_LAG_SECONDS.observe(max(lag, 0.0))
+        if lag >= self.threshold:
+            self._log_stall(lag, samples)
+        if not self._stopped.is_set():
+            self.root.after(int(self.interval * 1000), self._beat)
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self.threshold / 2):
+            with self._lock:
+                overdue = time.monotonic() - self._last_beat - self.interval
+                if overdue < self.threshold or len(self._samples) >= MAX_SAMPLES_PER_STALL:
+                    continue
+                frame = sys._current_frames().get(self._main_thread_id)
+                if frame is not None:
+                    self._samples.append(traceback.extract_stack(frame))
+
+    def _log_stall(self, lag, samples):
+        blocking = Counter(_blocking_frame(stack) for stack in samples)
+        self.events.append({
+            'time': datetime.now(),
+            'lag': lag,
+            'blocking': blocking.most_common(),
+            'stack': "".join(traceback.format_list(samples[0])) if samples else "",
+        })
+        print(f"Watchdog: event loop blocked for {lag:.2f}s" + (f" in {blocking.most_common(1)[0][0]}" if samples else ""))
+
+    def format_log(self):
+        """Returns the stall log, most recent first, as text for the Admin tab."""
+        if not self.events:
+            return "No stalls recorded."
+        entries = []
+        for event in reversed(self.events):
+            lines = [f"{event['time']:%Y-%m-%d %H:%M:%S}  blocked for {event['lag']:.2f}s"]
+            for location, count in event['blocking']:
+                lines.append(f"  {location} ({count} sample{'s' if count != 1 else ''})")
+            if event['stack']:
+                lines.append("  First sample:")
+                lines.append("    " + event['stack'].rstrip().replace("\n", "\n    "))
+            entries.append("\n".join(lines))
+        return "\n\n".join(entries)
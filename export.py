@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import html
+import io
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import database as db
+from stats import draw_combined_heatmaps, draw_elo_graph
+
+# Exports the leaderboard, recent results, Elo graph and heatmaps as a static HTML site,
+# e.g. for a TV running a browser. Every file is keyed by a hash of what it shows and
+# a manifest of the hashes is kept in the site folder, so a run only rewrites the files
+# whose content changed. Pages are cheap strings and are hashed as rendered; images are
+# hashed by their input arrays and only drawn when those change. Files are written to a
+# temporary file and renamed into place, so a browser never reads half a file.
+#
+# Once the site folder exists (after the first export from the Admin tab or the command
+# line) it is updated in the background after every change.
+
+EXPORT_DIR = "site" # Relative to the DB file, with a folder per DB file
+MANIFEST_FILE = "manifest.json"
+RECENT_MATCHES = 50
+REFRESH_SECONDS = 60 # How often the pages reload themselves in the browser
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em; background: #1c1c1c; color: #eee; }
+nav a { color: #8bc34a; margin-right: 1.5em; font-size: 1.2em; }
+table { border-collapse: collapse; font-size: 1.4em; }
+th, td { padding: 0.3em 0.8em; text-align: center; }
+tr:nth-child(even) { background: #2a2a2a; }
+td.name { text-align: left; }
+.up { color: #4caf50; }
+.down { color: #f44336; }
+img { max-width: 100%; background: white; margin-bottom: 1em; }
+footer { margin-top: 2em; color: #888; }
+"""
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta http-equiv="refresh" content="{refresh}">
+<title>{title}</title>
+<link rel="stylesheet" href="style.css?v={style_hash}">
+</head>
+<body>
+<nav><a href="index.html">Leaderboard</a><a href="history.html">Recent Results</a><a href="graphs.html">Graphs</a></nav>
+<h1>{title}</h1>
+{body}
+<footer>{footer}</footer>
+</body>
+</html>
+"""
+
+_writer = ThreadPoolExecutor(max_workers=1) # Draws and writes in the background, one export at a time
+_pending = None # Future of the queued background export
+
+def export_dir():
+    """The site folder for the current DB file."""
+    stem = os.path.splitext(os.path.basename(db.DB_FILE))[0]
+    return os.path.join(os.path.dirname(db.DB_FILE), EXPORT_DIR, stem)
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def write_atomic(path, data):
+    """Writes data (bytes) to path via a temporary file in the same folder and a rename."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def render_png(draw, figsize):
+    """Draws on a new off-screen figure with draw(fig) and returns the PNG bytes."""
+    fig = Figure(figsize=figsize, dpi=100)
+    FigureCanvasAgg(fig)
+    draw(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+def _page(title, body, footer, style_hash):
+    return PAGE.format(refresh=REFRESH_SECONDS, title=html.escape(title), body=body,
+                       footer=html.escape(footer), style_hash=style_hash)
+
+def _signed(value):
+    if value is None:
+        return ""
+    css = "up" if value > 0 else "down" if value < 0 else ""
+    return f'<span class="{css}">{value:+d}</span>'
+
+def leaderboard_body(players, form):
+    rows = []
+    for rank, p in enumerate(players, start=1):
+        f = form.get(p['name'])
+        streak = (f"W{f['streak']}" if f['streak'] > 0 else f"L{-f['streak']}") if f else ""
+        recent = _signed(f['recent_elo_delta']) if f else ""
+        rows.append(
+            f"<tr><td>{rank}</td><td class=\"name\">{html.escape(p['name'])}</td><td>{p['current_elo']}</td>"
+            f"<td>{p['current_wins']}</td><td>{p['current_losses']}</td><td>{streak}</td><td>{recent}</td></tr>"
+        )
+    header = f"<tr><th>#</th><th>Name</th><th>Elo</th><th>Wins</th><th>Losses</th><th>Streak</th><th>Last {db.FORM_GAMES}</th></tr>"
+    return f"<table>\n{header}\n" + "\n".join(rows) + "\n</table>"
+
+def history_body(matches):
+    rows = []
+    for m in matches:
+        team1 = [(m.player1_name, m.player1_elo_before, m.player1_elo_after), (m.player1b_name, m.player1b_elo_before, m.player1b_elo_after)]
+        team2 = [(m.player2_name, m.player2_elo_before, m.player2_elo_after), (m.player2b_name, m.player2b_elo_before, m.player2b_elo_after)]
+        winners, losers = (team1, team2) if m.winner == 1 else (team2, team1)
+        def team(players):
+            return " &amp; ".join(
+                f"{html.escape(name)} {_signed(after - before) if None not in (before, after) else ''}"
+                for name, before, after in players if name
+            )
+        played = datetime.fromisoformat(m.date).strftime("%a %d %b %H:%M")
+        rows.append(f"<tr><td>{played}</td><td class=\"name\">{team(winners)}</td><td>def.</td><td class=\"name\">{team(losers)}</td></tr>")
+    if not rows:
+        return "<p>No matches played this season.</p>"
+    return "<table>\n" + "\n".join(rows) + "\n</table>"
+
+def collect():
+    """
+    Reads everything the site shows and returns {file name: (hash, render)}, where
+    render() returns the file's bytes. Pages are rendered here, images are only drawn
+    when render is called. Reads go through the read cache, so call this on the UI thread.
+    """
+    venue = db.get_current_venue()
+    site_title = "Pool Elo Tracker" if venue == db.DEFAULT_VENUE else f"Pool Elo Tracker - {venue}"
+    season = db.get_current_season()
+    style = STYLE.encode()
+    style_hash = content_hash(style)
+    files = {'style.css': (style_hash, lambda: style)}
+
+    players = db.get_leaderboard_players()
+    form, recent, images = {}, [], []
+    footer = "No active season"
+    if season:
+        form = db.get_form_stats(season['id'])
+        recent = list(itertools.islice(db.iter_matches(season['id'], newest_first=True), RECENT_MATCHES))
+        footer = season['name'] + (f" - last match {datetime.fromisoformat(recent[0].date):%a %d %b %Y %H:%M}" if recent else "")
+
+        matches = db.get_match_columns(season['id'])
+        if len(matches):
+            # Both images only depend on who played whom, who won and the Elo afterwards
+            data_hash = content_hash(matches.names, matches.id.tobytes(), matches.winner.tobytes(),
+                                     matches.players().tobytes(), matches.elo_after().tobytes())
+            files['elo.png'] = (data_hash, lambda: render_png(lambda fig: draw_elo_graph(fig, matches), (10, 6)))
+            files['heatmaps.png'] = (data_hash, lambda: render_png(lambda fig: draw_combined_heatmaps(fig, matches), (14, 6)))
+            images = [(name, data_hash) for name in ('elo.png', 'heatmaps.png')]
+
+    pages = {
+        'index.html': _page(f"{site_title} - Leaderboard", leaderboard_body(players, form), footer, style_hash),
+        'history.html': _page(f"{site_title} - Recent Results", history_body(recent), footer, style_hash),
+        'graphs.html': _page(
+            f"{site_title} - Graphs",
+            "\n".join(f'<img src="{name}?v={h}" alt="{name}">' for name, h in images) or "<p>No matches played this season.</p>",
+            footer, style_hash
+        ),
+    }
+    for name, page in pages.items():
+        data = page.encode()
+        files[name] = (content_hash(data), lambda data=data: data)
+    return files
+
+def write_site(files, out_dir):
+    """Writes the files whose hash differs from the manifest. Returns the names written."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    written = []
+    for name, (file_hash, render) in files.items():
+        path = os.path.join(out_dir, name)
+        if manifest.get(name) == file_hash and os.path.exists(path):
+            continue
+        write_atomic(path, render())
+        manifest[name] = file_hash
+        written.append(name)
+    if written:
+        write_atomic(manifest_path, json.dumps(manifest, indent=1).encode())
+    return written
+
+def export_site(out_dir=None):
+    """Exports the site now. Returns the names of the files that were rewritten."""
+    return write_site(collect(), out_dir or export_dir())
+
+def export_in_background():
+    """
+    Updates the site folder, if there is one, on a background thread. Called after every
+    change; an export still waiting to start is replaced by the newer one.
+    """
+    global _pending
+    out_dir = export_dir()
+    if not os.path.isdir(out_dir):
+        return None
+    files = collect()
+    if _pending is not None:
+        _pending.cancel()
+    _pending = _writer.submit(write_site, files, out_dir)
+    _pending.add_done_callback(_report_failure)
+    return _pending
+
+def _report_failure(future):
+    if not future.cancelled() and future.exception():
+        print(f"Site export failed: {future.exception()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the leaderboard, results and graphs as a static HTML site.")
+    parser.add_argument("--db", default=db.DB_FILE, help="Database file")
+    parser.add_argument("--out", default=None, help="Site folder (default: site/<db name> next to the database)")
+    args = parser.parse_args()
+
+    db.DB_FILE = args.db
+    db.init_db()
+    written = export_site(args.out)
+    print(f"{len(written)} file(s) updated in {args.out or export_dir()}" + (f": {', '.join(written)}" if written else ""))
@@ -1,85 +1,61 @@
-# Each function in this file handles migration from one specific version to the next.
-# They should be called in sequence to upgrade from an old version to the latest.
-# Each function receives a database connection object and performs the necessary schema changes and data transformations.
-
-def migrate_v0_to_v1(dbconn):
-    #Updates:
-    # - Create dbinfo table to track schema version
-    # - Set initial version to 1
-    cursor = dbconn.cursor()
-    # Create dbinfo table to track schema version
-    cursor.execute("""
+# Each migration upgrades the database from one version to the next.
+# MIGRATIONS maps each target version to a list of steps, applied in order by database.migrate_db.
+# A step is (description, statements) where statements is a list of SQL strings, or
+# (description, function) where the function receives the database connection.
+# Steps must be set-based (no row-by-row Python loops) and must not commit or start
+# transactions: the migration manager runs every version inside a SAVEPOINT, so a
+# failed or interrupted version is rolled back in place and can simply be re-run.
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+# v0 -> v1
+# - Create dbinfo table to track schema version
+V0_TO_V1 = [
+    ("Create dbinfo table", [
+        """
         CREATE TABLE IF NOT EXISTS dbinfo (
             key TEXT PRIMARY KEY,
             value TEXT NOT NULL
-        );
-    """)
-    # Set initial version to 1
-    cursor.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES ('db_version', '1');")
-    dbconn.commit()
-
-def migrate_v1_to_v2(dbconn):
-    # Updates:
-    # - Add columns to matches table for doubles matches and ELO tracking
-    # - Update existing records to set doubles_match to 0 (false)
-    # - Transfer existing ELO data to new columns if applicable
-    # - Remove old ELO columns and win_reason column
-    # - Replaced winner_name with winner column which represents the team (player1 or player2)
-    # - Add archive column to players table
-    # - Update db_version to 2
-
-    cursor = dbconn.cursor()
-
-    # Add doubles_match column to matches table
-    cursor.execute("ALTER TABLE matches ADD COLUMN doubles_match BOOLEAN NOT NULL DEFAULT 0;")
-    # Update existing records to set doubles_match to 0 (false)
-    cursor.execute("UPDATE matches SET doubles_match = 0 WHERE doubles_match IS NULL;")
-    # Add B PLayer Names
-    cursor.execute("ALTER TABLE matches ADD COLUMN player1b_name TEXT;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player2b_name TEXT;")
-    # Add ELO tracking columns for each player, with defaults for singles players that will be updated below
-    cursor.execute("ALTER TABLE matches ADD COLUMN player1_elo_before INTEGER NOT NULL DEFAULT -1;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player1_elo_after INTEGER NOT NULL DEFAULT -1;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player1b_elo_before INTEGER;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player1b_elo_after INTEGER;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player2_elo_before INTEGER NOT NULL DEFAULT -1;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player2_elo_after INTEGER NOT NULL DEFAULT -1;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player2b_elo_before INTEGER;")
-    cursor.execute("ALTER TABLE matches ADD COLUMN player2b_elo_after INTEGER;")
-
-    # Add winner column to represent the winning team (player1 or player2)
-    cursor.execute("ALTER TABLE matches ADD COLUMN winner INTEGER NOT NULL DEFAULT -1;")
-
-    # Transfer existing ELO data to new columns and replace those -1 defaults
-    cursor.execute("SELECT id, player1_name, player2_name, winner_name, winner_elo_before, winner_elo_after, loser_elo_before, loser_elo_after FROM matches;")
-    matches = cursor.fetchall()
-    for match in matches:
-        match_id, p1_name, p2_name, winner_name, winner_elo_before, winner_elo_after, loser_elo_before, loser_elo_after = match
-        if p1_name == winner_name:
-            p1_elo_before = winner_elo_before
-            p1_elo_after = winner_elo_after
-            p2_elo_before = loser_elo_before
-            p2_elo_after = loser_elo_after
-            winner = 1
-        else:
-            p1_elo_before = loser_elo_before
-            p1_elo_after = loser_elo_after
-            p2_elo_before = winner_elo_before
-            p2_elo_after = winner_elo_after
-            winner = 2
-        cursor.execute("""
-            UPDATE matches SET 
-                player1_elo_before = ?, player1_elo_after = ?,
-                player2_elo_before = ?, player2_elo_after = ?, winner = ?
-            WHERE id = ?;
-        """, (p1_elo_before, p1_elo_after, p2_elo_before, p2_elo_after, winner, match_id))
-
-    dbconn.commit()
-
-    # Remove old ELO columns, win_reason and winner_name column
-    cursor.execute("PRAGMA foreign_keys=off;")
-    cursor.execute("BEGIN TRANSACTION;")
-    cursor.execute("""
+        )
+        """,
+    ]),
+]
+
+# v1 -> v2
+# - Add columns to matches table for doubles matches and ELO tracking
+# - Transfer existing winner/loser ELO data to the per-player columns
+# - Replace winner_name with winner column which represents the team (player1 or player2)
+# - Remove old ELO columns and win_reason column
+# - Add archive column to players table
+V1_TO_V2 = [
+    ("Add doubles and per-player ELO columns to matches", [
+        "ALTER TABLE matches ADD COLUMN doubles_match BOOLEAN NOT NULL DEFAULT 0",
+        "ALTER TABLE matches ADD COLUMN player1b_name TEXT",
+        "ALTER TABLE matches ADD COLUMN player2b_name TEXT",
+        "ALTER TABLE matches ADD COLUMN player1_elo_before INTEGER NOT NULL DEFAULT -1",
+        "ALTER TABLE matches ADD COLUMN player1_elo_after INTEGER NOT NULL DEFAULT -1",
+        "ALTER TABLE matches ADD COLUMN player1b_elo_before INTEGER",
+        "ALTER TABLE matches ADD COLUMN player1b_elo_after INTEGER",
+        "ALTER TABLE matches ADD COLUMN player2_elo_before INTEGER NOT NULL DEFAULT -1",
+        "ALTER TABLE matches ADD COLUMN player2_elo_after INTEGER NOT NULL DEFAULT -1",
+        "ALTER TABLE matches ADD COLUMN player2b_elo_before INTEGER",
+        "ALTER TABLE matches ADD COLUMN player2b_elo_after INTEGER",
+        "ALTER TABLE matches ADD COLUMN winner INTEGER NOT NULL DEFAULT -1",
+    ]),
+    ("Transfer winner/loser ELO data to player columns", [
+        """
+        UPDATE matches SET
+            player1_elo_before = CASE WHEN player1_name = winner_name THEN winner_elo_before ELSE loser_elo_before END,
+            player1_elo_after = CASE WHEN player1_name = winner_name THEN winner_elo_after ELSE loser_elo_after END,
+            player2_elo_before = CASE WHEN player1_name = winner_name THEN loser_elo_before ELSE winner_elo_before END,
+            player2_elo_after = CASE WHEN player1_name = winner_name THEN loser_elo_after ELSE winner_elo_after END,
+            winner = CASE WHEN player1_name = winner_name THEN 1 ELSE 2 END
+        """,
+    ]),
+    ("Rebuild matches table without old columns", [
+        """
         CREATE TABLE matches_new (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             season_id INTEGER NOT NULL,
@@ -99,9 +75,9 @@ def migrate_v1_to_v2(dbconn):
             player2b_elo_after INTEGER,
             winner INTEGER NOT NULL,
             FOREIGN KEY (season_id) REFERENCES seasons (id)
-        );
-    """)
-    cursor.execute("""
+        )
+        """,
+        """
         INSERT INTO matches_new (
             id, season_id, date, player1_name, player1_elo_before, player1_elo_after,
             player1b_name, player1b_elo_before, player1b_elo_after,
@@ -115,18 +91,357 @@ def migrate_v1_to_v2(dbconn):
             player2_name, player2_elo_before, player2_elo_after,
             player2b_name, player2b_elo_before, player2b_elo_after,
             doubles_match, winner
-        FROM matches;
+        FROM matches
+        """,
+        "DROP TABLE matches",
+        "ALTER TABLE matches_new RENAME TO matches",
+    ]),
+    ("Add archive column to players", [
+        "ALTER TABLE players ADD COLUMN archive BOOLEAN NOT NULL DEFAULT 0",
+    ]),
+]
+
+# v2 -> v3
+# - Add archived_seasons table, which tracks completed seasons moved to archive files
+V2_TO_V3 = [
+    ("Create archived_seasons table", [
+        """
+        CREATE TABLE IF NOT EXISTS archived_seasons (
+            season_id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            match_count INTEGER NOT NULL,
+            archived_at TEXT NOT NULL,
+            FOREIGN KEY (season_id) REFERENCES seasons (id)
+        )
+        """,
+    ]),
+]
+
+# v3 -> v4
+# - Add season_rating_params table. Seasons without a row use the default K-factor rules
+V3_TO_V4 = [
+    ("Create season_rating_params table", [
+        """
+        CREATE TABLE IF NOT EXISTS season_rating_params (
+            season_id INTEGER PRIMARY KEY,
+            k_factor INTEGER NOT NULL,
+            k_new_player INTEGER NOT NULL,
+            games_new_player INTEGER NOT NULL,
+            FOREIGN KEY (season_id) REFERENCES seasons (id)
+        )
+        """,
+    ]),
+]
+
+# v4 -> v5
+# - Add player_timeline table, an index of each player's matches in chronological order
+# - Fill it from the live matches table and any archive files
+TIMELINE_SLOTS = (
+    # (player, partner, opponent 1, opponent 2, winning team)
+    ("player1", "player1b", "player2", "player2b", 1),
+    ("player1b", "player1", "player2", "player2b", 1),
+    ("player2", "player2b", "player1", "player1b", 2),
+    ("player2b", "player2", "player1", "player1b", 2),
+)
+
+def _timeline_select(player, partner, opponent1, opponent2, team):
+    return f"""
+        SELECT {player}_name, id, season_id, date, {player}_elo_before, {player}_elo_after,
+               winner = {team}, {partner}_name, {opponent1}_name, {opponent2}_name
+        FROM matches WHERE {player}_name IS NOT NULL
+    """
+
+def backfill_player_timeline(dbconn):
+    insert_sql = """
+        INSERT OR REPLACE INTO player_timeline (
+            player_name, match_id, season_id, date, elo_before, elo_after,
+            won, partner_name, opponent1_name, opponent2_name
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    for slot in TIMELINE_SLOTS:
+        dbconn.execute("INSERT OR REPLACE INTO player_timeline " + _timeline_select(*slot))
+
+    # Archive files can't be ATTACHed inside the migration transaction, so they are read
+    # through their own connections. Paths are relative to the main DB file.
+    db_dir = os.path.dirname(dbconn.execute("PRAGMA database_list").fetchone()[2])
+    for (path,) in dbconn.execute("SELECT DISTINCT path FROM archived_seasons").fetchall():
+        archive_conn = sqlite3.connect(os.path.join(db_dir, path))
+        try:
+            for slot in TIMELINE_SLOTS:
+                dbconn.executemany(insert_sql, archive_conn.execute(_timeline_select(*slot)))
+        finally:
+            archive_conn.close()
+
+V4_TO_V5 = [
+    ("Create player_timeline table", [
+        """
+        CREATE TABLE IF NOT EXISTS player_timeline (
+            player_name TEXT NOT NULL,
+            match_id INTEGER NOT NULL,
+            season_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            elo_before INTEGER,
+            elo_after INTEGER,
+            won BOOLEAN NOT NULL,
+            partner_name TEXT,
+            opponent1_name TEXT NOT NULL,
+            opponent2_name TEXT,
+            PRIMARY KEY (player_name, match_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    ("Fill player_timeline from match history", backfill_player_timeline),
+]
+
+# v5 -> v6
+# - Index player_timeline by season, so per-season form stats don't scan every player's history
+V5_TO_V6 = [
+    ("Index player_timeline by season", [
+        "CREATE INDEX IF NOT EXISTS idx_player_timeline_season ON player_timeline (season_id, player_name, match_id)",
+    ]),
+]
+
+# v6 -> v7
+# - Add oplog table, the append-only log of writes that sync.py exchanges between installs
+# - Give the database an install id
+# - Log the existing seasons, players and live matches as "legacy" ops. Their ids are built
+#   from the data itself, so two installs copied from the same DB agree on them
+V6_TO_V7 = [
+    ("Create oplog table", [
+        """
+        CREATE TABLE IF NOT EXISTS oplog (
+            op_id TEXT PRIMARY KEY,
+            origin TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            op TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            match_id INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_oplog_match ON oplog (match_id)",
+        "INSERT OR IGNORE INTO dbinfo (key, value) VALUES ('install_id', lower(hex(randomblob(16))))",
+    ]),
+    ("Log existing seasons, players and matches", [
+        """
+        INSERT OR IGNORE INTO oplog (op_id, origin, seq, ts, op, payload)
+        SELECT 'legacy:season:' || name, 'legacy', id, created_at, 'start_new_season', json_object('name', name)
+        FROM seasons
+        """,
+        """
+        INSERT OR IGNORE INTO oplog (op_id, origin, seq, ts, op, payload)
+        SELECT 'legacy:player:' || name, 'legacy', id, '', 'add_player', json_object('name', name, 'archive', archive)
+        FROM players
+        """,
+        """
+        INSERT OR IGNORE INTO oplog (op_id, origin, seq, ts, op, payload, match_id)
+        SELECT 'legacy:match:' || m.date || ':' || m.player1_name, 'legacy', m.id, m.date, 'record_match',
+               json_object(
+                   'season', s.name, 'date', m.date, 'doubles', m.doubles_match,
+                   'player1', m.player1_name, 'player1b', m.player1b_name,
+                   'player2', m.player2_name, 'player2b', m.player2b_name, 'winner', m.winner
+               ),
+               m.id
+        FROM matches m JOIN seasons s ON s.id = m.season_id
+        """,
+    ]),
+]
+
+# v7 -> v8
+# - Add tournaments, tournament_players and tournament_matches tables for tournament.py
+V7_TO_V8 = [
+    ("Create tournament tables", [
+        """
+        CREATE TABLE IF NOT EXISTS tournaments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            season_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            format TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            finished_at TEXT,
+            FOREIGN KEY (season_id) REFERENCES seasons (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tournament_players (
+            tournament_id INTEGER NOT NULL,
+            seed INTEGER NOT NULL,
+            player_name TEXT NOT NULL,
+            PRIMARY KEY (tournament_id, seed)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tournament_matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER NOT NULL,
+            bracket TEXT NOT NULL,
+            round INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+            player1_name TEXT,
+            player2_name TEXT,
+            winner INTEGER,
+            match_id INTEGER,
+            winner_to INTEGER,
+            winner_to_slot INTEGER,
+            loser_to INTEGER,
+            loser_to_slot INTEGER
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_tournament_matches ON tournament_matches (tournament_id, bracket, round, slot)",
+    ]),
+]
+
+# v8 -> v9
+# - Index player_timeline by match, so a match's rows can be found without a scan
+# - Add per-day and per-ISO-week activity rollups and fill them from player_timeline
+def _iso_week(date):
+    year, week, _ = datetime.fromisoformat(date[:10]).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def backfill_rollups(dbconn):
+    dbconn.create_function("iso_week", 1, _iso_week, deterministic=True)
+    for table, period, expression in (
+        ("player_daily_stats", "day", "substr(date, 1, 10)"),
+        ("player_weekly_stats", "week", "iso_week(date)"),
+    ):
+        dbconn.execute(f"""
+            INSERT OR REPLACE INTO {table} (season_id, {period}, player_name, games, wins, elo_delta)
+            SELECT season_id, {expression}, player_name, COUNT(*), SUM(won), COALESCE(SUM(elo_after - elo_before), 0)
+            FROM player_timeline
+            GROUP BY 1, 2, 3
+        """)
+    dbconn.execute("""
+        INSERT OR REPLACE INTO season_daily_stats (season_id, day, matches)
+        SELECT season_id, substr(date, 1, 10), COUNT(DISTINCT match_id)
+        FROM player_timeline
+        GROUP BY 1, 2
     """)
-    cursor.execute("DROP TABLE matches;")
-    cursor.execute("ALTER TABLE matches_new RENAME TO matches;")
-    cursor.execute("COMMIT;")
-    cursor.execute("PRAGMA foreign_keys=on;")
-
-    # Add archive column to players table
-    cursor.execute("ALTER TABLE players ADD COLUMN archive BOOLEAN NOT NULL DEFAULT 0;")
-    # Update existing records to set archive to 0 (false)
-    cursor.execute("UPDATE players SET archive = 0 WHERE archive IS NULL;")
-
-    # Update db_version to 2
-    cursor.execute("UPDATE dbinfo SET value = '2' WHERE key = 'db_version';")
-    dbconn.commit()
\ No newline at end of file
+
+V8_TO_V9 = [
+    ("Index player_timeline by match", [
+        "CREATE INDEX IF NOT EXISTS idx_player_timeline_match ON player_timeline (match_id)",
+    ]),
+    ("Create activity rollup tables", [
+        """
+        CREATE TABLE IF NOT EXISTS player_daily_stats (
+            season_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            player_name TEXT NOT NULL,
+            games INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            elo_delta INTEGER NOT NULL,
+            PRIMARY KEY (season_id, day, player_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS player_weekly_stats (
+            season_id INTEGER NOT NULL,
+            week TEXT NOT NULL,
+            player_name TEXT NOT NULL,
+            games INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            elo_delta INTEGER NOT NULL,
+            PRIMARY KEY (season_id, week, player_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS season_daily_stats (
+            season_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            matches INTEGER NOT NULL,
+            PRIMARY KEY (season_id, day)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    ("Fill activity rollups from player_timeline", backfill_rollups),
+]
+
+# v9 -> v10
+# - Add matches.ts, the match time as integer milliseconds since 1970-01-01 on the same
+#   local clock as date, indexed as (ts, id) and (season_id, ts, id)
+# - Archive files get the same column and indexes. They can't take part in the migration
+#   transaction, so each is upgraded in its own, and every part of the upgrade is skipped
+#   where it is already done
+EPOCH = datetime(1970, 1, 1)
+
+def _to_ts(date):
+    return (datetime.fromisoformat(date) - EPOCH) // timedelta(milliseconds=1)
+
+def _add_match_ts(dbconn):
+    dbconn.create_function("to_ts", 1, _to_ts, deterministic=True)
+    columns = [row[1] for row in dbconn.execute("PRAGMA table_info(matches)").fetchall()]
+    if "ts" not in columns:
+        dbconn.execute("ALTER TABLE matches ADD COLUMN ts INTEGER")
+    dbconn.execute("UPDATE matches SET ts = to_ts(date) WHERE ts IS NULL")
+    dbconn.execute("CREATE INDEX IF NOT EXISTS idx_matches_ts ON matches (ts, id)")
+    dbconn.execute("CREATE INDEX IF NOT EXISTS idx_matches_season_ts ON matches (season_id, ts, id)")
+
+def add_match_ts(dbconn):
+    """
+    Adds matches.ts to the live DB and every archive file. Archives are committed on their
+    own, so if a later step fails they stay upgraded while the live DB rolls back. The
+    upgrade is idempotent (the column is only added if missing, only rows without ts are
+    filled and the indexes are created if not there), so running the migration again
+    finishes any archive left part way and leaves the rest unchanged.
+    """
+    _add_match_ts(dbconn)
+    db_file = dbconn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_file:
+        return # A dry run on an in-memory copy mustn't change the real archive files
+    db_dir = os.path.dirname(db_file)
+    for (path,) in dbconn.execute("SELECT DISTINCT path FROM archived_seasons").fetchall():
+        archive_conn = sqlite3.connect(os.path.join(db_dir, path))
+        try:
+            with archive_conn:
+                _add_match_ts(archive_conn)
+        finally:
+            archive_conn.close()
+
+V9_TO_V10 = [
+    ("Add indexed integer timestamps to matches", add_match_ts),
+]
+
+# v10 -> v11
+# - Index oplog by (origin, seq), so append_op finds the next seq without a scan. Legacy
+#   ops reuse table ids as seq and are left out of the (unique) index
+V10_TO_V11 = [
+    ("Index oplog by origin and sequence number", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_oplog_origin_seq ON oplog (origin, seq) WHERE origin <> 'legacy'",
+    ]),
+]
+
+# v11 -> v12
+# - Add player_timeline.ts (the match's matches.ts) and index it, so timelines and form
+#   stats are ordered by (ts, match_id) like matches. Matches merged by sync get new local
+#   ids, so match_id alone doesn't follow play order
+def add_timeline_ts(dbconn):
+    dbconn.create_function("to_ts", 1, _to_ts, deterministic=True)
+    columns = [row[1] for row in dbconn.execute("PRAGMA table_info(player_timeline)").fetchall()]
+    if "ts" not in columns:
+        dbconn.execute("ALTER TABLE player_timeline ADD COLUMN ts INTEGER")
+    # Timeline rows carry their match's date, so this gives the same value as matches.ts
+    dbconn.execute("UPDATE player_timeline SET ts = to_ts(date) WHERE ts IS NULL")
+
+V11_TO_V12 = [
+    ("Add match timestamps to player_timeline", add_timeline_ts),
+    ("Index player_timeline by timestamp", [
+        "DROP INDEX IF EXISTS idx_player_timeline_season",
+        "CREATE INDEX idx_player_timeline_season ON player_timeline (season_id, player_name, ts, match_id)",
+        "CREATE INDEX IF NOT EXISTS idx_player_timeline_ts ON player_timeline (player_name, ts, match_id)",
+    ]),
+]
+
+MIGRATIONS = {
+    1: V0_TO_V1,
+    2: V1_TO_V2,
+    3: V2_TO_V3,
+    4: V3_TO_V4,
+    5: V4_TO_V5,
+    6: V5_TO_V6,
+    7: V6_TO_V7,
+    8: V7_TO_V8,
+    9: V8_TO_V9,
+    10: V9_TO_V10,
+    11: V10_TO_V11,
+    12: V11_TO_V12,
+}
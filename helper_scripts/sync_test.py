@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+
+# Checks that two installs hold the same history after a sync. Matches are recorded on
+# two new DB files in alternating order, so the matches merged into each file get local
+# ids out of play order, and then both files must show the same timelines and form.
+# Run from anywhere: python helper_scripts/sync_test.py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database as db
+import sync
+
+PLAYERS = ("A", "B", "C")
+RESULTS = [("A", "B", 1), ("A", "C", 2), ("B", "C", 1), ("A", "B", 2), ("A", "C", 1), ("B", "A", 1)]
+
+def use(db_file):
+    db.DB_FILE = db_file
+    db.init_db()
+
+def check_sync(files):
+    for db_file in files:
+        use(db_file)
+        for name in PLAYERS:
+            db.add_player(name)
+    sync.sync_files(*files)
+
+    # Alternate between the files, so each only holds every other match
+    for i, (player1, player2, winner) in enumerate(RESULTS):
+        use(files[i % 2])
+        db.record_results([db.MatchResult(player1, player2, winner)])
+        time.sleep(0.01) # Distinct dates, as matches on separate tables would have
+    sync.sync_files(*files)
+
+    views = []
+    for db_file in files:
+        use(db_file)
+        season_id = db.get_current_season()['id']
+        views.append({
+            'form': db.get_form_stats(season_id),
+            # Match ids are local to each file
+            'timelines': {
+                name: [{k: v for k, v in row.items() if k != 'match_id'} for row in db.get_player_timeline(name)]
+                for name in PLAYERS
+            },
+        })
+    for key in ('form', 'timelines'):
+        assert views[0][key] == views[1][key], f"{key} differs after sync:\n{views[0][key]}\n{views[1][key]}"
+
+def main():
+    start_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder) # Backups and journals are written relative to the working directory
+        try:
+            check_sync([os.path.join(folder, "a.db"), os.path.join(folder, "b.db")])
+        finally:
+            os.chdir(start_dir)
+    print("Both files show the same form and timelines after the sync.")
+
+if __name__ == "__main__":
+    main()
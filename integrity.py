@@ -0,0 +1,166 @@
+import database as db
+
+# The players table holds denormalized counters (current_elo, current_wins, current_losses,
+# total_lifetime_games) that record_results and delete_last_match update by hand. This module
+# recomputes them from the matches table and checks that every match's elo_before follows
+# on from the same player's previous elo_after in that season.
+#
+# A full check scans every season (including archive files). An incremental check only looks
+# at matches recorded since the last clean check, so it is cheap enough to run at startup.
+
+CHECKPOINT_KEY = 'integrity_checkpoint' # dbinfo key holding the last verified match id
+
+def _appearances_sql(matches_table, where="1"):
+    # One row per player per match, so aggregates can be computed with a single GROUP BY
+    slots = [
+        ("player1", "winner = 1", ""),
+        ("player1b", "winner = 1", "AND player1b_name IS NOT NULL"),
+        ("player2", "winner = 2", ""),
+        ("player2b", "winner = 2", "AND player2b_name IS NOT NULL"),
+    ]
+    return " UNION ALL ".join(f"""
+        SELECT id, season_id, date, ts, {slot}_name AS name, {slot}_elo_before AS elo_before,
+               {slot}_elo_after AS elo_after, {won} AS won
+        FROM {matches_table} WHERE ({where}) {extra}
+    """ for slot, won, extra in slots)
+
+def _season_aggregates(conn, season_id, names=None):
+    """Returns {name: (wins, losses, last elo_after)} for a live season."""
+    rows = conn.execute(f"""
+        WITH appearances AS ({_appearances_sql("matches", "season_id = :season_id")})
+        SELECT name,
+               SUM(won) AS wins,
+               SUM(1 - won) AS losses,
+               MAX(CASE WHEN newest = 1 THEN elo_after END) AS last_elo
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY name ORDER BY ts DESC, id DESC) AS newest
+            FROM appearances
+        )
+        GROUP BY name
+    """, {'season_id': season_id}).fetchall()
+    return {
+        row['name']: (row['wins'], row['losses'], row['last_elo'])
+        for row in rows if names is None or row['name'] in names
+    }
+
+def _lifetime_games(conn):
+    """Returns {name: games} counted across the live DB and every archive file."""
+    totals = {}
+    for matches_table in db.all_matches_tables(conn):
+        for row in conn.execute(f"""
+            SELECT name, COUNT(*) AS games FROM ({_appearances_sql(matches_table)}) GROUP BY name
+        """).fetchall():
+            totals[row['name']] = totals.get(row['name'], 0) + row['games']
+    return totals
+
+def _chain_breaks(conn, matches_table, after_id=0):
+    """
+    Returns matches (after after_id) where a player's elo_before doesn't equal their
+    previous elo_after in the same season (or INITIAL_ELO for their first match).
+    """
+    rows = conn.execute(f"""
+        WITH recent_seasons AS (SELECT DISTINCT season_id FROM {matches_table} WHERE id > :after_id),
+        appearances AS ({_appearances_sql(matches_table, "season_id IN (SELECT season_id FROM recent_seasons)")}),
+        chained AS (
+            SELECT id, season_id, name, elo_before,
+                   LAG(elo_after, 1, :initial_elo) OVER (PARTITION BY season_id, name ORDER BY ts, id) AS expected
+            FROM appearances
+        )
+        SELECT id, season_id, name, elo_before, expected FROM chained
+        WHERE id > :after_id AND elo_before IS NOT expected
+        ORDER BY id
+    """, {'after_id': after_id, 'initial_elo': db.INITIAL_ELO}).fetchall()
+    return [dict(row) for row in rows]
+
+def _read_checkpoint(conn):
+    row = conn.execute("SELECT value FROM dbinfo WHERE key = ?", (CHECKPOINT_KEY,)).fetchone()
+    return int(row['value']) if row else 0
+
+def check_integrity(repair=False, incremental=False):
+    """
+    Checks the players table and Elo chains against the match history.
+    Args:
+        repair (bool): If True, players' counters are rewritten from the recomputed values.
+            Chain breaks are only reported; re-rate the season to fix them. A full repair
+            also rebuilds the activity rollups.
+        incremental (bool): If True, only matches since the last clean check are verified,
+            and only the current-season stats of the players in them. Lifetime game totals
+            are only verified by a full check.
+    Returns:
+        dict with 'mismatches' (per-player differences), 'chain_breaks', 'checked_from'
+        (match id the check started after) and 'repaired'.
+    """
+    current_season = db.get_current_season()
+    conn = db.get_db_connection()
+    try:
+        checkpoint = _read_checkpoint(conn) if incremental else 0
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM matches").fetchone()[0]
+        report = {'mismatches': [], 'chain_breaks': [], 'checked_from': checkpoint, 'repaired': False}
+        if incremental and last_id <= checkpoint:
+            return report
+
+        # Elo chain continuity
+        if incremental:
+            report['chain_breaks'] = _chain_breaks(conn, "matches", checkpoint)
+        else:
+            for matches_table in db.all_matches_tables(conn):
+                report['chain_breaks'] += _chain_breaks(conn, matches_table)
+
+        # Denormalized player counters
+        names = None
+        if incremental:
+            names = {row['name'] for row in conn.execute(
+                f"SELECT DISTINCT name FROM ({_appearances_sql('matches', 'id > :after_id')})", {'after_id': checkpoint}
+            ).fetchall()}
+        season = _season_aggregates(conn, current_season['id'], names) if current_season else {}
+        lifetime = None if incremental else _lifetime_games(conn)
+
+        players = conn.execute("SELECT * FROM players").fetchall()
+        for player in players:
+            name = player['name']
+            if names is not None and name not in names:
+                continue
+            wins, losses, elo = season.get(name, (0, 0, db.INITIAL_ELO))
+            expected = {'current_elo': elo, 'current_wins': wins, 'current_losses': losses}
+            if lifetime is not None:
+                expected['total_lifetime_games'] = lifetime.get(name, 0)
+            for column, value in expected.items():
+                if player[column] != value:
+                    report['mismatches'].append({'name': name, 'column': column, 'stored': player[column], 'expected': value})
+
+        if repair and report['mismatches']:
+            for m in report['mismatches']:
+                # Column names come from the fixed list above, never from user input
+                conn.execute(f"UPDATE players SET {m['column']} = ? WHERE name = ?", (m['expected'], m['name']))
+            report['repaired'] = True
+        changed = report['repaired']
+        if repair and not incremental:
+            # The activity rollups are derived from player_timeline too, so rebuild them
+            db.rebuild_rollups(conn)
+            changed = True
+
+        # Only move the checkpoint forward once everything up to last_id is consistent
+        if not report['chain_breaks'] and (report['repaired'] or not report['mismatches']):
+            if last_id != _read_checkpoint(conn):
+                conn.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES (?, ?)", (CHECKPOINT_KEY, str(last_id)))
+                changed = True
+        # A check that found nothing to write leaves the file (and the read cache) alone
+        if changed:
+            conn.commit()
+            db.mark_data_changed()
+        return report
+    finally:
+        conn.close()
+
+def format_report(report):
+    """Returns a human readable summary of a check_integrity report."""
+    lines = []
+    for m in report['mismatches']:
+        lines.append(f"{m['name']}: {m['column']} is {m['stored']}, expected {m['expected']}")
+    for b in report['chain_breaks']:
+        lines.append(f"Match {b['id']} (season {b['season_id']}): {b['name']} starts at {b['elo_before']}, previous Elo was {b['expected']}")
+    if not lines:
+        return "No problems found."
+    if report['repaired']:
+        lines.append("Player stats have been repaired.")
+    return "\n".join(lines)
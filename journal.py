@@ -0,0 +1,82 @@
+import os
+import shutil
+import sqlite3
+import database as db
+import sync
+
+# Point-in-time restore. The journal (see database.flush_journal) holds every op ever
+# committed, so the DB as of any time can be rebuilt by taking the newest backup from
+# before that time and replaying the ops journaled after that backup, up to the chosen
+# time, with the same merge code as sync. Backups record the journal size when they were
+# taken (dbinfo 'journal_offset'); older backups replay the whole journal, and ops they
+# already contain are skipped. The live DB is only replaced on request.
+
+PRE_RESTORE_PREFIX = "pre-restore" # Backups of the live DB taken just before it is replaced
+
+def find_backup(target, backup_dir=None):
+    """Returns the path of the newest backup taken at or before target (a datetime), or None."""
+    backup_dir = backup_dir or db.get_backup_dir()
+    if not os.path.exists(backup_dir):
+        return None
+    backups = []
+    for fname in os.listdir(backup_dir):
+        # Pre-restore backups hold history the restore discarded, so they're never a base
+        if not fname.endswith('.db') or fname.startswith(PRE_RESTORE_PREFIX):
+            continue
+        taken = db.backup_file_time(fname)
+        if taken and taken <= target:
+            backups.append((taken, fname))
+    return os.path.join(backup_dir, max(backups)[1]) if backups else None
+
+def restore_to(target, output_path=None, backup_dir=None, journal_path=None):
+    """
+    Builds a copy of the database as it was at target from a backup and the journal.
+    Args:
+        target (datetime): Point in time to restore to.
+        output_path (str, optional): Where to write the copy. Defaults to
+            '<db name>-restored-YYYYMMDD-HHMMSS.db' next to the live DB.
+    Returns:
+        str: output_path
+    """
+    backup = find_backup(target, backup_dir)
+    if not backup:
+        raise ValueError(f"There is no backup from before {target:%Y-%m-%d %H:%M} to restore from.")
+    if not output_path:
+        stem = os.path.splitext(db.DB_FILE)[0]
+        output_path = f"{stem}-restored-{target:%Y%m%d-%H%M%S}.db"
+    shutil.copy2(backup, output_path)
+    db.migrate_db(output_path)
+
+    conn = sqlite3.connect(output_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT value FROM dbinfo WHERE key = 'journal_offset'").fetchone()
+        cutoff = target.isoformat()
+        ops = [op for op in db.read_journal(journal_path, int(row[0]) if row else 0) if op['ts'] <= cutoff]
+        since = sync.merge_ops(conn, ops)
+        if since is not None:
+            sync.rerate_from(conn, since)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"Restored {backup} and {len(ops)} journaled ops to {target:%Y-%m-%d %H:%M:%S} as {output_path}")
+    return output_path
+
+def replace_live_db(restored_path):
+    """
+    Makes a restored copy the live database. The current DB is backed up first, and the
+    restored DB is backed up afterwards so later restores start from it rather than from
+    a backup holding the discarded history. It also gets a new install id, so its new ops
+    can't reuse the ids of discarded ones.
+    """
+    if not db.backup_database(prefix=PRE_RESTORE_PREFIX):
+        raise OSError("Could not back up the current database, so it was not replaced.")
+    sync.new_install_id(restored_path)
+    shutil.copy2(restored_path, db.DB_FILE)
+    db.forget_journal_position()
+    db.mark_data_changed()
+    db.flush_journal()
+    db.backup_database()
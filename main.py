@@ -3,22 +3,31 @@ import tkinter as tk
 from tkinter import ttk, messagebox, font
 from datetime import datetime
 import sv_ttk
+import multiprocessing
 import os
 import sys
 
 # Import local modules
 import database as db
+import integrity
+import metrics
+import event_watchdog
+import export
 from ui import graph
 from ui import admin
 from ui import leaderboard
 from ui import history
 from ui import record
+from ui import profile
+from ui import tournament
+from ui import activity
+from ui import kiosk
 
 # --- Main Application Class ---
 class EloApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("Pool Elo Tracker")
+        self.update_title()
 
         # --- Main UI Setup ---
         self.notebook = ttk.Notebook(self.root)
@@ -40,19 +49,49 @@ class EloApp:
         self.recordTab = record.RecordTab(self.notebook, self) # Create record tab instance
         self.historyTab = history.HistoryTab(self.notebook, self) # Create history tab instance
         self.graphTab = graph.GraphTab(self.notebook, self) # Create graph tab instance
+        self.profileTab = profile.ProfileTab(self.notebook, self) # Create profile tab instance
+        self.tournamentTab = tournament.TournamentTab(self.notebook, self) # Create tournament tab instance
+        self.activityTab = activity.ActivityTab(self.notebook, self) # Create activity tab instance
         self.adminTab = admin.AdminTab(self.notebook, self) # Create admin tab instance
 
         # --- Initial Data Load ---
         self.refresh_all_views()
+        metrics.start_export(self.root)
+        self.watchdog = event_watchdog.Watchdog(self.root)
+        self.watchdog.start()
+
+    def update_title(self):
+        venue = db.get_current_venue()
+        if venue == db.DEFAULT_VENUE:
+            self.root.title("Pool Elo Tracker")
+        else:
+            self.root.title(f"Pool Elo Tracker - {venue}")
+
+    def on_venue_changed(self):
+        # Called by the admin tab after switching venue
+        self.update_title()
+        self.refresh_all_views()
 
     def refresh_all_views(self):
         # Master function to refresh all data-driven UI component
         print("Refreshing all views...")
         
-        self.recordTab.refresh_player_selectors()
-        self.leaderboardTab.refresh_leaderboard()
-        self.graphTab.refresh_season_selector() # This will trigger graph/history refresh
-        self.historyTab.refresh_history()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="record"):
+            self.recordTab.refresh_player_selectors()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="leaderboard"):
+            self.leaderboardTab.refresh_leaderboard()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="graph"):
+            self.graphTab.refresh_season_selector() # This will trigger graph/history refresh
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="history"):
+            self.historyTab.refresh_history()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="profile"):
+            self.profileTab.refresh_profile()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="tournament"):
+            self.tournamentTab.refresh_tournaments()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="activity"):
+            self.activityTab.refresh_activity()
+        with metrics.timer(metrics.UI_REFRESH_SECONDS, tab="export"):
+            export.export_in_background() # Only if a site has been exported before
 
         # Do a backup check
         auto_backup()
@@ -61,7 +100,7 @@ class EloApp:
 def auto_backup():
     # Auto-backup if last backup is older than 24 hours
     try:
-        last_backup = db.get_last_backup_time('backups')
+        last_backup = db.get_last_backup_time()
         now = datetime.now()
         if (not last_backup) or ((now - last_backup).total_seconds() > 86400):
             db.backup_database()
@@ -80,9 +119,37 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 if __name__ == "__main__":
+    # Needed for the bootstrap process pool in PyInstaller builds
+    multiprocessing.freeze_support()
+
+    if "--kiosk" in sys.argv[1:]:
+        # Display only: the DB is opened read-only, so nothing is created, migrated or checked
+        if not os.path.exists(db.DB_FILE):
+            sys.exit(f"{db.DB_FILE} not found; run the tracker normally first to create it.")
+        db.set_read_only()
+        conn = db.get_db_connection()
+        try:
+            version = db.read_db_version(conn)
+        finally:
+            conn.close()
+        if version != db.DB_VERSION:
+            sys.exit(f"{db.DB_FILE} is at version {version}; open it with the tracker first to upgrade it.")
+        root = tk.Tk()
+        root.iconphoto(True, tk.PhotoImage(file=resource_path("img/8-ball.png")))
+        sv_ttk.set_theme("dark")
+        kiosk.KioskApp(root)
+        root.mainloop()
+        sys.exit()
+
     # Initialize the database first if it doesn't exist
     db.init_db()
 
+    # Quick consistency check of matches recorded since the last clean check
+    report = integrity.check_integrity(incremental=True)
+    if report['mismatches'] or report['chain_breaks']:
+        print("Integrity check found problems (run a full check from the Admin tab):")
+        print(integrity.format_report(report))
+
     # Run the Tkinter application
     root = tk.Tk()
     icon = tk.PhotoImage(file=resource_path("img/8-ball.png"))
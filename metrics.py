@@ -0,0 +1,180 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Counters, histograms and gauges for kiosk monitoring, exported in the Prometheus text
+# format. Recording a value is a couple of dict operations under a lock, so it is cheap
+# enough for every DB call. The app writes METRICS_FILE every METRICS_INTERVAL_MS (for the
+# node_exporter textfile collector) and, if METRICS_PORT is set, serves /metrics on localhost.
+
+METRICS_FILE = "metrics.prom"
+METRICS_INTERVAL_MS = 15000
+METRICS_PORT = None # e.g. 9464 to serve http://127.0.0.1:9464/metrics
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_lock = threading.RLock()
+_registry = [] # Metrics in the order they were defined
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        if not self.values:
+            lines.append(f"{self.name} 0")
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values = {} # label key -> [per-bucket counts (last is +Inf), sum, count]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Gauge:
+    """A value read when the metrics are exported, from a function returning a number or None."""
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        _registry.append(self)
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+# --- Metrics ---
+
+MATCHES_RECORDED = Counter("elo_matches_recorded_total", "Matches recorded on this install.")
+DB_CALL_SECONDS = Histogram("elo_db_call_seconds", "Time spent in database functions (read cache misses and writes).")
+UI_REFRESH_SECONDS = Histogram("elo_ui_refresh_seconds", "Time taken to refresh each tab in refresh_all_views.")
+BACKUP_SECONDS = Histogram("elo_backup_seconds", "Time taken to back up the database.")
+
+@contextmanager
+def timer(histogram, **labels):
+    """Observes the time taken by the with block in histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+def timed(histogram):
+    """Decorator that observes each call's duration in histogram, labelled with the function name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, function=func.__name__)
+        return wrapper
+    return decorator
+
+# --- Export ---
+
+def render():
+    """Returns all metrics in the Prometheus text format."""
+    with _lock:
+        lines = []
+        for metric in _registry:
+            lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path=METRICS_FILE):
+    # Written to a temporary file and renamed, so a scraper never reads half a file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Don't print a line for every scrape
+
+def serve(port=METRICS_PORT, host="127.0.0.1"):
+    """Serves /metrics from a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+def start_export(root):
+    """Writes METRICS_FILE every METRICS_INTERVAL_MS from the Tk event loop, and starts the server if configured."""
+    if METRICS_PORT:
+        serve(METRICS_PORT)
+
+    def export():
+        try:
+            write_textfile()
+        except OSError as e:
+            print(f"Metrics export failed: {e}")
+        root.after(METRICS_INTERVAL_MS, export)
+
+    root.after(METRICS_INTERVAL_MS, export)
@@ -0,0 +1,86 @@
+import bisect
+
+# In-memory player name index used for typeahead search on the record form.
+# The index is loaded once from the database and then updated in place, so typing
+# into a player selector never needs a DB round trip.
+
+MAX_RESULTS = 50 # Max number of suggestions shown in a selector
+
+class PlayerIndex:
+    """
+    Sorted index of player names supporting prefix and fuzzy search.
+    Results are ranked by match quality, then most recently active first.
+    """
+
+    def __init__(self):
+        self.players = {} # name -> {'archived': bool, 'last_played': str or None}
+        self.keys = [] # Sorted (casefolded name, name) pairs for prefix lookups
+        self.version = None
+
+    def load(self, rows, version=None):
+        """Rebuilds the index from rows with 'name', 'archive' and 'last_played' keys."""
+        self.players = {
+            row['name']: {'archived': bool(row['archive']), 'last_played': row['last_played']}
+            for row in rows
+        }
+        self.keys = sorted((name.casefold(), name) for name in self.players)
+        self.version = version
+
+    def __contains__(self, name):
+        return name in self.players
+
+    def is_archived(self, name):
+        return self.players[name]['archived']
+
+    def touch(self, names, when):
+        """Marks players as having just played, so they rank first in searches."""
+        for name in names:
+            if name in self.players:
+                self.players[name]['last_played'] = when
+
+    def _rank(self, names):
+        # Most recently active first, then alphabetical. ISO dates sort as strings.
+        by_name = sorted(names, key=str.casefold)
+        return sorted(by_name, key=lambda n: self.players[n]['last_played'] or '', reverse=True)
+
+    def search(self, text, include_archived=False, limit=MAX_RESULTS):
+        """
+        Returns player names matching text. Name prefixes rank first, then prefixes of
+        later words in the name, then fuzzy matches (the typed letters appear in order).
+        """
+        query = text.strip().casefold()
+
+        def visible(name):
+            return include_archived or not self.players[name]['archived']
+
+        if not query:
+            return self._rank([name for name in self.players if visible(name)])[:limit]
+
+        # Prefix matches are a contiguous run of the sorted keys
+        start = bisect.bisect_left(self.keys, (query,))
+        prefix = []
+        for key, name in self.keys[start:]:
+            if not key.startswith(query):
+                break
+            if visible(name):
+                prefix.append(name)
+        results = self._rank(prefix)
+        if len(results) >= limit:
+            return results[:limit]
+
+        seen = set(results)
+        word_prefix = []
+        fuzzy = []
+        for key, name in self.keys:
+            if name in seen or not visible(name):
+                continue
+            if any(word.startswith(query) for word in key.split()[1:]):
+                word_prefix.append(name)
+            elif _is_subsequence(query, key):
+                fuzzy.append(name)
+        results += self._rank(word_prefix) + self._rank(fuzzy)
+        return results[:limit]
+
+def _is_subsequence(query, text):
+    it = iter(text)
+    return all(char in it for char in query)
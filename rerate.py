@@ -0,0 +1,206 @@
+import database as db
+from elo import rate_match
+
+# Re-rating replays the match history under new K-factor rules and rewrites every
+# elo_before/elo_after column, so changing the rules doesn't leave history inconsistent.
+# All seasons are read in order because the K-factor depends on lifetime games played,
+# but only the chosen seasons are recalculated. Everything is written in one transaction.
+
+MATCH_ROWS_SQL = """
+    SELECT id, doubles_match, player1_name, player1b_name, player2_name, player2b_name, winner,
+           player1_elo_after, player1b_elo_after, player2_elo_after, player2b_elo_after
+    FROM {table}
+    WHERE season_id = ?
+    ORDER BY ts ASC, id ASC
+"""
+
+UPDATE_MATCH_SQL = """
+    UPDATE {table} SET
+        player1_elo_before = ?, player1_elo_after = ?,
+        player1b_elo_before = ?, player1b_elo_after = ?,
+        player2_elo_before = ?, player2_elo_after = ?,
+        player2b_elo_before = ?, player2b_elo_after = ?
+    WHERE id = ?
+"""
+
+def _teams(row):
+    _, doubles, p1, p1b, p2, p2b = row[:6]
+    team1 = [p1, p1b] if doubles and p1b else [p1]
+    team2 = [p2, p2b] if doubles and p2b else [p2]
+    return team1, team2
+
+def _new_standing():
+    return {'elo': db.INITIAL_ELO, 'wins': 0, 'losses': 0}
+
+def stored_standings(rows):
+    """Final Elo, wins and losses of every player in a season, as currently stored."""
+    standings = {}
+    for row in rows:
+        team1, team2 = _teams(row)
+        elo_after = dict(zip((row[2], row[3], row[4], row[5]), row[7:11]))
+        winners, losers = (team1, team2) if row[6] == 1 else (team2, team1)
+        for name in team1 + team2:
+            standing = standings.setdefault(name, _new_standing())
+            standing['elo'] = elo_after[name]
+            standing['wins' if name in winners else 'losses'] += 1
+    return standings
+
+def replay_season(rows, params, lifetime_games, ratings=None):
+    """
+    Replays a season's matches (oldest first) under params.
+    Args:
+        rows: Match rows as selected by MATCH_ROWS_SQL.
+        params: RatingParams to rate with.
+        lifetime_games: {name: games played before this season}. Updated in place.
+        ratings: Optional {name: elo} to start from instead of INITIAL_ELO.
+    Returns:
+        (updates, standings) where updates are parameter tuples for UPDATE_MATCH_SQL.
+    """
+    standings = {}
+    for name, elo in (ratings or {}).items():
+        standings[name] = _new_standing()
+        standings[name]['elo'] = elo
+    updates = []
+    for row in rows:
+        team1, team2 = _teams(row)
+        players = team1 + team2
+        for name in players:
+            standings.setdefault(name, _new_standing())
+        if row[6] not in (1, 2):
+            for name in players:
+                lifetime_games[name] = lifetime_games.get(name, 0) + 1
+            continue
+
+        winners, losers = (team1, team2) if row[6] == 1 else (team2, team1)
+        before = {name: standings[name]['elo'] for name in players}
+        k, winner_elos, loser_elos = rate_match(
+            [(before[name], lifetime_games.get(name, 0)) for name in winners],
+            [(before[name], lifetime_games.get(name, 0)) for name in losers],
+            params
+        )
+        after = dict(zip(winners, winner_elos))
+        after.update(zip(losers, loser_elos))
+
+        for name in players:
+            lifetime_games[name] = lifetime_games.get(name, 0) + 1
+            standings[name]['elo'] = after[name]
+            standings[name]['wins' if name in winners else 'losses'] += 1
+
+        p1, p1b, p2, p2b = row[2:6]
+        updates.append((
+            before[p1], after[p1], before.get(p1b), after.get(p1b),
+            before[p2], after[p2], before.get(p2b), after.get(p2b),
+            row[0]
+        ))
+    return updates, standings
+
+def leaderboard_diff(old, new):
+    """
+    Compares two {name: standing} dicts and returns rows sorted by new Elo with the old
+    and new Elo and rank of each player.
+    """
+    old_ranks = {name: i + 1 for i, name in enumerate(sorted(old, key=lambda n: -old[n]['elo']))}
+    rows = []
+    for rank, name in enumerate(sorted(new, key=lambda n: -new[n]['elo']), start=1):
+        rows.append({
+            'name': name,
+            'old_elo': old.get(name, {}).get('elo'),
+            'new_elo': new[name]['elo'],
+            'old_rank': old_ranks.get(name),
+            'new_rank': rank,
+        })
+    return rows
+
+def rerate_seasons(season_ids, params=None, dry_run=False):
+    """
+    Replays all matches of the given seasons and updates their Elo columns and, if the
+    current season is included, the players' current stats.
+    Args:
+        season_ids: Seasons to re-rate.
+        params: RatingParams to use, stored as the seasons' new params. If None, each
+            season's stored params are used.
+        dry_run: If True nothing is written.
+    Returns:
+        {season_id: leaderboard_diff rows}
+    """
+    targets = set(season_ids)
+    current_season = db.get_current_season()
+    conn = db.get_db_connection()
+    conn.row_factory = None
+    try:
+        target_ids = [row[0] for row in conn.execute("SELECT id FROM seasons ORDER BY id").fetchall() if row[0] in targets]
+        # Only the target seasons' archives are attached; the lifetime games played before
+        # each of them come from player_timeline, which covers archived seasons too
+        with db.seasons_matches_tables(conn, target_ids) as tables:
+            results = {}
+            pending = []
+            for season_id in target_ids:
+                rows = conn.execute(MATCH_ROWS_SQL.format(table=tables[season_id]), (season_id,)).fetchall()
+                lifetime_games = {
+                    row[0]: row[1] for row in conn.execute("""
+                        SELECT player_name, COUNT(*) FROM player_timeline WHERE season_id < ? GROUP BY player_name
+                    """, (season_id,)).fetchall()
+                }
+                season_params = params or db.read_season_rating_params(conn, season_id)
+                updates, standings = replay_season(rows, season_params, lifetime_games)
+                results[season_id] = leaderboard_diff(stored_standings(rows), standings)
+                pending.append((season_id, season_params, updates, standings))
+
+            if dry_run:
+                return results
+
+            try:
+                for season_id, season_params, updates, standings in pending:
+                    conn.executemany(UPDATE_MATCH_SQL.format(table=tables[season_id]), updates)
+                    db.write_season_rating_params(conn, season_id, season_params)
+                    db.log_season_rating_params(conn, season_id, season_params, rerated=True)
+                    db.delete_timeline_rows(conn, "season_id = ?", (season_id,))
+                    db.insert_timeline_rows(conn, tables[season_id], "season_id = ?", (season_id,))
+                    if current_season and season_id == current_season['id']:
+                        conn.executemany("""
+                            UPDATE players SET current_elo = ?, current_wins = ?, current_losses = ?
+                            WHERE name = ?
+                        """, [(s['elo'], s['wins'], s['losses'], name) for name, s in standings.items()])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        db.mark_data_changed()
+        db.flush_journal()
+        print(f"Re-rated {len(pending)} season(s)")
+        return results
+    finally:
+        conn.close()
+
+def rerate_suffix(conn, season_id, since):
+    """
+    Re-rates the matches of a live season played at or after since (an ISO date), starting
+    from the stored ratings just before it. Runs inside the caller's transaction.
+    Returns:
+        {name: standing} for the whole season.
+    """
+    rows = conn.execute(MATCH_ROWS_SQL.format(table="matches"), (season_id,)).fetchall()
+    split = conn.execute(
+        "SELECT COUNT(*) FROM matches WHERE season_id = ? AND date < ?", (season_id, since)
+    ).fetchone()[0]
+    prefix = stored_standings(rows[:split])
+    lifetime_games = {
+        row[0]: row[1] for row in conn.execute("""
+            SELECT player_name, COUNT(*) FROM player_timeline
+            WHERE season_id < ? OR (season_id = ? AND date < ?)
+            GROUP BY player_name
+        """, (season_id, season_id, since)).fetchall()
+    }
+    ratings = {name: s['elo'] for name, s in prefix.items()}
+    updates, standings = replay_season(
+        rows[split:], db.read_season_rating_params(conn, season_id), lifetime_games, ratings
+    )
+    conn.executemany(UPDATE_MATCH_SQL.format(table="matches"), updates)
+    db.delete_timeline_rows(conn, "season_id = ? AND date >= ?", (season_id, since))
+    db.insert_timeline_rows(conn, "matches", "season_id = ? AND date >= ?", (season_id, since))
+
+    # replay_season started everyone from the prefix with no wins or losses
+    for name, standing in prefix.items():
+        standings[name]['wins'] += standing['wins']
+        standings[name]['losses'] += standing['losses']
+    return standings
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import numpy as np
+
+# Smoothing of a player's Elo series, over their own games only. Results are cached per
+# (series key, kernel, window); when the same series comes back with new games appended
+# (after a match is recorded) only the new points, plus the few at the end that the new
+# games affect, are computed.
+
+KERNELS = ("SMA", "EMA", "Gaussian")
+DEFAULT_KERNEL = "SMA"
+DEFAULT_WINDOW = 5 # Games
+MAX_WINDOW = 50
+CACHE_SIZE = 512 # Max number of smoothed series kept
+EMA_BLOCK = 128 # Points per matrix product in ema
+
+def sma(values, window):
+    """Trailing mean of up to the last window values at each point."""
+    values = np.asarray(values, dtype=float)
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+def ema(values, window, previous=None):
+    """
+    Exponential moving average with alpha = 2 / (window + 1), starting from previous (the
+    average before values[0]) or from values[0].
+    The recurrence is evaluated a block at a time as a matrix product with the powers of
+    (1 - alpha), which only ever go down, so long series don't overflow.
+    """
+    values = np.asarray(values, dtype=float)
+    alpha = 2 / (window + 1)
+    decay = 1 - alpha
+    out = np.empty_like(values)
+    if not len(values):
+        return out
+    if previous is None:
+        previous = values[0]
+    steps = np.arange(EMA_BLOCK)
+    lags = steps[:, None] - steps[None, :]
+    weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+    carry = decay ** (steps + 1)
+    for start in range(0, len(values), EMA_BLOCK):
+        block = values[start:start + EMA_BLOCK]
+        size = len(block)
+        out[start:start + size] = weights[:size, :size] @ block + carry[:size] * previous
+        previous = out[start + size - 1]
+    return out
+
+def gaussian_radius(window):
+    return max(window // 2, 1)
+
+def gaussian(values, window):
+    """
+    Centred Gaussian-weighted mean over window games (sigma = window / 4), renormalised
+    where the window runs off either end of the series.
+    """
+    values = np.asarray(values, dtype=float)
+    radius = gaussian_radius(window)
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / max(window / 4, 0.5)) ** 2)
+    # The full convolution, shifted by radius, lines each point up with its centred window
+    centred = slice(radius, radius + len(values))
+    weighted = np.convolve(values, kernel, mode='full')[centred]
+    norm = np.convolve(np.ones_like(values), kernel, mode='full')[centred]
+    return weighted / norm
+
+def smooth(values, kernel=DEFAULT_KERNEL, window=DEFAULT_WINDOW):
+    """Smooths a whole series with one of KERNELS."""
+    if window <= 1 or not len(values):
+        return np.asarray(values, dtype=float)
+    if kernel == "SMA":
+        return sma(values, window)
+    if kernel == "EMA":
+        return ema(values, window)
+    if kernel == "Gaussian":
+        return gaussian(values, window)
+    raise ValueError(f"Unknown smoothing kernel: {kernel}")
+
+def extend(values, smoothed, kernel, window):
+    """
+    Returns smooth(values, kernel, window) given smoothed, the result for a prefix of values.
+    Only the points the new values can change are computed.
+    """
+    done = len(smoothed)
+    if window <= 1 or done == 0:
+        return smooth(values, kernel, window)
+    values = np.asarray(values, dtype=float)
+    if kernel == "SMA":
+        # The new points only look back window - 1 values
+        start = max(done - (window - 1), 0)
+        tail = sma(values[start:], window)[done - start:]
+        return np.concatenate([smoothed, tail])
+    if kernel == "EMA":
+        return np.concatenate([smoothed, ema(values[done:], window, previous=smoothed[-1])])
+    if kernel == "Gaussian":
+        # The last radius points change, and each needs radius values either side
+        radius = gaussian_radius(window)
+        keep = max(done - radius, 0)
+        start = max(keep - radius, 0)
+        tail = gaussian(values[start:], window)[keep - start:]
+        return np.concatenate([smoothed[:keep], tail])
+    raise ValueError(f"Unknown smoothing kernel: {kernel}")
+
+class SmoothingCache:
+    """An LRU cache of smoothed series that extends entries when their series grows."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict() # (key, kernel, window) -> (values, smoothed)
+
+    def get(self, key, values, kernel=DEFAULT_KERNEL, window=DEFAULT_WINDOW):
+        """
+        Returns the smoothed values, reusing the cached result for key if values is the
+        same series or the same series with games appended.
+        """
+        values = np.array(values, dtype=float) # A copy, so the caller can't change the cached series
+        entry_key = (key, kernel, window)
+        entry = self.entries.get(entry_key)
+        if entry is not None:
+            cached_values, smoothed = entry
+            n = len(cached_values)
+            if n == len(values) and np.array_equal(cached_values, values):
+                self.entries.move_to_end(entry_key)
+                return smoothed
+            if n < len(values) and np.array_equal(cached_values, values[:n]):
+                smoothed = extend(values, smoothed, kernel, window)
+            else:
+                smoothed = smooth(values, kernel, window)
+        else:
+            smoothed = smooth(values, kernel, window)
+        smoothed.setflags(write=False) # Shared between callers
+        self.entries[entry_key] = (values, smoothed)
+        self.entries.move_to_end(entry_key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return smoothed
+
+_cache = SmoothingCache()
+
+def smooth_series(key, values, kernel=DEFAULT_KERNEL, window=DEFAULT_WINDOW):
+    """smooth() through the shared cache. key identifies the series, e.g. (season_id, player)."""
+    return _cache.get(key, values, kernel, window)
@@ -35,6 +35,113 @@ def show_heatmap(season_id=None):
     fig.tight_layout()
     plt.show()
 
+def season_players(matches):
+    """
+    Returns the sorted player names in a MatchColumns and an array mapping each
+    name code in the columns to its position in that sorted list.
+    """
+    players = sorted(matches.names)
+    positions = {name: i for i, name in enumerate(players)}
+    remap = np.array([positions[name] for name in matches.names], dtype=np.int32)
+    return players, remap
+
+def matchup_counts(matches, remap, size):
+    """Counts how often each player faced each other player (doubles count every pairing)."""
+    counts = np.zeros((size, size), dtype=float)
+    players = matches.players()
+    for a_slot in (0, 1):
+        for b_slot in (2, 3):
+            a, b = players[a_slot], players[b_slot]
+            present = (a >= 0) & (b >= 0)
+            index_a, index_b = remap[a[present]], remap[b[present]]
+            np.add.at(counts, (index_a, index_b), 1)
+            np.add.at(counts, (index_b, index_a), 1)
+    return counts
+
+def head_to_head_wins(matches, remap, size):
+    """
+    Returns a matrix where [i][j] is the number of times player i beat player j,
+    counted from the player1/player2 columns like db.get_head_to_head_wins.
+    """
+    wins = np.zeros((size, size), dtype=int)
+    p1, p2 = remap[matches.player1], remap[matches.player2]
+    p1_won = matches.winner == 1
+    p2_won = matches.winner == 2
+    np.add.at(wins, (p1[p1_won], p2[p1_won]), 1)
+    np.add.at(wins, (p2[p2_won], p1[p2_won]), 1)
+    return wins
+
+def elo_series(matches):
+    """
+    Returns {player: (ts, elo, season_id, index)} arrays with each player's Elo after
+    each of their own matches only, oldest first. index is the match's position in
+    matches.
+    """
+    players = matches.players()
+    elo_after = matches.elo_after()
+    played = (players >= 0) & (elo_after >= 0)
+    slot_codes = players[played]
+    match_index = np.nonzero(played)[1]
+    values = elo_after[played]
+    # By player, then by match, so each player's rows come out in date order
+    order = np.lexsort((match_index, slot_codes))
+    boundaries = np.searchsorted(slot_codes[order], np.arange(len(matches.names) + 1))
+
+    series = {}
+    for code, name in enumerate(matches.names):
+        rows = order[boundaries[code]:boundaries[code + 1]]
+        if len(rows):
+            index = match_index[rows]
+            series[name] = (matches.ts[index], values[rows], matches.season_id[index], index)
+    return series
+
+def draw_elo_graph(fig, matches):
+    """
+    Draws the Elo Graphs tab's games view of a season on fig, unsmoothed: every player
+    held at their rating between their games.
+    """
+    ax = fig.add_subplot(111)
+    steps = np.arange(len(matches) + 1)
+    for player, (ts, elos, season_ids, index) in elo_series(matches).items():
+        timeline = np.full(len(steps), np.nan)
+        timeline[0] = db.INITIAL_ELO
+        timeline[index + 1] = elos
+        last_played = np.maximum.accumulate(np.where(np.isnan(timeline), 0, steps))
+        ax.plot(steps, timeline[last_played], label=player)
+    ax.set_title("Elo Ratings Over Time")
+    ax.set_xlabel("Games Played in Season")
+    ax.set_ylabel("Elo Rating")
+    ax.grid(True)
+    ax.legend(fontsize='small')
+    fig.tight_layout()
+
+def lttb(x, y, threshold):
+    """
+    Largest-triangle-three-buckets downsampling. Returns the indices of at most threshold
+    points that keep the visual shape of the (x, y) line: the first and last points, and
+    from each bucket in between the point forming the largest triangle with the point
+    kept before it and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # threshold - 2 buckets between the first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
 def show_matchup_heatmap(season_id=None):
     if season_id is None:
         current_season = db.get_current_season()
@@ -42,47 +149,21 @@ def show_matchup_heatmap(season_id=None):
             return
         season_id = current_season['id']
 
-    matches = db.get_matches_for_season(season_id)
-    if not matches:
+    matches = db.get_match_columns(season_id)
+    if not len(matches):
         return
 
-    players = sorted({
-        name
-        for match in matches
-        for name in (
-            match.get('player1_name'),
-            match.get('player1b_name'),
-            match.get('player2_name'),
-            match.get('player2b_name'),
-        )
-        if name
-    })
+    players, remap = season_players(matches)
     if not players:
         return
 
-    player_index = {name: i for i, name in enumerate(players)}
-    matchup_counts = np.zeros((len(players), len(players)), dtype=float)
-
-    for match in matches:
-        team_a = [match['player1_name']]
-        if match.get('player1b_name'):
-            team_a.append(match['player1b_name'])
-        team_b = [match['player2_name']]
-        if match.get('player2b_name'):
-            team_b.append(match['player2b_name'])
-
-        for player_a in team_a:
-            for player_b in team_b:
-                index_a = player_index[player_a]
-                index_b = player_index[player_b]
-                matchup_counts[index_a][index_b] += 1
-                matchup_counts[index_b][index_a] += 1
-
-    row_totals = matchup_counts.sum(axis=1)
-    normalized = np.zeros_like(matchup_counts)
+    matchup_count_matrix = matchup_counts(matches, remap, len(players))
+
+    row_totals = matchup_count_matrix.sum(axis=1)
+    normalized = np.zeros_like(matchup_count_matrix)
     for i, total in enumerate(row_totals):
         if total > 0:
-            normalized[i, :] = matchup_counts[i, :] / total
+            normalized[i, :] = matchup_count_matrix[i, :] / total
 
     fig, ax = plt.subplots()
     im, cbar = heatmap(
@@ -94,7 +175,7 @@ def show_matchup_heatmap(season_id=None):
         cbarlabel="Share of Games",
         title="Opponent Matchup Share (Row player vs Column player)"
     )
-    texts = annotate_heatmap_with_counts(im, matchup_counts.astype(int), valfmt="{x:.1f}%")
+    texts = annotate_heatmap_with_counts(im, matchup_count_matrix.astype(int), valfmt="{x:.1f}%")
 
     fig.tight_layout()
     plt.show()
@@ -106,62 +187,40 @@ def show_combined_heatmaps(season_id=None):
             return
         season_id = current_season['id']
 
-    matches = db.get_matches_for_season(season_id)
-    if not matches:
+    matches = db.get_match_columns(season_id)
+    fig = plt.figure(figsize=(12, 5))
+    if not draw_combined_heatmaps(fig, matches):
+        plt.close(fig)
         return
+    plt.show()
+
+def draw_combined_heatmaps(fig, matches):
+    """
+    Draws the matchup share and head-to-head win % heatmaps side by side on fig.
+    Returns False if there is nothing to draw.
+    """
+    if not len(matches):
+        return False
 
-    players = sorted({
-        name
-        for match in matches
-        for name in (
-            match.get('player1_name'),
-            match.get('player1b_name'),
-            match.get('player2_name'),
-            match.get('player2b_name'),
-        )
-        if name
-    })
+    players, remap = season_players(matches)
     if not players:
-        return
+        return False
+
+    matchup_count_matrix = matchup_counts(matches, remap, len(players))
 
-    player_index = {name: i for i, name in enumerate(players)}
-
-    matchup_counts = np.zeros((len(players), len(players)), dtype=float)
-    for match in matches:
-        team_a = [match['player1_name']]
-        if match.get('player1b_name'):
-            team_a.append(match['player1b_name'])
-        team_b = [match['player2_name']]
-        if match.get('player2b_name'):
-            team_b.append(match['player2b_name'])
-
-        for player_a in team_a:
-            for player_b in team_b:
-                index_a = player_index[player_a]
-                index_b = player_index[player_b]
-                matchup_counts[index_a][index_b] += 1
-                matchup_counts[index_b][index_a] += 1
-
-    row_totals = matchup_counts.sum(axis=1)
-    matchup_share = np.zeros_like(matchup_counts)
+    row_totals = matchup_count_matrix.sum(axis=1)
+    matchup_share = np.zeros_like(matchup_count_matrix)
     for i, total in enumerate(row_totals):
         if total > 0:
-            matchup_share[i, :] = matchup_counts[i, :] / total
+            matchup_share[i, :] = matchup_count_matrix[i, :] / total
 
+    wins = head_to_head_wins(matches, remap, len(players))
+    win_counts = wins + wins.T
+    np.fill_diagonal(win_counts, 0)
     win_rates = np.zeros((len(players), len(players)), dtype=float)
-    win_counts = np.zeros((len(players), len(players)), dtype=int)
-    for i, player_a in enumerate(players):
-        for j, player_b in enumerate(players):
-            if i == j:
-                continue
-            wins_a = db.get_head_to_head_wins(player_a, player_b, season_id)
-            wins_b = db.get_head_to_head_wins(player_b, player_a, season_id)
-            total_matches = wins_a + wins_b
-            win_counts[i][j] = total_matches
-            if total_matches > 0:
-                win_rates[i][j] = (wins_a / total_matches) * 100
+    np.divide(wins * 100, win_counts, out=win_rates, where=win_counts > 0)
 
-    fig, (ax_left, ax_right) = plt.subplots(1, 2, figsize=(12, 5))
+    ax_left, ax_right = fig.subplots(1, 2)
 
     im_left, cbar_left = heatmap(
         matchup_share * 100,
@@ -172,7 +231,7 @@ def show_combined_heatmaps(season_id=None):
         cbarlabel="Share of Games",
         title="Opponent Matchup Share (Row vs Column)"
     )
-    annotate_heatmap_with_counts(im_left, matchup_counts.astype(int), valfmt="{x:.1f}%")
+    annotate_heatmap_with_counts(im_left, matchup_count_matrix.astype(int), valfmt="{x:.1f}%")
 
     im_right, cbar_right = heatmap(
         win_rates,
@@ -186,7 +245,7 @@ def show_combined_heatmaps(season_id=None):
     annotate_heatmap_with_counts(im_right, win_counts, valfmt="{x:.1f}%")
 
     fig.tight_layout()
-    plt.show()
+    return True
 
 # The following is taken from the Matplotlib documentation with minor modifications
 # https://matplotlib.org/stable/gallery/images_contours_and_fields/image_annotated_heatmap.html
@@ -336,3 +395,58 @@ def annotate_heatmap_with_counts(im, counts, data=None, valfmt="{x:.2f}",
             texts.append(text)
 
     return texts
+
+# --- Player Profiles ---
+
+MIN_OPPONENT_GAMES = 3 # Games needed against an opponent before they count as best/worst
+
+def player_profile(name):
+    """
+    Summarises a player's career from their timeline.
+    Returns a dict with 'timeline' (rows oldest first), 'seasons' (per-season summaries),
+    'opponents' and 'partners' (per-name game and win counts), or None if they haven't played.
+    """
+    timeline = db.get_player_timeline(name)
+    if not timeline:
+        return None
+
+    seasons = {}
+    opponents = {}
+    partners = {}
+    for row in timeline:
+        season = seasons.setdefault(row['season_id'], {
+            'season_id': row['season_id'], 'games': 0, 'wins': 0, 'losses': 0,
+            'final_elo': db.INITIAL_ELO, 'peak_elo': db.INITIAL_ELO,
+        })
+        season['games'] += 1
+        season['wins' if row['won'] else 'losses'] += 1
+        if row['elo_after'] is not None:
+            season['final_elo'] = row['elo_after']
+            season['peak_elo'] = max(season['peak_elo'], row['elo_after'])
+
+        for opponent in (row['opponent1_name'], row['opponent2_name']):
+            if opponent:
+                record = opponents.setdefault(opponent, {'name': opponent, 'games': 0, 'wins': 0})
+                record['games'] += 1
+                record['wins'] += row['won']
+        if row['partner_name']:
+            record = partners.setdefault(row['partner_name'], {'name': row['partner_name'], 'games': 0, 'wins': 0})
+            record['games'] += 1
+            record['wins'] += row['won']
+
+    season_names = {s['id']: s['name'] for s in db.get_seasons()}
+    for season in seasons.values():
+        season['name'] = season_names.get(season['season_id'], f"Season {season['season_id']}")
+
+    def win_rate(record):
+        return record['wins'] / record['games']
+
+    qualified = [o for o in opponents.values() if o['games'] >= MIN_OPPONENT_GAMES]
+    return {
+        'timeline': timeline,
+        'seasons': list(seasons.values()),
+        'opponents': sorted(opponents.values(), key=lambda o: (-o['games'], o['name'])),
+        'best_opponents': sorted(qualified, key=lambda o: (-win_rate(o), -o['games']))[:3],
+        'worst_opponents': sorted(qualified, key=lambda o: (win_rate(o), -o['games']))[:3],
+        'partners': sorted(partners.values(), key=lambda p: (-p['games'], p['name'])),
+    }
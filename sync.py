@@ -0,0 +1,343 @@
+import argparse
+import json
+import socket
+import sqlite3
+import uuid
+import database as db
+from elo import RatingParams, DEFAULT_PARAMS
+from rerate import rerate_suffix
+
+# Sync lets installs that don't share a drive merge their results. Every write appends an
+# op to the oplog (see database.append_op). A sync sends each side the ops it hasn't seen,
+# applies them in (ts, origin, seq) order, and then re-rates every live season from the
+# earliest match either side changed, so both sides end up with the same history and
+# ratings. Syncing again with nothing new is a no-op.
+#
+# Notes:
+# - Seasons and players are matched by name. Start new seasons on one install only, as
+#   seasons started separately are ordered by when each install heard about them.
+# - Ops for seasons that one side has already archived are logged but not applied there.
+# - A DB file copied to another machine keeps its install id, so run
+#   `python sync.py new-install-id` on the copy before recording anything with it.
+
+SYNC_PORT = 8765
+MATCH_SLOTS = ('player1', 'player1b', 'player2', 'player2b')
+
+def _connect(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def known_op_ids(conn):
+    return [row[0] for row in conn.execute("SELECT op_id FROM oplog").fetchall()]
+
+def read_ops(conn, exclude=()):
+    """Returns every op in conn's oplog whose id isn't in exclude."""
+    exclude = set(exclude)
+    rows = conn.execute("SELECT op_id, origin, seq, ts, op, payload FROM oplog").fetchall()
+    return [dict(row) for row in rows if row['op_id'] not in exclude]
+
+def _op_order(op):
+    return (op['ts'], op['origin'], op['seq'], op['op_id'])
+
+def _season_id(conn, name):
+    row = conn.execute("SELECT id FROM seasons WHERE name = ?", (name,)).fetchone()
+    return row['id'] if row else None
+
+def _add_player(conn, name, archive=0):
+    conn.execute("""
+        INSERT OR IGNORE INTO players (name, current_elo, current_wins, current_losses, total_lifetime_games, archive)
+        VALUES (?, ?, 0, 0, 0, ?)
+    """, (name, db.INITIAL_ELO, archive))
+
+def _apply_op(conn, op):
+    """
+    Applies the effect of a single op. Elo columns of new matches are placeholders until
+    the re-rate at the end of the merge.
+    Returns:
+        The date of the earliest match the op added or removed, or None.
+    """
+    payload = json.loads(op['payload'])
+    name = op['op']
+    if name == 'add_player':
+        _add_player(conn, payload['name'], payload.get('archive', 0))
+    elif name == 'archive_player':
+        conn.execute("UPDATE players SET archive = 1 WHERE name = ?", (payload['name'],))
+    elif name == 'start_new_season':
+        if _season_id(conn, payload['name']) is None:
+            previous = conn.execute("SELECT id FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+            params = db.read_season_rating_params(conn, previous['id']) if previous else DEFAULT_PARAMS
+            cursor = conn.execute("INSERT INTO seasons (name, created_at) VALUES (?, ?)", (payload['name'], op['ts']))
+            db.write_season_rating_params(conn, cursor.lastrowid, params)
+            conn.execute("UPDATE players SET current_elo = ?, current_wins = 0, current_losses = 0", (db.INITIAL_ELO,))
+    elif name == 'record_match':
+        season_id = _season_id(conn, payload['season'])
+        archived = conn.execute("SELECT 1 FROM archived_seasons WHERE season_id = ?", (season_id,)).fetchone()
+        if season_id is None or archived:
+            print(f"Sync: skipped match {op['op_id']}, season '{payload['season']}' isn't live here")
+            return None
+        for slot in MATCH_SLOTS:
+            if payload[slot]:
+                _add_player(conn, payload[slot])
+        elo = {slot: db.INITIAL_ELO if payload[slot] else None for slot in MATCH_SLOTS}
+        cursor = conn.execute("""
+            INSERT INTO matches (
+                season_id, date, doubles_match,
+                player1_name, player1b_name, player2_name, player2b_name,
+                player1_elo_before, player1_elo_after, player1b_elo_before, player1b_elo_after,
+                player2_elo_before, player2_elo_after, player2b_elo_before, player2b_elo_after,
+                winner, ts
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            season_id, payload['date'], payload['doubles'],
+            payload['player1'], payload['player1b'], payload['player2'], payload['player2b'],
+            elo['player1'], elo['player1'], elo['player1b'], elo['player1b'],
+            elo['player2'], elo['player2'], elo['player2b'], elo['player2b'],
+            payload['winner'], db.to_ts(payload['date'])
+        ))
+        conn.execute("UPDATE oplog SET match_id = ? WHERE op_id = ?", (cursor.lastrowid, op['op_id']))
+        db.insert_timeline_rows(conn, "matches", "id = ?", (cursor.lastrowid,))
+        return payload['date']
+    elif name == 'set_rating_params':
+        season_id = _season_id(conn, payload['season'])
+        archived = conn.execute("SELECT 1 FROM archived_seasons WHERE season_id = ?", (season_id,)).fetchone()
+        if season_id is None or archived:
+            return None
+        db.write_season_rating_params(conn, season_id, RatingParams(
+            payload['k_factor'], payload['k_new_player'], payload['games_new_player']
+        ))
+        if payload['rerated']:
+            return conn.execute("SELECT MIN(date) FROM matches WHERE season_id = ?", (season_id,)).fetchone()[0]
+    elif name == 'delete_match':
+        match = conn.execute("""
+            SELECT m.id, m.date FROM oplog o JOIN matches m ON m.id = o.match_id WHERE o.op_id = ?
+        """, (payload['match_op'],)).fetchone()
+        if match:
+            db.delete_timeline_rows(conn, "match_id = ?", (match['id'],))
+            conn.execute("DELETE FROM matches WHERE id = ?", (match['id'],))
+            return match['date']
+    elif name == 'delete_player':
+        # Same rows as database.delete_player, for the live DB
+        player = (payload['name'], payload['name'])
+        first = conn.execute(
+            "SELECT MIN(date) FROM matches WHERE player1_name = ? OR player2_name = ?", player
+        ).fetchone()[0]
+        db.delete_timeline_rows(
+            conn, "match_id IN (SELECT id FROM matches WHERE player1_name = ? OR player2_name = ?)", player
+        )
+        conn.execute("DELETE FROM matches WHERE player1_name = ? OR player2_name = ?", player)
+        conn.execute("DELETE FROM players WHERE name = ?", (payload['name'],))
+        return first
+    else:
+        print(f"Sync: skipped unknown op '{name}' ({op['op_id']})")
+    return None
+
+def merge_ops(conn, ops):
+    """
+    Adds the ops conn hasn't seen to its oplog and applies them, without committing.
+    Returns:
+        The earliest match date the ops changed, or None.
+    """
+    known = set(known_op_ids(conn))
+    since = None
+    for op in sorted((op for op in ops if op['op_id'] not in known), key=_op_order):
+        conn.execute("""
+            INSERT INTO oplog (op_id, origin, seq, ts, op, payload) VALUES (?, ?, ?, ?, ?, ?)
+        """, (op['op_id'], op['origin'], op['seq'], op['ts'], op['op'], op['payload']))
+        changed = _apply_op(conn, op)
+        if changed is not None and (since is None or changed < since):
+            since = changed
+    return since
+
+def rerate_from(conn, since):
+    """
+    Re-rates every live season from the first match at or after since, then rewrites the
+    players' current-season stats and lifetime game counts. Runs inside the caller's transaction.
+    """
+    current = conn.execute("SELECT id FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+    season_ids = {row[0] for row in conn.execute(
+        "SELECT DISTINCT season_id FROM matches WHERE date >= ?", (since,)
+    ).fetchall()}
+    if current:
+        season_ids.add(current['id'])
+    for season_id in sorted(season_ids):
+        standings = rerate_suffix(conn, season_id, since)
+        if current and season_id == current['id']:
+            conn.execute("UPDATE players SET current_elo = ?, current_wins = 0, current_losses = 0", (db.INITIAL_ELO,))
+            conn.executemany("""
+                UPDATE players SET current_elo = ?, current_wins = ?, current_losses = ?
+                WHERE name = ?
+            """, [(s['elo'], s['wins'], s['losses'], name) for name, s in standings.items()])
+    conn.execute("""
+        UPDATE players SET total_lifetime_games = (
+            SELECT COUNT(*) FROM player_timeline WHERE player_name = players.name
+        )
+    """)
+
+def _earliest(*dates):
+    dates = [d for d in dates if d is not None]
+    return min(dates) if dates else None
+
+def _check_origins(id_a, id_b):
+    if id_a == id_b:
+        raise ValueError(
+            "Both databases have the same install id, probably because one is a copy of the other. "
+            "Run 'python sync.py new-install-id' on the copy first."
+        )
+
+def _finish(conn, since):
+    if since is not None:
+        rerate_from(conn, since)
+    conn.commit()
+
+def _mark_changed(db_file):
+    if db_file == db.DB_FILE:
+        db.mark_data_changed()
+        db.flush_journal()
+
+def sync_files(db_file_a, db_file_b):
+    """
+    Exchanges ops between two DB files so both end up with the same history.
+    Each file is updated in a single transaction. If the second commit fails the sync
+    can simply be run again.
+    Returns:
+        dict with the number of ops each side 'received'.
+    """
+    for db_file in (db_file_a, db_file_b):
+        db.migrate_db(db_file)
+    conn_a = _connect(db_file_a)
+    conn_b = _connect(db_file_b)
+    try:
+        _check_origins(db.get_install_id(conn_a), db.get_install_id(conn_b))
+        ops_for_a = read_ops(conn_b, known_op_ids(conn_a))
+        ops_for_b = read_ops(conn_a, known_op_ids(conn_b))
+        try:
+            since = _earliest(merge_ops(conn_a, ops_for_a), merge_ops(conn_b, ops_for_b))
+            _finish(conn_a, since)
+            _finish(conn_b, since)
+        except Exception:
+            conn_a.rollback()
+            conn_b.rollback()
+            raise
+    finally:
+        conn_a.close()
+        conn_b.close()
+    _mark_changed(db_file_a)
+    _mark_changed(db_file_b)
+    print(f"Synced {db_file_a} ({len(ops_for_a)} ops received) with {db_file_b} ({len(ops_for_b)} ops received)")
+    return {db_file_a: len(ops_for_a), db_file_b: len(ops_for_b)}
+
+# --- Socket Sync ---
+# One JSON message per line:
+#   client -> server: {install_id, known}
+#   server -> client: {install_id, known, ops}    (ops the client is missing)
+#   client -> server: {ops, since}                (ops the server is missing)
+#   server -> client: {since}                     (after the server has committed)
+# Both sides then re-rate from the earlier of the two since dates.
+
+def _send(stream, message):
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Sync peer closed the connection")
+    return json.loads(line)
+
+def serve(db_file=None, host="127.0.0.1", port=SYNC_PORT, timeout=None):
+    """
+    Waits for one sync_with_peer connection and syncs db_file with it.
+    Returns the number of ops received.
+    """
+    db_file = db_file or db.DB_FILE
+    with socket.create_server((host, port)) as server:
+        server.settimeout(timeout)
+        print(f"Waiting for sync on {host}:{port}...")
+        client, address = server.accept()
+    with client, client.makefile("rw", encoding="utf-8") as stream:
+        conn = _connect(db_file)
+        try:
+            hello = _receive(stream)
+            install_id = db.get_install_id(conn)
+            _check_origins(install_id, hello['install_id'])
+            _send(stream, {
+                'install_id': install_id,
+                'known': known_op_ids(conn),
+                'ops': read_ops(conn, hello['known']),
+            })
+            reply = _receive(stream)
+            try:
+                local_since = merge_ops(conn, reply['ops'])
+                _finish(conn, _earliest(local_since, reply['since']))
+            except Exception:
+                conn.rollback()
+                raise
+            _send(stream, {'since': local_since})
+        finally:
+            conn.close()
+    _mark_changed(db_file)
+    print(f"Synced with {address[0]}: {len(reply['ops'])} ops received")
+    return len(reply['ops'])
+
+def sync_with_peer(host, port=SYNC_PORT, db_file=None, timeout=30):
+    """Syncs db_file with an install running serve(). Returns the number of ops received."""
+    db_file = db_file or db.DB_FILE
+    conn = _connect(db_file)
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as peer, \
+                peer.makefile("rw", encoding="utf-8") as stream:
+            install_id = db.get_install_id(conn)
+            _send(stream, {'install_id': install_id, 'known': known_op_ids(conn)})
+            hello = _receive(stream)
+            _check_origins(install_id, hello['install_id'])
+            try:
+                local_since = merge_ops(conn, hello['ops'])
+                _send(stream, {'ops': read_ops(conn, hello['known']), 'since': local_since})
+                reply = _receive(stream)
+                _finish(conn, _earliest(local_since, reply['since']))
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+    _mark_changed(db_file)
+    print(f"Synced with {host}: {len(hello['ops'])} ops received")
+    return len(hello['ops'])
+
+def new_install_id(db_file=None):
+    """Gives a copied DB file its own install id, so its new ops don't clash with the original's."""
+    conn = _connect(db_file or db.DB_FILE)
+    try:
+        install_id = uuid.uuid4().hex
+        conn.execute("INSERT OR REPLACE INTO dbinfo (key, value) VALUES ('install_id', ?)", (install_id,))
+        conn.commit()
+        return install_id
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync match history between Pool Elo Tracker installs.")
+    parser.add_argument("--db", default=db.DB_FILE, help="Local database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    file_cmd = commands.add_parser("file", help="Sync with another database file")
+    file_cmd.add_argument("other_db")
+    serve_cmd = commands.add_parser("serve", help="Wait for one sync connection")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=SYNC_PORT)
+    connect_cmd = commands.add_parser("connect", help="Sync with an install running 'serve'")
+    connect_cmd.add_argument("host")
+    connect_cmd.add_argument("--port", type=int, default=SYNC_PORT)
+    commands.add_parser("new-install-id", help="Give a copied database its own install id")
+    args = parser.parse_args()
+
+    db.DB_FILE = args.db
+    db.init_db()
+    if args.command == "file":
+        sync_files(args.db, args.other_db)
+    elif args.command == "serve":
+        serve(args.db, args.host, args.port)
+    elif args.command == "connect":
+        sync_with_peer(args.host, args.port, args.db)
+    else:
+        print(f"New install id: {new_install_id(args.db)}")
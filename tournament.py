@@ -0,0 +1,365 @@
+from datetime import datetime
+import database as db
+import metrics
+
+# Tournaments are played within the current season. A bracket is generated from the
+# players' current Elo (best player is seed 1) and stored in tournament_matches, where
+# each match points at the matches its winner and loser move on to. Byes are resolved
+# as soon as both sides of a match are known, so players with a bye simply appear in
+# the next round. Results are recorded a round (or any set of ready matches) at a time
+# through db.apply_results, in the same transaction that advances the bracket.
+
+FORMATS = {
+    'single': "Single Elimination",
+    'double': "Double Elimination",
+    'round_robin': "Round Robin",
+}
+
+BRACKET_NAMES = {'W': "Winners", 'L': "Losers", 'F': "Grand Final", 'RR': "Round Robin"}
+BRACKET_ORDER = {'W': 0, 'RR': 0, 'L': 1, 'F': 2}
+
+BYE = '' # Player name of an empty slot
+
+def seed_positions(size):
+    """Seeds in bracket order for a bracket of size (a power of two), so 1 and 2 meet last."""
+    order = [1]
+    while len(order) < size:
+        n = len(order) * 2
+        order = [s for seed in order for s in (seed, n + 1 - seed)]
+    return order
+
+def _bracket_size(n):
+    size = 2
+    while size < n:
+        size *= 2
+    return size
+
+def _match(key, bracket, round_number, slot, player1=None, player2=None):
+    return {
+        'key': key, 'bracket': bracket, 'round': round_number, 'slot': slot,
+        'player1': player1, 'player2': player2, 'winner_to': None, 'loser_to': None,
+    }
+
+def _winners_bracket(seeds):
+    """Rounds of the single elimination bracket, as lists of match dicts."""
+    size = _bracket_size(len(seeds))
+    positions = [seeds[s - 1] if s <= len(seeds) else BYE for s in seed_positions(size)]
+    rounds = [[
+        _match(('W', 1, i), 'W', 1, i + 1, positions[2 * i], positions[2 * i + 1])
+        for i in range(size // 2)
+    ]]
+    while len(rounds[-1]) > 1:
+        r = len(rounds) + 1
+        rounds.append([_match(('W', r, i), 'W', r, i + 1) for i in range(len(rounds[-1]) // 2)])
+        for i, m in enumerate(rounds[-2]):
+            m['winner_to'] = (rounds[-1][i // 2]['key'], i % 2 + 1)
+    return rounds
+
+def single_elimination(seeds):
+    return [m for r in _winners_bracket(seeds) for m in r]
+
+def double_elimination(seeds):
+    """
+    Winners bracket plus a losers bracket: losers of winners round 1 play each other,
+    then each later round's losers drop in against the survivors. A single grand final
+    (no bracket reset) decides the winner.
+    """
+    if len(seeds) < 3:
+        raise ValueError("Double elimination needs at least 3 players.")
+    wb = _winners_bracket(seeds)
+    lb = []
+
+    # Losers bracket round 1: losers of winners round 1, paired off
+    lb.append([_match(('L', 1, i), 'L', 1, i + 1) for i in range(len(wb[0]) // 2)])
+    for i, m in enumerate(wb[0]):
+        m['loser_to'] = (lb[0][i // 2]['key'], i % 2 + 1)
+
+    for wr in range(1, len(wb)):
+        # Survivors meet the losers of the next winners round (in reverse order, to
+        # avoid immediate rematches)...
+        r = len(lb) + 1
+        drop = [_match(('L', r, i), 'L', r, i + 1) for i in range(len(wb[wr]))]
+        for i, m in enumerate(lb[-1]):
+            m['winner_to'] = (drop[i]['key'], 1)
+        for i, m in enumerate(wb[wr]):
+            m['loser_to'] = (drop[len(drop) - 1 - i]['key'], 2)
+        lb.append(drop)
+        # ...then play each other, until one is left
+        if len(drop) > 1:
+            r = len(lb) + 1
+            lb.append([_match(('L', r, i), 'L', r, i + 1) for i in range(len(drop) // 2)])
+            for i, m in enumerate(drop):
+                m['winner_to'] = (lb[-1][i // 2]['key'], i % 2 + 1)
+
+    final = _match(('F', 1, 0), 'F', 1, 1)
+    wb[-1][-1]['winner_to'] = (final['key'], 1)
+    lb[-1][-1]['winner_to'] = (final['key'], 2)
+    return [m for r in wb for m in r] + [m for r in lb for m in r] + [final]
+
+def round_robin(seeds):
+    """Everyone plays everyone once, scheduled into rounds with the circle method."""
+    players = list(seeds) + ([BYE] if len(seeds) % 2 else [])
+    n = len(players)
+    matches = []
+    for r in range(n - 1):
+        slot = 0
+        for i in range(n // 2):
+            p1, p2 = players[i], players[n - 1 - i]
+            if p1 != BYE and p2 != BYE:
+                slot += 1
+                matches.append(_match(('RR', r + 1, i), 'RR', r + 1, slot, p1, p2))
+        # Keep the first player fixed and rotate the rest
+        players = [players[0], players[-1]] + players[1:-1]
+    return matches
+
+GENERATORS = {'single': single_elimination, 'double': double_elimination, 'round_robin': round_robin}
+
+# --- Bracket State ---
+
+def _place(conn, match_id, slot, name):
+    conn.execute(f"UPDATE tournament_matches SET player{slot}_name = ? WHERE id = ?", (name, match_id))
+    _resolve_byes(conn, match_id)
+
+def _decide(conn, match, winner, match_id=None):
+    """Sets match's winner and moves both players on."""
+    conn.execute(
+        "UPDATE tournament_matches SET winner = ?, match_id = ? WHERE id = ?",
+        (winner, match_id, match['id'])
+    )
+    winner_name, loser_name = (
+        (match['player1_name'], match['player2_name']) if winner == 1 else (match['player2_name'], match['player1_name'])
+    )
+    if match['winner_to']:
+        _place(conn, match['winner_to'], match['winner_to_slot'], winner_name)
+    if match['loser_to']:
+        _place(conn, match['loser_to'], match['loser_to_slot'], loser_name)
+
+def _resolve_byes(conn, match_id):
+    # A match with a bye on one side (or both) is decided as soon as both sides are known
+    match = conn.execute("SELECT * FROM tournament_matches WHERE id = ?", (match_id,)).fetchone()
+    if match['winner'] is not None or match['player1_name'] is None or match['player2_name'] is None:
+        return
+    if match['player2_name'] == BYE:
+        _decide(conn, match, 1)
+    elif match['player1_name'] == BYE:
+        _decide(conn, match, 2)
+
+def _undecide(conn, match):
+    # Clears match's result and takes both players back out of the matches they moved on
+    # to. Matches those players then only reached through a bye are cleared in turn.
+    for target, slot in ((match['winner_to'], match['winner_to_slot']), (match['loser_to'], match['loser_to_slot'])):
+        if not target:
+            continue
+        next_match = conn.execute("SELECT * FROM tournament_matches WHERE id = ?", (target,)).fetchone()
+        if next_match['winner'] is not None:
+            if next_match['match_id'] is not None or not _undecide(conn, next_match):
+                return False # Already played
+        conn.execute(f"UPDATE tournament_matches SET player{slot}_name = NULL WHERE id = ?", (target,))
+    conn.execute("UPDATE tournament_matches SET winner = NULL, match_id = NULL WHERE id = ?", (match['id'],))
+    conn.execute("UPDATE tournaments SET finished_at = NULL WHERE id = ?", (match['tournament_id'],))
+    return True
+
+def reopen_match(conn, match_id):
+    """
+    Reopens the tournament pairing decided by match match_id (a matches.id) before that
+    match is deleted, inside the caller's transaction.
+    Returns:
+        False if a match the players moved on to has been played, in which case the caller
+        must roll back and keep the match; otherwise True.
+    """
+    match = conn.execute("SELECT * FROM tournament_matches WHERE match_id = ?", (match_id,)).fetchone()
+    return match is None or _undecide(conn, match)
+
+def _finish_if_done(conn, tournament_id):
+    undecided = conn.execute(
+        "SELECT COUNT(*) FROM tournament_matches WHERE tournament_id = ? AND winner IS NULL",
+        (tournament_id,)
+    ).fetchone()[0]
+    if not undecided:
+        conn.execute(
+            "UPDATE tournaments SET finished_at = ? WHERE id = ? AND finished_at IS NULL",
+            (datetime.now().isoformat(), tournament_id)
+        )
+
+# --- Tournament Management ---
+
+@metrics.timed(metrics.DB_CALL_SECONDS)
+def create_tournament(name, format, player_names):
+    """
+    Creates a tournament in the current season, seeded by current Elo.
+    Args:
+        name (str): Tournament name.
+        format (str): A key of FORMATS.
+        player_names (list): Players taking part.
+    Returns:
+        int: The new tournament's id.
+    """
+    if format not in GENERATORS:
+        raise ValueError(f"Unknown tournament format: {format}")
+    if len(set(player_names)) != len(player_names) or len(player_names) < 2:
+        raise ValueError("A tournament needs at least 2 different players.")
+
+    conn = db.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        season = conn.execute("SELECT id FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+        if not season:
+            raise ValueError("No active season found. Please start a new season from the Admin tab.")
+        rows = conn.execute(
+            f"SELECT name, current_elo FROM players WHERE name IN ({', '.join('?' * len(player_names))})",
+            tuple(player_names)
+        ).fetchall()
+        found = {row['name'] for row in rows}
+        for player in player_names:
+            if player not in found:
+                raise ValueError(f"Unknown player: {player}")
+        seeds = [row['name'] for row in sorted(rows, key=lambda row: (-row['current_elo'], row['name']))]
+        matches = GENERATORS[format](seeds)
+
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO tournaments (season_id, name, format, created_at) VALUES (?, ?, ?, ?)",
+            (season['id'], name, format, datetime.now().isoformat())
+        )
+        tournament_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO tournament_players (tournament_id, seed, player_name) VALUES (?, ?, ?)",
+            [(tournament_id, seed, player) for seed, player in enumerate(seeds, start=1)]
+        )
+
+        # Insert the matches, then link them up now their ids are known
+        ids = {}
+        for m in matches:
+            cursor.execute("""
+                INSERT INTO tournament_matches (tournament_id, bracket, round, slot, player1_name, player2_name)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (tournament_id, m['bracket'], m['round'], m['slot'], m['player1'], m['player2']))
+            ids[m['key']] = cursor.lastrowid
+        cursor.executemany("""
+            UPDATE tournament_matches SET winner_to = ?, winner_to_slot = ?, loser_to = ?, loser_to_slot = ?
+            WHERE id = ?
+        """, [
+            (
+                ids[m['winner_to'][0]] if m['winner_to'] else None, m['winner_to'][1] if m['winner_to'] else None,
+                ids[m['loser_to'][0]] if m['loser_to'] else None, m['loser_to'][1] if m['loser_to'] else None,
+                ids[m['key']]
+            )
+            for m in matches
+        ])
+        for m in matches:
+            _resolve_byes(conn, ids[m['key']])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    db.mark_data_changed()
+    print(f"Tournament '{name}' created: {FORMATS[format]}, {len(seeds)} players, {len(matches)} matches")
+    return tournament_id
+
+@metrics.timed(metrics.DB_CALL_SECONDS)
+def record_round(tournament_id, outcomes):
+    """
+    Records the results of ready tournament matches and advances the bracket, in one transaction.
+    Args:
+        tournament_id (int): The tournament.
+        outcomes (dict): {tournament match id: winner (1 or 2)}.
+    Returns:
+        The list returned by db.apply_results, in the order the matches were rated.
+    Raises:
+        ValueError: If a match isn't ready to play or the tournament isn't in the current season.
+    """
+    conn = db.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        tournament = conn.execute("SELECT * FROM tournaments WHERE id = ?", (tournament_id,)).fetchone()
+        season = conn.execute("SELECT id FROM seasons ORDER BY id DESC LIMIT 1").fetchone()
+        if not tournament:
+            raise ValueError(f"Tournament {tournament_id} not found.")
+        if not season or tournament['season_id'] != season['id']:
+            raise ValueError("Results can only be recorded for tournaments in the current season.")
+
+        matches = conn.execute(
+            f"SELECT * FROM tournament_matches WHERE tournament_id = ? AND id IN ({', '.join('?' * len(outcomes))})",
+            (tournament_id, *outcomes)
+        ).fetchall()
+        if len(matches) != len(outcomes):
+            raise ValueError("Some of the matches are not part of this tournament.")
+        matches.sort(key=lambda m: (m['round'], BRACKET_ORDER[m['bracket']], m['slot']))
+        for m in matches:
+            if m['winner'] is not None or not m['player1_name'] or not m['player2_name']:
+                raise ValueError(f"{BRACKET_NAMES[m['bracket']]} round {m['round']} match {m['slot']} is not ready to play.")
+            if outcomes[m['id']] not in (1, 2):
+                raise ValueError(f"Invalid winner for {m['player1_name']} vs {m['player2_name']}")
+
+        recorded = db.apply_results(conn, [
+            db.MatchResult(m['player1_name'], m['player2_name'], outcomes[m['id']]) for m in matches
+        ])
+        for m, result in zip(matches, recorded):
+            _decide(conn, m, outcomes[m['id']], result['match_id'])
+        _finish_if_done(conn, tournament_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    db.mark_data_changed()
+    db.flush_journal()
+    metrics.MATCHES_RECORDED.inc(len(recorded))
+    return recorded
+
+@db.cached_read
+def get_tournaments():
+    """Returns all tournaments, newest first."""
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute("""
+            SELECT t.*, s.name AS season_name, COUNT(p.seed) AS player_count
+            FROM tournaments t
+            JOIN seasons s ON s.id = t.season_id
+            LEFT JOIN tournament_players p ON p.tournament_id = t.id
+            GROUP BY t.id
+            ORDER BY t.id DESC
+        """).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+@db.cached_read
+def get_tournament_matches(tournament_id):
+    """Returns a tournament's matches in bracket order."""
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM tournament_matches WHERE tournament_id = ? ORDER BY bracket = 'F', bracket = 'L', round, slot",
+            (tournament_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def is_ready(match):
+    return match['winner'] is None and bool(match['player1_name']) and bool(match['player2_name'])
+
+def standings(matches):
+    """Round robin table: [(name, wins, losses)], most wins first."""
+    table = {}
+    for m in matches:
+        for name in (m['player1_name'], m['player2_name']):
+            table.setdefault(name, [0, 0])
+        if m['winner'] is not None:
+            winner, loser = (m['player1_name'], m['player2_name']) if m['winner'] == 1 else (m['player2_name'], m['player1_name'])
+            table[winner][0] += 1
+            table[loser][1] += 1
+    return sorted(((name, w, l) for name, (w, l) in table.items()), key=lambda row: (-row[1], row[2], row[0]))
+
+def champion(tournament, matches):
+    """The winner of a finished tournament, or None."""
+    if not tournament['finished_at'] or not matches:
+        return None
+    if tournament['format'] == 'round_robin':
+        return standings(matches)[0][0]
+    final = matches[-1]
+    return final['player1_name'] if final['winner'] == 1 else final['player2_name']
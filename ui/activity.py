@@ -0,0 +1,66 @@
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+import database as db
+
+ACTIVITY_DAYS = 30 # Match days listed
+
+class ActivityTab:
+    def __init__(self, parent, app):
+        self.app = app
+        self.seasons = []
+        self.activity_tab = ttk.Frame(parent)
+        parent.add(self.activity_tab, text="Activity")
+
+        control_frame = ttk.Frame(self.activity_tab)
+        control_frame.pack(fill='x', pady=5, padx=5)
+        ttk.Label(control_frame, text="Select Season:").pack(side=tk.LEFT, padx=(5,5))
+        self.season_selector_cb = ttk.Combobox(control_frame, state="readonly")
+        self.season_selector_cb.pack(side=tk.LEFT, padx=5)
+        self.season_selector_cb.bind("<<ComboboxSelected>>", lambda event: self.show_activity())
+
+        self.activity_text = tk.Text(self.activity_tab, wrap="none", font=("Courier", 9))
+        self.activity_text.pack(fill='both', expand=True, padx=5, pady=5)
+
+    def refresh_activity(self):
+        selected = self.season_selector_cb.current()
+        selected_id = self.seasons[selected]['id'] if 0 <= selected < len(self.seasons) else None
+        self.seasons = db.get_seasons()
+        self.season_selector_cb['values'] = [s['name'] for s in self.seasons]
+        ids = [s['id'] for s in self.seasons]
+        if selected_id in ids:
+            self.season_selector_cb.current(ids.index(selected_id))
+        elif self.seasons:
+            self.season_selector_cb.current(0)
+        self.show_activity()
+
+    def show_activity(self):
+        self.activity_text.delete(1.0, tk.END)
+        index = self.season_selector_cb.current()
+        if not 0 <= index < len(self.seasons):
+            self.activity_text.insert(tk.END, "Start a season to see activity.")
+            return
+        season_id = self.seasons[index]['id']
+
+        # Reads the rollup tables only, so this doesn't grow with the match history
+        week, week_rows = db.get_weekly_activity(season_id)
+        lines = []
+        if week:
+            lines.append(f"Most active in {week}")
+            lines.append(f"{'Player':<20} {'Games':>5} {'Wins':>5} {'Elo':>6}")
+            for row in week_rows:
+                lines.append(f"{row['player_name'][:20]:<20} {row['games']:>5} {row['wins']:>5} {row['elo_delta']:>+6d}")
+            lines.append("")
+
+        days = db.get_daily_activity(season_id, ACTIVITY_DAYS)
+        if not days:
+            lines.append("No matches played this season.")
+        else:
+            lines.append(f"Last {len(days)} match days")
+            lines.append(f"{'Day':<16} {'Matches':>7} {'Players':>7}   Most games")
+            for day in days:
+                label = datetime.fromisoformat(day['day']).strftime("%a %d %b %Y")
+                top = day['top']
+                top_text = f"{top['player_name']} ({top['games']} games, {top['elo_delta']:+d})" if top else ""
+                lines.append(f"{label:<16} {day['matches']:>7} {day['players']:>7}   {top_text}")
+        self.activity_text.insert(tk.END, "\n".join(lines))
@@ -1,12 +1,34 @@
+import os
+import sqlite3
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog, font
+from tkinter import ttk, messagebox, simpledialog, filedialog, font
 import database as db
+import rerate
+import integrity
+import sync
+import journal
+import evaluate
+import export
+from datetime import datetime
+from elo import RatingParams
 
 class AdminTab:
     def __init__(self, parent, app):
         self.app = app
         self.admin_tab = ttk.Frame(parent)
         parent.add(self.admin_tab, text="Admin")
+
+        venue_frame = ttk.Frame(self.admin_tab)
+        venue_frame.pack(pady=10)
+        ttk.Label(venue_frame, text="Venue:").pack(side=tk.LEFT, padx=5)
+        self.venue_cb = ttk.Combobox(venue_frame, state="readonly", values=db.list_venues())
+        self.venue_cb.set(db.get_current_venue())
+        self.venue_cb.pack(side=tk.LEFT, padx=5)
+        self.venue_cb.bind("<<ComboboxSelected>>", self.on_venue_selected)
+        ttk.Button(venue_frame, text="Add Venue", command=self.add_venue).pack(side=tk.LEFT, padx=5)
+        ttk.Button(venue_frame, text="Find Player (All Venues)", command=self.find_player_all_venues).pack(side=tk.LEFT, padx=5)
+
         ttk.Checkbutton(self.admin_tab, text="Enable Tablet Mode", command=self.toggle_tablet_mode).pack(pady=10)
         ttk.Button(self.admin_tab, text="Start New Season", command=self.start_new_season).pack(pady=10)
         ttk.Button(self.admin_tab, text="Delete Player", command=self.delete_player).pack(pady=10)
@@ -14,15 +36,61 @@ class AdminTab:
         ttk.Button(self.admin_tab, text="Backup Database", command=self.backup_database_ui).pack(pady=10)
         ttk.Button(self.admin_tab, text="Delete Last Match", command=self.delete_last_match).pack(pady=10)
         ttk.Button(self.admin_tab, text="Add Player", command=self.add_new_player).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Archive Old Seasons", command=self.archive_old_seasons).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Re-rate Seasons", command=self.rerate_seasons).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Evaluate Rating Params", command=self.evaluate_rating_params).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Check Data Integrity", command=self.check_integrity).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Sync With Database File", command=self.sync_with_file).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Restore To Point In Time", command=self.restore_to_time).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Export Static Site", command=self.export_static_site).pack(pady=10)
+        ttk.Button(self.admin_tab, text="Show Responsiveness Log", command=self.show_responsiveness_log).pack(pady=10)
 
     def backup_database_ui(self):
         prefix = simpledialog.askstring("Backup Database", "Enter a prefix for the backup file (optional):")
         backup_name = db.backup_database(prefix=prefix if prefix else None)
         if backup_name:
-            messagebox.showinfo("Backup Successful", f"Database backed up as: backups/{backup_name}")
+            messagebox.showinfo("Backup Successful", f"Database backed up as: {db.get_backup_dir()}/{backup_name}")
         else:
             messagebox.showerror("Backup Failed", "Database backup failed. See console for details.")
 
+    def on_venue_selected(self, event=None):
+        venue = self.venue_cb.get()
+        if venue != db.get_current_venue():
+            db.select_venue(venue)
+            self.app.on_venue_changed()
+
+    def add_venue(self):
+        venue = simpledialog.askstring("Add Venue", "Enter the name of the new venue:")
+        if not venue:
+            return
+        if venue in db.list_venues():
+            messagebox.showinfo("Exists", f"Venue '{venue}' already exists.")
+            return
+        try:
+            db.select_venue(venue)
+        except ValueError as e:
+            messagebox.showerror("Invalid Name", str(e))
+            return
+        self.venue_cb['values'] = db.list_venues()
+        self.venue_cb.set(venue)
+        messagebox.showinfo("Added", f"Venue '{venue}' has been added and selected.")
+        self.app.on_venue_changed()
+
+    def find_player_all_venues(self):
+        name = simpledialog.askstring("Find Player", "Enter the exact player name to look up:")
+        if not name:
+            return
+        records = db.find_player_in_all_venues(name)
+        if not records:
+            messagebox.showinfo("Not Found", f"Player '{name}' was not found at any venue.")
+            return
+        lines = [
+            f"{r['venue']}: Elo {r['current_elo']}, {r['current_wins']}W/{r['current_losses']}L, {r['total_lifetime_games']} lifetime games"
+            + (" (archived)" if r['archive'] else "")
+            for r in records
+        ]
+        messagebox.showinfo(f"Player '{name}'", "\n".join(lines))
+
     def start_new_season(self):
         season_name = simpledialog.askstring("New Season", "Enter the name for the new season (e.g., 'Winter 2025'):")
         #TODO: Check if season already exists. Otherwise SQL unique ID error
@@ -72,6 +140,148 @@ class AdminTab:
         messagebox.showinfo("Added", f"Player '{name}' has been added.")
         self.app.refresh_all_views()
 
+    def archive_old_seasons(self):
+        if messagebox.askyesno("Confirm Archive", "Move all completed seasons into archive files?\nThey will still be viewable in the graphs, but the live database will be smaller."):
+            count = db.archive_completed_seasons()
+            messagebox.showinfo("Archived", f"{count} season(s) archived.")
+            self.app.refresh_all_views()
+
+    def sync_with_file(self):
+        path = filedialog.askopenfilename(title="Sync With Database File", filetypes=[("Database files", "*.db")])
+        if not path:
+            return
+        try:
+            received = sync.sync_files(db.DB_FILE, path)
+        except (ValueError, sqlite3.Error) as e:
+            messagebox.showerror("Sync Failed", str(e))
+            return
+        messagebox.showinfo("Synced", f"Received {received[db.DB_FILE]} change(s), sent {received[path]}.")
+        self.app.refresh_all_views()
+
+    def restore_to_time(self):
+        when = simpledialog.askstring("Restore", "Restore the database as it was at (YYYY-MM-DD HH:MM):")
+        if not when:
+            return
+        try:
+            target = datetime.strptime(when.strip(), "%Y-%m-%d %H:%M")
+        except ValueError:
+            messagebox.showerror("Invalid Time", "Enter the time as YYYY-MM-DD HH:MM.")
+            return
+        try:
+            restored = journal.restore_to(target)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            messagebox.showerror("Restore Failed", str(e))
+            return
+        if messagebox.askyesno("Confirm Restore", f"A copy of the database as of {when} was saved as {restored}.\nReplace the live database with it? The current database is backed up first."):
+            journal.replace_live_db(restored)
+            messagebox.showinfo("Restored", f"The database has been restored to {when}.")
+            self.app.refresh_all_views()
+
+    def export_static_site(self):
+        try:
+            written = export.export_site()
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        messagebox.showinfo(
+            "Site Exported",
+            f"{len(written)} file(s) updated in {os.path.abspath(export.export_dir())}.\n\n"
+            "The site will now be updated after every change."
+        )
+
+    def show_responsiveness_log(self):
+        window = tk.Toplevel(self.admin_tab)
+        window.title("Responsiveness Log")
+        text = tk.Text(window, wrap="none", width=100, height=30, font=("Courier", 9))
+        text.pack(fill='both', expand=True)
+        text.insert(tk.END, self.app.watchdog.format_log())
+        text.config(state="disabled")
+
+    def rerate_seasons(self):
+        season = db.get_current_season()
+        if not season:
+            messagebox.showerror("Error", "No active season found.")
+            return
+        ids = simpledialog.askstring("Re-rate Seasons", "Enter the season IDs to re-rate, separated by commas (leave blank for all seasons):")
+        if ids is None:
+            return
+        try:
+            season_ids = [int(i) for i in ids.split(",") if i.strip()] or [s['id'] for s in db.get_seasons()]
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Season IDs must be numbers.")
+            return
+
+        current = db.get_season_rating_params(season['id'])
+        k_factor = simpledialog.askinteger("Re-rate Seasons", "K-factor:", initialvalue=current.k_factor, minvalue=1)
+        k_new_player = simpledialog.askinteger("Re-rate Seasons", "K-factor for new players:", initialvalue=current.k_new_player, minvalue=1)
+        games_new_player = simpledialog.askinteger("Re-rate Seasons", "Games before a player is no longer new:", initialvalue=current.games_new_player, minvalue=0)
+        if None in (k_factor, k_new_player, games_new_player):
+            return
+        params = RatingParams(k_factor, k_new_player, games_new_player)
+
+        # Show a dry run first
+        diff = rerate.rerate_seasons(season_ids, params, dry_run=True)
+        lines = []
+        for season_id, rows in diff.items():
+            lines.append(f"Season {season_id}")
+            for r in rows:
+                old_elo = r['old_elo'] if r['old_elo'] is not None else "-"
+                lines.append(f"  {r['new_rank']:>2}. {r['name']:<15} {old_elo:>5} -> {r['new_elo']:<5} (was #{r['old_rank']})")
+        preview = tk.Toplevel(self.app.root)
+        preview.title("Re-rate Preview")
+        text = tk.Text(preview, wrap="none", height=25, width=60, font=("Courier", 9))
+        text.insert(tk.END, "\n".join(lines) or "No matches to re-rate.")
+        text.configure(state="disabled")
+        text.pack(fill='both', expand=True)
+
+        if messagebox.askyesno("Confirm Re-rate", "Apply these ratings? All matches in the selected seasons will be updated.", parent=preview):
+            rerate.rerate_seasons(season_ids, params)
+            messagebox.showinfo("Re-rated", f"{len(diff)} season(s) re-rated.", parent=preview)
+            self.app.refresh_all_views()
+        preview.destroy()
+
+    def evaluate_rating_params(self):
+        # The history is read here; the search runs on a background thread so the UI stays responsive
+        history = evaluate.load_history()
+        window = tk.Toplevel(self.app.root)
+        window.title("Rating Params Evaluation")
+        text = tk.Text(window, wrap="none", height=30, width=70, font=("Courier", 9))
+        text.insert(tk.END, f"Evaluating {len(evaluate.grid_params())} parameter sets...")
+        text.configure(state="disabled")
+        text.pack(fill='both', expand=True)
+
+        result = {}
+        def run():
+            try:
+                result['report'] = evaluate.format_report(evaluate.evaluate(evaluate.grid_params(), history))
+            except Exception as e:
+                result['report'] = f"Evaluation failed: {e}"
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+
+        def show_report():
+            if worker.is_alive():
+                window.after(200, show_report)
+                return
+            if window.winfo_exists():
+                text.configure(state="normal")
+                text.delete(1.0, tk.END)
+                text.insert(tk.END, result['report'])
+                text.configure(state="disabled")
+        window.after(200, show_report)
+
+    def check_integrity(self):
+        report = integrity.check_integrity()
+        if not report['mismatches'] and not report['chain_breaks']:
+            messagebox.showinfo("Integrity Check", "No problems found.")
+            return
+        summary = integrity.format_report(report)
+        if report['mismatches'] and messagebox.askyesno("Integrity Check", f"{summary}\n\nRepair player stats from the match history?"):
+            integrity.check_integrity(repair=True)
+            self.app.refresh_all_views()
+        elif not report['mismatches']:
+            messagebox.showwarning("Integrity Check", f"{summary}\n\nRe-rate the affected seasons to fix Elo chains.")
+
     def delete_last_match(self):
         season = db.get_current_season()
         if not season:
@@ -1,17 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import database as db
-import pandas as pd
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from stats import show_combined_heatmaps
+import numpy as np
+from stats import show_combined_heatmaps, elo_series, lttb
+import smoothing
+import bootstrap
 
-SMOOTHING_WINDOW = 5  # Number of games for moving average smoothing
+SLIDER_DELAY_MS = 150 # Redraw once the smoothing slider has been still this long
+ALL_SEASONS = "All Seasons"
+X_AXES = ("Games", "Date") # Games played in the season, or real dates (only each player's own games)
+BAND_POLL_MS = 250 # How often to check for finished confidence intervals
 
 class GraphTab:
     def __init__(self, parent, app):
         self.graph_canvas = None
         self.smoothing_enabled = tk.BooleanVar(value=True)
+        self.smoothing_window = tk.IntVar(value=smoothing.DEFAULT_WINDOW)
+        self.pending_redraw = None
+        self.show_bands = tk.BooleanVar(value=False)
+        self.pending_bands = None
         self.selected_season_id = tk.IntVar()
 
         self.app = app
@@ -26,25 +35,102 @@ class GraphTab:
         self.season_selector_cb.pack(side=tk.LEFT, padx=5)
         self.season_selector_cb.bind("<<ComboboxSelected>>", self.on_season_selected)
 
-        ttk.Checkbutton(
-            control_frame, 
-            text=f"Smooth Elo ({SMOOTHING_WINDOW} games)", 
-            variable=self.smoothing_enabled,
-            command=self.plot_elo_graph
-        ).pack(side=tk.LEFT, padx=10)
+        ttk.Label(control_frame, text="X Axis:").pack(side=tk.LEFT, padx=(10,5))
+        self.x_axis_cb = ttk.Combobox(control_frame, state="readonly", values=X_AXES, width=8)
+        self.x_axis_cb.current(0)
+        self.x_axis_cb.pack(side=tk.LEFT, padx=5)
+        self.x_axis_cb.bind("<<ComboboxSelected>>", lambda event: self.plot_elo_graph())
 
         ttk.Button(
             control_frame, 
             text="Show Heatmap",
-            command=lambda: show_combined_heatmaps(season_id=self.selected_season_id.get())
+            command=lambda: show_combined_heatmaps(season_id=self.selected_season_id.get() or None)
         ).pack(side=tk.RIGHT, padx=5)
 
+        # Smoothing is applied to each player's own games
+        smoothing_frame = ttk.Frame(self.graph_tab)
+        smoothing_frame.pack(fill='x', padx=5)
+        ttk.Checkbutton(
+            smoothing_frame,
+            text="Smooth Elo",
+            variable=self.smoothing_enabled,
+            command=self.plot_elo_graph
+        ).pack(side=tk.LEFT, padx=5)
+        self.kernel_cb = ttk.Combobox(smoothing_frame, state="readonly", values=smoothing.KERNELS, width=9)
+        self.kernel_cb.set(smoothing.DEFAULT_KERNEL)
+        self.kernel_cb.pack(side=tk.LEFT, padx=5)
+        self.kernel_cb.bind("<<ComboboxSelected>>", lambda event: self.plot_elo_graph())
+        ttk.Label(smoothing_frame, text="Window:").pack(side=tk.LEFT, padx=(10,5))
+        tk.Scale(
+            smoothing_frame, from_=2, to=smoothing.MAX_WINDOW, orient=tk.HORIZONTAL, length=200,
+            variable=self.smoothing_window, command=self.on_window_changed
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            smoothing_frame,
+            text=f"{bootstrap.CONFIDENCE:.0%} Bands",
+            variable=self.show_bands,
+            command=self.plot_elo_graph
+        ).pack(side=tk.LEFT, padx=(10,5))
+
+    def on_window_changed(self, value=None):
+        # Dragging the slider fires for every step, so wait until it settles
+        if self.pending_redraw:
+            self.graph_tab.after_cancel(self.pending_redraw)
+        self.pending_redraw = self.graph_tab.after(SLIDER_DELAY_MS, self.redraw_after_slider)
+
+    def redraw_after_slider(self):
+        self.pending_redraw = None
+        if self.smoothing_enabled.get():
+            self.plot_elo_graph()
+
+    def smoothed(self, season_id, player, elos):
+        """A player's Elo series for one season, smoothed if enabled, via the shared smoothing cache."""
+        if not self.smoothing_enabled.get():
+            return elos.astype(float)
+        return smoothing.smooth_series((int(season_id), player), elos, self.kernel_cb.get(), self.smoothing_window.get())
+
+    def title_suffix(self):
+        if not self.smoothing_enabled.get():
+            return ""
+        return f" ({self.kernel_cb.get()} over {self.smoothing_window.get()} games)"
+
+    def draw_bands(self, ax, season_id, colors, by_date):
+        """
+        Shades each player's bootstrap confidence interval in their line colour. If the
+        intervals are still being computed the graph is redrawn once they are ready.
+        """
+        if self.pending_bands:
+            self.graph_tab.after_cancel(self.pending_bands)
+            self.pending_bands = None
+        if not self.show_bands.get() or not season_id:
+            return
+        future = bootstrap.request_intervals(season_id)
+        if not future.done():
+            self.pending_bands = self.graph_tab.after(BAND_POLL_MS, self.redraw_with_bands, future)
+            return
+        intervals = future.result()
+        if not intervals:
+            return
+        x = intervals.ts.astype('datetime64[ms]') if by_date else intervals.games
+        for player, color in colors.items():
+            code = intervals.codes.get(player)
+            if code is not None:
+                ax.fill_between(x, intervals.low[:, code], intervals.high[:, code], color=color, alpha=0.15, linewidth=0)
+
+    def redraw_with_bands(self, future):
+        self.pending_bands = None
+        if not future.done():
+            self.pending_bands = self.graph_tab.after(BAND_POLL_MS, self.redraw_with_bands, future)
+        elif self.show_bands.get():
+            self.plot_elo_graph()
+
     def refresh_season_selector(self):
         seasons = db.get_seasons()
         if not seasons:
             return
             
         self.season_map = {s['name']: s['id'] for s in seasons}
+        self.season_map[ALL_SEASONS] = 0
         season_names = list(self.season_map.keys())
         self.season_selector_cb['values'] = season_names
         
@@ -66,62 +152,33 @@ class GraphTab:
             self.graph_canvas.get_tk_widget().destroy()
 
         season_id = self.selected_season_id.get()
-        matches = db.get_matches_for_season(season_id)
-
-        if not matches:
+        if season_id == 0 or self.x_axis_cb.get() == "Date":
+            # The all-seasons view is only drawn against dates
+            self.plot_elo_by_date(season_id or None)
             return
+        matches = db.get_match_columns(season_id)
 
-        # Get all unique players in this season's matches (including doubles)
-        players_in_season = set()
-        for match in matches:
-            players_in_season.add(match['player1_name'])
-            players_in_season.add(match['player2_name'])
-            if match.get('doubles_match', 0):
-                if match.get('player1b_name'):
-                    players_in_season.add(match['player1b_name'])
-                if match.get('player2b_name'):
-                    players_in_season.add(match['player2b_name'])
-
-        # Build elo history timeline from matches (using new schema)
-        elo_data = {p: [db.INITIAL_ELO] for p in players_in_season}
-        for match in matches:
-            temp_elos = {p: elo_data[p][-1] if elo_data[p] else db.INITIAL_ELO for p in players_in_season}
-            if match.get('doubles_match', 0):
-                # Doubles match: update all four players
-                temp_elos[match['player1_name']] = match['player1_elo_after']
-                temp_elos[match['player2_name']] = match['player2_elo_after']
-                if match.get('player1b_name') and match.get('player1b_elo_after') is not None:
-                    temp_elos[match['player1b_name']] = match['player1b_elo_after']
-                if match.get('player2b_name') and match.get('player2b_elo_after') is not None:
-                    temp_elos[match['player2b_name']] = match['player2b_elo_after']
-            else:
-                # Singles match
-                if match.get('winner', -1) == 1:
-                    temp_elos[match['player1_name']] = match['player1_elo_after']
-                    temp_elos[match['player2_name']] = match['player2_elo_after']
-                elif match.get('winner', -1) == 2:
-                    temp_elos[match['player2_name']] = match['player2_elo_after']
-                    temp_elos[match['player1_name']] = match['player1_elo_after']
-            for p in players_in_season:
-                elo_data[p].append(temp_elos[p])
-
-        # Conditional Smoothing
-        elo_to_plot = elo_data
-        title_suffix = ""
-        if self.smoothing_enabled.get():
-            elo_df = pd.DataFrame(elo_data)
-            smoothed_elo_df = elo_df.rolling(window=SMOOTHING_WINDOW, min_periods=1).mean()
-            elo_to_plot = {player: smoothed_elo_df[player].tolist() for player in players_in_season}
-            title_suffix = f" (Smoothed over {SMOOTHING_WINDOW} games)"
+        if not len(matches):
+            return
 
         # --- Matplotlib Plotting ---
         fig = Figure(figsize=(8, 5), dpi=100)
         ax = fig.add_subplot(111)
 
-        for player, elos in elo_to_plot.items():
-            ax.plot(range(len(elos)), elos, label=player)
-
-        ax.set_title(f"Elo Ratings Over Time{title_suffix}")
+        # Every player (including doubles) is drawn across all the season's games, holding
+        # their rating through the games they sat out
+        steps = np.arange(len(matches) + 1)
+        colors = {}
+        for player, (ts, elos, season_ids, index) in elo_series(matches).items():
+            timeline = np.full(len(steps), np.nan)
+            timeline[0] = db.INITIAL_ELO
+            timeline[index + 1] = self.smoothed(season_id, player, elos)
+            last_played = np.maximum.accumulate(np.where(np.isnan(timeline), 0, steps))
+            line, = ax.plot(steps, timeline[last_played], label=player)
+            colors[player] = line.get_color()
+        self.draw_bands(ax, season_id, colors, by_date=False)
+
+        ax.set_title(f"Elo Ratings Over Time{self.title_suffix()}")
         ax.set_xlabel("Games Played in Season")
         ax.set_ylabel("Elo Rating")
         ax.grid(True)
@@ -131,3 +188,40 @@ class GraphTab:
         self.graph_canvas = FigureCanvasTkAgg(fig, master=self.graph_tab)
         self.graph_canvas.draw()
         self.graph_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def plot_elo_by_date(self, season_id):
+        matches = db.get_match_columns(season_id)
+        if not len(matches):
+            return
+
+        # About one point per horizontal pixel per player is all the screen can show
+        width = max(self.graph_tab.winfo_width(), 400)
+
+        fig = Figure(figsize=(8, 5), dpi=100)
+        ax = fig.add_subplot(111)
+        colors = {}
+        for player, (ts, elos, season_ids, index) in elo_series(matches).items():
+            # Each season starts from scratch, so a player's line is broken between seasons
+            starts = np.flatnonzero(np.diff(season_ids)) + 1
+            xs, ys = [], []
+            for seg_ts, seg_elos, seg_seasons in zip(np.split(ts, starts), np.split(elos, starts), np.split(season_ids, starts)):
+                seg_elos = self.smoothed(seg_seasons[0], player, seg_elos)
+                kept = lttb(seg_ts, seg_elos, max(3, width * len(seg_ts) // len(ts)))
+                xs += [seg_ts[kept], seg_ts[kept[-1:]]]
+                ys += [seg_elos[kept], [np.nan]]
+            line, = ax.plot(np.concatenate(xs).astype('datetime64[ms]'), np.concatenate(ys), label=player)
+            colors[player] = line.get_color()
+        # Bands are per season, so the all-seasons view has none
+        self.draw_bands(ax, season_id, colors, by_date=True)
+
+        ax.set_title(f"Elo Ratings Over Time{self.title_suffix()}")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Elo Rating")
+        ax.grid(True)
+        ax.legend(fontsize='small', ncol=max(1, len(ax.lines) // 15))
+        fig.autofmt_xdate()
+        fig.tight_layout()
+
+        self.graph_canvas = FigureCanvasTkAgg(fig, master=self.graph_tab)
+        self.graph_canvas.draw()
+        self.graph_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
@@ -0,0 +1,142 @@
+import itertools
+import sqlite3
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import database as db
+from stats import draw_elo_graph
+
+# Display-only mode for a screen next to the table (main.py --kiosk). The DB is opened
+# read-only and a ChangeWatcher is polled every few seconds; the screens are only rebuilt
+# after another process has committed, and then only when they are next shown, so an idle
+# kiosk does no database reads or drawing beyond the poll.
+#
+# The DB stays in rollback-journal mode (backups and restores copy the file, which WAL
+# would leave without its recent commits), so a kiosk read briefly holds a shared lock
+# that a recording device's commit has to wait for. Reads are short and every connection
+# waits up to db.BUSY_TIMEOUT for a lock, so this only delays a commit; but pointing a
+# kiosk at a DB file on a slow network drive can still make commits fail with "database
+# is locked".
+
+POLL_MS = 3000 # How often to check the DB for changes
+ROTATE_MS = 20000 # How long each screen is shown
+RECENT_MATCHES = 12
+KIOSK_FONT_SIZE = 26
+
+class KioskApp:
+    def __init__(self, root, screens=("leaderboard", "results", "graph")):
+        self.root = root
+        self.root.title("Pool Elo Tracker")
+        self.root.attributes('-fullscreen', True)
+        self.root.bind("<Escape>", lambda event: self.root.attributes('-fullscreen', False))
+        self.root.bind("<space>", lambda event: self.next_screen())
+
+        style = ttk.Style()
+        style.configure("Kiosk.Treeview", font=("TkDefaultFont", KIOSK_FONT_SIZE), rowheight=int(KIOSK_FONT_SIZE * 1.8))
+        style.configure("Kiosk.Treeview.Heading", font=("TkDefaultFont", KIOSK_FONT_SIZE // 2, "bold"))
+
+        self.title_label = ttk.Label(self.root, font=("TkDefaultFont", KIOSK_FONT_SIZE + 6, "bold"))
+        self.title_label.pack(pady=(15, 5))
+        self.footer_label = ttk.Label(self.root, font=("TkDefaultFont", KIOSK_FONT_SIZE // 2))
+        self.footer_label.pack(side=tk.BOTTOM, pady=10)
+        container = ttk.Frame(self.root)
+        container.pack(fill='both', expand=True, padx=20)
+
+        builders = {
+            "leaderboard": ("Leaderboard", self.build_leaderboard),
+            "results": ("Recent Results", self.build_results),
+            "graph": ("Elo Ratings", self.build_graph),
+        }
+        self.screens = [(name,) + builders[name] for name in screens]
+        self.frames = {}
+        for name, _, _ in self.screens:
+            self.frames[name] = ttk.Frame(container)
+            self.frames[name].place(relwidth=1, relheight=1)
+        self.dirty = set(self.frames) # Screens to rebuild before they are next shown
+        self.current = 0
+        self.season = None
+
+        self.watcher = db.ChangeWatcher()
+        self.poll()
+        self.show_screen()
+        self.root.after(ROTATE_MS, self.rotate)
+
+    def poll(self):
+        try:
+            if self.watcher.changed():
+                self.season = db.get_current_season()
+                self.dirty = set(self.frames)
+                self.show_screen()
+        except sqlite3.Error as e:
+            # e.g. the file is being replaced by a restore; try again next time
+            print(f"Kiosk poll failed: {e}")
+            self.watcher.close()
+        self.root.after(POLL_MS, self.poll)
+
+    def rotate(self):
+        self.next_screen()
+        self.root.after(ROTATE_MS, self.rotate)
+
+    def next_screen(self):
+        self.current = (self.current + 1) % len(self.screens)
+        self.show_screen()
+
+    def show_screen(self):
+        name, title, build = self.screens[self.current]
+        frame = self.frames[name]
+        if name in self.dirty:
+            for child in frame.winfo_children():
+                child.destroy()
+            build(frame)
+            self.dirty.discard(name)
+        frame.tkraise()
+        self.title_label.config(text=title)
+        self.footer_label.config(text=self.season['name'] if self.season else "No active season")
+
+    def build_leaderboard(self, frame):
+        columns = ("Rank", "Name", "Elo", "Wins", "Losses", "Streak")
+        tree = ttk.Treeview(frame, columns=columns, show="headings", style="Kiosk.Treeview")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, anchor='center', width=120)
+        tree.column("Name", anchor='w', width=400)
+        form = db.get_form_stats(self.season['id']) if self.season else {}
+        for rank, p in enumerate(db.get_leaderboard_players(), start=1):
+            f = form.get(p["name"])
+            streak = (f"W{f['streak']}" if f["streak"] > 0 else f"L{-f['streak']}") if f else ""
+            tree.insert('', 'end', values=(rank, p["name"], p["current_elo"], p["current_wins"], p["current_losses"], streak))
+        tree.pack(fill='both', expand=True)
+
+    def build_results(self, frame):
+        columns = ("When", "Winner", "Loser")
+        tree = ttk.Treeview(frame, columns=columns, show="headings", style="Kiosk.Treeview")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, anchor='w', width=400)
+        tree.column("When", anchor='center', width=250)
+        matches = itertools.islice(db.iter_matches(self.season['id'], newest_first=True), RECENT_MATCHES) if self.season else []
+        for m in matches:
+            team1 = [(m.player1_name, m.player1_elo_before, m.player1_elo_after), (m.player1b_name, m.player1b_elo_before, m.player1b_elo_after)]
+            team2 = [(m.player2_name, m.player2_elo_before, m.player2_elo_after), (m.player2b_name, m.player2b_elo_before, m.player2b_elo_after)]
+            winners, losers = (team1, team2) if m.winner == 1 else (team2, team1)
+            def team(players):
+                return " & ".join(
+                    f"{name} ({after - before:+d})" if None not in (before, after) else name
+                    for name, before, after in players if name
+                )
+            played = datetime.fromisoformat(m.date).strftime("%a %H:%M")
+            tree.insert('', 'end', values=(played, team(winners), team(losers)))
+        tree.pack(fill='both', expand=True)
+
+    def build_graph(self, frame):
+        matches = db.get_match_columns(self.season['id']) if self.season else []
+        if not len(matches):
+            ttk.Label(frame, text="No matches played this season.", font=("TkDefaultFont", KIOSK_FONT_SIZE)).pack(expand=True)
+            return
+        fig = Figure(figsize=(12, 7), dpi=100)
+        draw_elo_graph(fig, matches)
+        canvas = FigureCanvasTkAgg(fig, master=frame)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill='both', expand=True)
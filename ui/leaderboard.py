@@ -1,13 +1,28 @@
+import tkinter as tk
 from tkinter import ttk
 import database as db
+import bootstrap
+
+POLL_MS = 250 # How often to check for finished confidence intervals
+CI_COLUMN = f"Elo {bootstrap.CONFIDENCE:.0%} CI"
 
 class LeaderboardTab:
     def __init__(self, parent, app):
         self.app = app
+        self.pending_intervals = None
         self.leaderboard_tab = ttk.Frame(parent)
         parent.add(self.leaderboard_tab, text="Leaderboard")
+
+        self.all_venues = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.leaderboard_tab,
+            text="All Venues",
+            variable=self.all_venues,
+            command=self.refresh_leaderboard
+        ).pack(anchor='w', padx=5, pady=5)
     
-        columns = ("Name", "Played", "Elo", "Wins", "Losses")
+        columns = ("Name", "Venue", "Played", "Elo", "Wins", "Losses", "Streak", "Best/Worst Run",
+                   f"Last {db.FORM_GAMES} Win %", f"Last {db.FORM_GAMES} Elo", CI_COLUMN)
         self.leaderboard_tree = ttk.Treeview(self.leaderboard_tab, columns=columns, show="headings")
     
         for col in columns:
@@ -24,7 +39,49 @@ class LeaderboardTab:
         for row in self.leaderboard_tree.get_children():
             self.leaderboard_tree.delete(row)
         
-        players = db.get_leaderboard_players()
+        # Form stats and confidence intervals only cover the current venue's season
+        form = {}
+        current_season = None
+        if self.all_venues.get():
+            players = db.get_global_leaderboard()
+        else:
+            players = db.get_leaderboard_players()
+            current_season = db.get_current_season()
+            if current_season:
+                form = db.get_form_stats(current_season['id'])
+        venue = db.get_current_venue()
         for p in players:
             played = p["current_wins"] + p["current_losses"]
-            self.leaderboard_tree.insert('', 'end', values=(p["name"], played, p["current_elo"], p["current_wins"], p["current_losses"]))
+            values = (p["name"], p.get("venue", venue), played, p["current_elo"], p["current_wins"], p["current_losses"])
+            f = form.get(p["name"])
+            if f:
+                streak = f"W{f['streak']}" if f["streak"] > 0 else f"L{-f['streak']}"
+                runs = f"W{f['longest_win_streak']} / L{f['longest_loss_streak']}"
+                win_rate = f"{f['recent_wins'] / f['recent_games']:.0%}"
+                elo_delta = f"{f['recent_elo_delta']:+d}" if f["recent_elo_delta"] is not None else ""
+                values += (streak, runs, win_rate, elo_delta)
+            self.leaderboard_tree.insert('', 'end', values=values)
+
+        if self.pending_intervals:
+            self.leaderboard_tab.after_cancel(self.pending_intervals)
+            self.pending_intervals = None
+        if current_season:
+            # Bootstrapping takes a moment after each change, so it runs in the background
+            self.show_intervals(bootstrap.request_intervals(current_season['id']))
+
+    def show_intervals(self, future):
+        self.pending_intervals = None
+        if not future.done():
+            for row in self.leaderboard_tree.get_children():
+                self.leaderboard_tree.set(row, CI_COLUMN, "...")
+            self.pending_intervals = self.leaderboard_tab.after(POLL_MS, self.show_intervals, future)
+            return
+        try:
+            intervals = future.result()
+        except Exception as e:
+            print(f"Bootstrap failed: {e}")
+            intervals = None
+        for row in self.leaderboard_tree.get_children():
+            name = self.leaderboard_tree.set(row, "Name")
+            interval = intervals.final(name) if intervals else None
+            self.leaderboard_tree.set(row, CI_COLUMN, f"{interval[0]:.0f} - {interval[1]:.0f}" if interval else "")
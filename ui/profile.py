@@ -0,0 +1,80 @@
+import tkinter as tk
+from tkinter import ttk
+import numpy as np
+import database as db
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from stats import player_profile
+
+class ProfileTab:
+    def __init__(self, parent, app):
+        self.app = app
+        self.profile_canvas = None
+        self.profile_tab = ttk.Frame(parent)
+        parent.add(self.profile_tab, text="Player Profile")
+
+        control_frame = ttk.Frame(self.profile_tab)
+        control_frame.pack(fill='x', pady=5, padx=5)
+        ttk.Label(control_frame, text="Select Player:").pack(side=tk.LEFT, padx=(5,5))
+        self.player_selector_cb = ttk.Combobox(control_frame, state="readonly")
+        self.player_selector_cb.pack(side=tk.LEFT, padx=5)
+        self.player_selector_cb.bind("<<ComboboxSelected>>", self.show_profile)
+
+        self.summary_text = tk.Text(self.profile_tab, wrap="none", width=48, font=("Courier", 9))
+        self.summary_text.pack(side=tk.LEFT, fill='y', padx=5, pady=5)
+
+        self.graph_frame = ttk.Frame(self.profile_tab)
+        self.graph_frame.pack(side=tk.LEFT, fill='both', expand=True)
+
+    def refresh_profile(self):
+        self.player_selector_cb['values'] = db.get_all_player_names()
+        if self.player_selector_cb.get():
+            self.show_profile()
+
+    def show_profile(self, event=None):
+        name = self.player_selector_cb.get()
+        self.summary_text.delete(1.0, tk.END)
+        if self.profile_canvas:
+            self.profile_canvas.get_tk_widget().destroy()
+            self.profile_canvas = None
+
+        profile = player_profile(name)
+        if not profile:
+            self.summary_text.insert(tk.END, f"{name} hasn't played any games yet.")
+            return
+
+        lines = [f"{name}: {len(profile['timeline'])} lifetime games", ""]
+        lines.append(f"{'Season':<20} {'P':>4} {'W':>4} {'L':>4} {'Elo':>5} {'Peak':>5}")
+        for s in profile['seasons']:
+            lines.append(f"{s['name'][:20]:<20} {s['games']:>4} {s['wins']:>4} {s['losses']:>4} {s['final_elo']:>5} {s['peak_elo']:>5}")
+
+        def record_lines(title, records):
+            lines.extend(["", title])
+            if not records:
+                lines.append("  -")
+            for r in records:
+                lines.append(f"  {r['name']:<20} {r['wins']:>3}/{r['games']:<3} ({r['wins'] / r['games']:.0%})")
+
+        record_lines("Best against:", profile['best_opponents'])
+        record_lines("Worst against:", profile['worst_opponents'])
+        record_lines("Doubles partners:", profile['partners'])
+        self.summary_text.insert(tk.END, "\n".join(lines))
+
+        # Lifetime Elo curve, with a marker where each season starts
+        timeline = profile['timeline']
+        elos = np.array([r['elo_after'] if r['elo_after'] is not None else np.nan for r in timeline], dtype=float)
+        season_ids = np.array([r['season_id'] for r in timeline])
+        fig = Figure(figsize=(6, 4), dpi=100)
+        ax = fig.add_subplot(111)
+        ax.plot(np.arange(1, len(elos) + 1), elos)
+        for start in np.nonzero(np.diff(season_ids))[0] + 1:
+            ax.axvline(start + 0.5, color='grey', linestyle=':', linewidth=1)
+        ax.set_title(f"{name} - Lifetime Elo")
+        ax.set_xlabel("Lifetime Games")
+        ax.set_ylabel("Elo Rating")
+        ax.grid(True)
+        fig.tight_layout()
+
+        self.profile_canvas = FigureCanvasTkAgg(fig, master=self.graph_frame)
+        self.profile_canvas.draw()
+        self.profile_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
@@ -1,51 +1,90 @@
+import re
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
+from datetime import datetime
 import database as db
+from player_search import PlayerIndex
+# Elo logic lives in elo.py so the data layer can replay matches with the same rules
+from elo import DEFAULT_PARAMS, ExpectationMatrix
 
-# --- Constants ---
-K_FACTOR = 32
-K_NEW_PLAYER = 40
-GAMES_NEW_PLAYER = 10
+RESULT_SEPARATOR = re.compile(r"\s+def\.?\s+", re.IGNORECASE)
 
-# --- Core Elo Logic ---
-def expected_score(r1, r2):
-    return 1 / (1 + 10 ** ((r2 - r1) / 400))
+def parse_results(text):
+    """Parses 'winner def. loser' lines (teams joined with '&') into MatchResults."""
+    results = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        sides = RESULT_SEPARATOR.split(line)
+        if len(sides) != 2:
+            raise ValueError(f"Line {line_number}: expected \"winner def. loser\", got \"{line}\"")
+        winners, losers = ([name.strip() for name in side.split("&")] for side in sides)
+        if len(winners) != len(losers) or len(winners) > 2 or not all(winners + losers):
+            raise ValueError(f"Line {line_number}: teams must be one or two players each")
+        results.append(db.MatchResult(
+            winners[0], losers[0], 1,
+            winners[1] if len(winners) > 1 else None, losers[1] if len(losers) > 1 else None
+        ))
+    return results
 
-def update_elo(winner_elo, loser_elo, k):
-    expected_win = expected_score(winner_elo, loser_elo)
-    winner_elo_new = winner_elo + k * (1 - expected_win)
-    loser_elo_new = loser_elo + k * (0 - expected_score(loser_elo, winner_elo))
-    return round(winner_elo_new), round(loser_elo_new)
+def format_recorded(recorded):
+    """Summary of a match returned by db.record_results."""
+    lines = [f"{' & '.join(recorded['winners'])} def. {' & '.join(recorded['losers'])}"]
+    for name in recorded['winners'] + recorded['losers']:
+        before, after = recorded['elo'][name]
+        lines.append(f"{name}: {after} ({after - before:+d})")
+    lines.append(f"(K-factor used: {recorded['k']})")
+    return "\n".join(lines)
+
+def format_prediction(team1, team2, prediction):
+    """Win probabilities and the Elo change of every player for each outcome."""
+    names1, names2 = " & ".join(team1), " & ".join(team2)
+    verb = "win" if len(team1) > 1 else "wins"
+    lines = [f"{names1} {prediction['expected']:.0%} / {names2} {1 - prediction['expected']:.0%}   (K-factor: {prediction['k']})"]
+    for winners, outcome in ((names1, 'team1_wins'), (names2, 'team2_wins')):
+        changes = ", ".join(f"{name} {change:+d}" for name, change in prediction[outcome].items())
+        lines.append(f"If {winners} {verb}: {changes}")
+    return "\n".join(lines)
 
 class RecordTab:
     def __init__(self, parent, app):
         self.app = app
+        # Ratings for the live prediction, refreshed with the player selectors rather
+        # than read from the database on every selector change
+        self.expectations = ExpectationMatrix()
+        self.rating_params = DEFAULT_PARAMS
         self.record_tab = ttk.Frame(parent)
         parent.add(self.record_tab, text="Record Match")
         # Checkbox to toggle doubles mode
         self.doubles_var = tk.BooleanVar(value=False)
         self.doubles_check = ttk.Checkbutton(self.record_tab, text="Doubles Match", variable=self.doubles_var, command=self.toggle_doubles)
-        self.doubles_check.grid(row=0, column=0, columnspan=4, sticky="w", padx=5, pady=5)
+        self.doubles_check.grid(row=0, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        # Checkbox to include archived players in the player search
+        self.player_index = PlayerIndex()
+        self.show_archived_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.record_tab, text="Show Archived Players", variable=self.show_archived_var).grid(row=0, column=2, columnspan=2, sticky="w", padx=5, pady=5)
 
         # Player selectors (horizontal layout)
         ttk.Label(self.record_tab, text="Player 1:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
-        self.p1_cb = ttk.Combobox(self.record_tab, state="readonly")
+        self.p1_cb = self.create_player_selector()
         self.p1_cb.grid(row=1, column=1, padx=5, pady=5)
 
         self.p1b_l = ttk.Label(self.record_tab, text="Player 1b:")
         self.p1b_l.grid(row=1, column=2, padx=5, pady=5, sticky="e")
-        self.p1b_cb = ttk.Combobox(self.record_tab, state="readonly")
+        self.p1b_cb = self.create_player_selector()
         self.p1b_cb.grid(row=1, column=3, padx=5, pady=5)
         self.p1b_l.grid_remove()
         self.p1b_cb.grid_remove()
 
         ttk.Label(self.record_tab, text="Player 2:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
-        self.p2_cb = ttk.Combobox(self.record_tab, state="readonly")
+        self.p2_cb = self.create_player_selector()
         self.p2_cb.grid(row=2, column=1, padx=5, pady=5)
 
         self.p2b_l = ttk.Label(self.record_tab, text="Player 2b:")
         self.p2b_l.grid(row=2, column=2, padx=5, pady=5, sticky="e")
-        self.p2b_cb = ttk.Combobox(self.record_tab, state="readonly")
+        self.p2b_cb = self.create_player_selector()
         self.p2b_cb.grid(row=2, column=3, padx=5, pady=5)
         self.p2b_l.grid_remove()
         self.p2b_cb.grid_remove()
@@ -69,14 +108,54 @@ class RecordTab:
             else:
                 p1, p2 = self.p1_cb.get(), self.p2_cb.get()
                 self.winner_cb['values'] = [p1, p2] if p1 and p2 and p1 != p2 else []
+            self.update_prediction()
 
         self.p1_cb.bind("<<ComboboxSelected>>", update_winner_options)
         self.p2_cb.bind("<<ComboboxSelected>>", update_winner_options)
         self.p1b_cb.bind("<<ComboboxSelected>>", update_winner_options)
         self.p2b_cb.bind("<<ComboboxSelected>>", update_winner_options)
         self.doubles_var.trace_add('write', update_winner_options)
+        for cb in (self.p1_cb, self.p2_cb, self.p1b_cb, self.p2b_cb):
+            cb.bind("<KeyRelease>", update_winner_options, add="+")
+
+        ttk.Button(self.record_tab, text="Record Match", command=self.record_match).grid(row=4, column=0, columnspan=2, pady=10)
+        ttk.Button(self.record_tab, text="Bulk Entry", command=self.open_bulk_entry).grid(row=4, column=2, columnspan=2, pady=10)
+
+        self.prediction_label = ttk.Label(self.record_tab, text="", justify=tk.LEFT)
+        self.prediction_label.grid(row=5, column=0, columnspan=4, padx=5, pady=5, sticky="w")
+
+    def create_player_selector(self):
+        # Editable combobox that filters the player index as the user types.
+        # The dropdown list is only built when it is opened or the text changes.
+        cb = ttk.Combobox(self.record_tab)
+        cb.configure(postcommand=lambda: self.filter_player_choices(cb, opening=True))
+        cb.bind("<KeyRelease>", lambda event: self.filter_player_choices(cb))
+        return cb
+
+    def filter_player_choices(self, cb, opening=False):
+        text = cb.get()
+        if opening and text in self.player_index:
+            text = '' # A player is already picked, so offer the full list again
+        cb['values'] = self.player_index.search(text, include_archived=self.show_archived_var.get())
+
+    def selected_teams(self):
+        """Returns (team1, team2) name lists once both sides are complete, valid players, else None."""
+        team1, team2 = [self.p1_cb.get()], [self.p2_cb.get()]
+        if self.doubles_var.get():
+            team1.append(self.p1b_cb.get())
+            team2.append(self.p2b_cb.get())
+        names = team1 + team2
+        if len(set(names)) < len(names) or not all(name in self.expectations for name in names):
+            return None
+        return team1, team2
 
-        ttk.Button(self.record_tab, text="Record Match", command=self.record_match).grid(row=4, column=0, columnspan=4, pady=10)
+    def update_prediction(self):
+        teams = self.selected_teams()
+        if not teams:
+            self.prediction_label.config(text="")
+            return
+        prediction = self.expectations.predict(*teams, self.rating_params)
+        self.prediction_label.config(text=format_prediction(*teams, prediction))
 
     def toggle_doubles(self):
         if self.doubles_var.get():
@@ -120,141 +199,63 @@ class RecordTab:
                 messagebox.showerror("Invalid Input", "Select two different players and a valid winner.")
                 return
 
-        current_season = db.get_current_season()
-        if not current_season:
-            messagebox.showerror("Error", "No active season found. Please start a new season from the Admin tab.")
+        # Names can be typed, so make sure they are real players
+        player_names = [name for name in (p1_name, p1b_name, p2_name, p2b_name) if name]
+        unknown = [name for name in player_names if name not in self.player_index]
+        if unknown:
+            messagebox.showerror("Invalid Input", f"Unknown player: {unknown[0]}")
             return
 
-        p1 = db.get_player_by_name(p1_name)
-        p2 = db.get_player_by_name(p2_name)
-        p1b = db.get_player_by_name(p1b_name) if p1b_name else None
-        p2b = db.get_player_by_name(p2b_name) if p2b_name else None
-
-        if doubles:
-            # Determine winner team
-            if winner_name == f"{p1_name} & {p1b_name}":
-                winner_int = 1
-                winner_team = [p1, p1b]
-                loser_team = [p2, p2b]
-            else:
-                winner_int = 2
-                winner_team = [p2, p2b]
-                loser_team = [p1, p1b]
-
-            # Average team Elo
-            winner_avg_elo = sum([m['current_elo'] for m in winner_team]) / 2
-            loser_avg_elo = sum([m['current_elo'] for m in loser_team]) / 2
-
-            # Use max K-factor among all team members
-            k_winner = max([K_NEW_PLAYER if m['total_lifetime_games'] < GAMES_NEW_PLAYER else K_FACTOR for m in winner_team])
-            k_loser = max([K_NEW_PLAYER if m['total_lifetime_games'] < GAMES_NEW_PLAYER else K_FACTOR for m in loser_team])
-            k = max(k_winner, k_loser)
-
-            # Calculate new Elo for teams
-            winner_elo_new, loser_elo_new = update_elo(winner_avg_elo, loser_avg_elo, k)
-            winner_elo_diff = round(winner_elo_new - winner_avg_elo)
-            loser_elo_diff = round(loser_elo_new - loser_avg_elo)
-
-            # Apply Elo change to all team members
-            elo_changes = {}
-            for member in winner_team:
-                elo_changes[member['name']] = {
-                    'elo_before': member['current_elo'],
-                    'elo_after': member['current_elo'] + winner_elo_diff,
-                    'wins_after': member['current_wins'] + 1,
-                    'lifetime_games_after': member['total_lifetime_games'] + 1
-                }
-            for member in loser_team:
-                elo_changes[member['name']] = {
-                    'elo_before': member['current_elo'],
-                    'elo_after': member['current_elo'] + loser_elo_diff,
-                    'losses_after': member['current_losses'] + 1,
-                    'lifetime_games_after': member['total_lifetime_games'] + 1
-                }
-
-            # Record match in database
-            db.record_match(
-                current_season['id'],
-                p1_name, p2_name, winner_int, elo_changes,
-                doubles_match=True,
-                p1b_name=p1b_name, p2b_name=p2b_name,
-                p1b_elo_before=p1b['current_elo'] if p1b else None,
-                p1b_elo_after=elo_changes[p1b_name]['elo_after'] if p1b else None,
-                p2b_elo_before=p2b['current_elo'] if p2b else None,
-                p2b_elo_after=elo_changes[p2b_name]['elo_after'] if p2b else None
-            )
-
-            # Show summary
-            summary = (
-                f"{winner_name} def. {team2 if winner_int == 1 else team1}\n"
-                f"{winner_team[0]['name']}: {elo_changes[winner_team[0]['name']]['elo_after']} (+{winner_elo_diff})\n"
-                f"{winner_team[1]['name']}: {elo_changes[winner_team[1]['name']]['elo_after']} (+{winner_elo_diff})\n"
-                f"{loser_team[0]['name']}: {elo_changes[loser_team[0]['name']]['elo_after']} ({loser_elo_diff})\n"
-                f"{loser_team[1]['name']}: {elo_changes[loser_team[1]['name']]['elo_after']} ({loser_elo_diff})\n"
-                f"(K-factor used: {k})"
-            )
-            messagebox.showinfo("Match Recorded", summary)
-        else:
-            # Singles logic (unchanged)
-            # Determine winner integer for new schema
-            if winner_name == p1_name:
-                winner_int = 1
-                winner = p1
-                loser = p2
-                loser_name = p2_name
-            else:
-                winner_int = 2
-                winner = p2
-                loser = p1
-                loser_name = p1_name
+        # Ratings are read and updated inside the write transaction
+        winner_int = 1 if winner_name in (p1_name, f"{p1_name} & {p1b_name}") else 2
+        try:
+            recorded, = db.record_results([db.MatchResult(p1_name, p2_name, winner_int, p1b_name, p2b_name)])
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        messagebox.showinfo("Match Recorded", format_recorded(recorded))
 
-            k_winner = K_NEW_PLAYER if winner['total_lifetime_games'] < GAMES_NEW_PLAYER else K_FACTOR
-            k_loser = K_NEW_PLAYER if loser['total_lifetime_games'] < GAMES_NEW_PLAYER else K_FACTOR
-            k = max(k_winner, k_loser)
-            
-            # Calculate new Elo
-            winner_elo_new, loser_elo_new = update_elo(winner['current_elo'], loser['current_elo'], k)
+        # Players who just played move to the top of the search results
+        self.player_index.touch(player_names, datetime.now().isoformat())
 
-            # Prepare data bundle for database
-            elo_changes = {
-                winner['name']: {
-                    'elo_before': winner['current_elo'], 'elo_after': winner_elo_new,
-                    'wins_after': winner['current_wins'] + 1,
-                    'lifetime_games_after': winner['total_lifetime_games'] + 1
-                },
-                loser['name']: {
-                    'elo_before': loser['current_elo'], 'elo_after': loser_elo_new,
-                    'losses_after': loser['current_losses'] + 1,
-                    'lifetime_games_after': loser['total_lifetime_games'] + 1
-                }
-            }
+        # Reset form and refresh UI
+        self.app.refresh_all_views()
 
-            # Record match in database
-            db.record_match(current_season['id'], p1_name, p2_name, winner_int, elo_changes)
+    def open_bulk_entry(self):
+        # Enter a whole night's results at once, one "winner def. loser" line per match
+        window = tk.Toplevel(self.record_tab)
+        window.title("Bulk Entry")
+        ttk.Label(window, text="One match per line, oldest first, e.g. \"Sam def. Alex\" or \"Sam & Jo def. Alex & Kim\"").pack(padx=5, pady=5)
+        text = tk.Text(window, width=60, height=20)
+        text.pack(fill='both', expand=True, padx=5)
 
-            # Show summary
-            winner_elo_diff = winner_elo_new - winner['current_elo']
-            loser_elo_diff = loser_elo_new - loser['current_elo']
-            loser_name = p2_name if winner_name == p1_name else p1_name
-            summary = (
-                f"{winner_name} def. {loser_name}\n"
-                f"{winner_name}: {winner_elo_new} (+{winner_elo_diff})\n"
-                f"{loser_name}: {loser_elo_new} ({loser_elo_diff})\n"
-                f"(K-factor used: {k})"
-            )
-            messagebox.showinfo("Match Recorded", summary)
+        def record_all():
+            try:
+                results = parse_results(text.get("1.0", tk.END))
+                recorded = db.record_results(results)
+            except ValueError as e:
+                messagebox.showerror("Invalid Input", str(e), parent=window)
+                return
+            lines = [format_recorded(r).split("\n")[0] for r in recorded]
+            messagebox.showinfo("Matches Recorded", f"{len(recorded)} match(es) recorded:\n" + "\n".join(lines[:20]) + ("\n..." if len(lines) > 20 else ""))
+            window.destroy()
+            self.player_index.touch({name for r in recorded for name in r['elo']}, datetime.now().isoformat())
+            self.app.refresh_all_views()
 
-        # Reset form and refresh UI
-        self.app.refresh_all_views()
+        ttk.Button(window, text="Record All", command=record_all).pack(pady=5)
 
     def refresh_player_selectors(self):
-        player_names = db.get_all_player_names()
-        self.p1_cb['values'] = player_names
-        self.p2_cb['values'] = player_names
-        self.p1b_cb['values'] = player_names
-        self.p2b_cb['values'] = player_names
+        # The player index is only reloaded when players are added, archived or deleted
+        version = db.get_player_list_version()
+        if version != self.player_index.version:
+            self.player_index.load(db.get_player_activity(), version)
+        # Only the players whose rating changed are recomputed in the expectation matrix
+        self.expectations.update(db.get_player_ratings())
+        current_season = db.get_current_season()
+        self.rating_params = db.get_season_rating_params(current_season['id']) if current_season else DEFAULT_PARAMS
         self.p1_cb.set('')
         self.p2_cb.set('')
         self.winner_cb.set('')
         self.p1b_cb.set('')
-        self.p2b_cb.set('')
\ No newline at end of file
+        self.p2b_cb.set('')
+        self.update_prediction()
@@ -0,0 +1,182 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import database as db
+import tournament as tm
+
+class TournamentTab:
+    def __init__(self, parent, app):
+        self.app = app
+        self.tournaments = []
+        self.matches = {}
+        self.pending = {} # Tournament match id -> winner (1 or 2), waiting to be recorded
+        self.tournament_tab = ttk.Frame(parent)
+        parent.add(self.tournament_tab, text="Tournaments")
+
+        control_frame = ttk.Frame(self.tournament_tab)
+        control_frame.pack(fill='x', pady=5, padx=5)
+        ttk.Label(control_frame, text="Tournament:").pack(side=tk.LEFT, padx=(5,5))
+        self.tournament_cb = ttk.Combobox(control_frame, state="readonly", width=40)
+        self.tournament_cb.pack(side=tk.LEFT, padx=5)
+        self.tournament_cb.bind("<<ComboboxSelected>>", lambda event: self.show_tournament())
+        ttk.Button(control_frame, text="New Tournament", command=self.open_new_tournament).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = ttk.Label(self.tournament_tab, text="")
+        self.status_label.pack(fill='x', padx=10)
+
+        # One row per match, grouped under a row per round
+        tree_frame = ttk.Frame(self.tournament_tab)
+        tree_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        columns = ("player1", "player2", "winner")
+        self.tree = ttk.Treeview(tree_frame, columns=columns)
+        self.tree.heading("#0", text="Match")
+        self.tree.heading("player1", text="Player 1")
+        self.tree.heading("player2", text="Player 2")
+        self.tree.heading("winner", text="Winner")
+        self.tree.column("#0", width=160)
+        self.tree.tag_configure('ready', foreground='#4caf50')
+        self.tree.tag_configure('pending', foreground='#ff9800')
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill='both', expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill='y')
+
+        button_frame = ttk.Frame(self.tournament_tab)
+        button_frame.pack(fill='x', pady=5, padx=5)
+        ttk.Button(button_frame, text="Player 1 Won", command=lambda: self.set_winner(1)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Player 2 Won", command=lambda: self.set_winner(2)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Clear", command=lambda: self.set_winner(None)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Record Results", command=self.record_results).pack(side=tk.RIGHT, padx=5)
+
+    def refresh_tournaments(self):
+        selected = self.selected_tournament()
+        self.tournaments = tm.get_tournaments()
+        self.tournament_cb['values'] = [
+            f"{t['name']} ({tm.FORMATS[t['format']]}, {t['season_name']})" for t in self.tournaments
+        ]
+        ids = [t['id'] for t in self.tournaments]
+        if selected and selected['id'] in ids:
+            self.tournament_cb.current(ids.index(selected['id']))
+        elif self.tournaments:
+            self.tournament_cb.current(0)
+        self.show_tournament()
+
+    def selected_tournament(self):
+        index = self.tournament_cb.current()
+        return self.tournaments[index] if 0 <= index < len(self.tournaments) else None
+
+    def show_tournament(self):
+        self.tree.delete(*self.tree.get_children())
+        tournament = self.selected_tournament()
+        if not tournament:
+            self.matches = {}
+            self.pending = {}
+            self.status_label.config(text="No tournaments yet.")
+            return
+
+        matches = tm.get_tournament_matches(tournament['id'])
+        self.matches = {m['id']: m for m in matches}
+        self.pending = {match_id: w for match_id, w in self.pending.items() if match_id in self.matches and tm.is_ready(self.matches[match_id])}
+
+        # Build every row in one pass; byes are left out as there is nothing to play
+        rounds = {}
+        for m in matches:
+            if m['player1_name'] == tm.BYE or m['player2_name'] == tm.BYE:
+                continue
+            key = (m['bracket'], m['round'])
+            if key not in rounds:
+                title = tm.BRACKET_NAMES[m['bracket']] if m['bracket'] == 'F' else f"{tm.BRACKET_NAMES[m['bracket']]} Round {m['round']}"
+                rounds[key] = self.tree.insert("", tk.END, text=title, open=True)
+            self.tree.insert(rounds[key], tk.END, iid=str(m['id']), text=f"Match {m['slot']}",
+                             values=self.match_values(m), tags=self.match_tags(m))
+
+        winner = tm.champion(tournament, matches)
+        if winner:
+            status = f"Finished - won by {winner}"
+        else:
+            ready = sum(1 for m in matches if tm.is_ready(m))
+            status = f"{ready} match(es) ready to play"
+        if tournament['format'] == 'round_robin':
+            table = ", ".join(f"{name} {w}-{l}" for name, w, l in tm.standings(matches))
+            status += f"   |   {table}"
+        self.status_label.config(text=status)
+
+    def match_values(self, m):
+        names = [m['player1_name'] or "TBD", m['player2_name'] or "TBD"]
+        if m['winner'] is not None:
+            winner = names[m['winner'] - 1]
+        elif m['id'] in self.pending:
+            winner = f"{names[self.pending[m['id']] - 1]} (not recorded)"
+        else:
+            winner = ""
+        return (names[0], names[1], winner)
+
+    def match_tags(self, m):
+        if m['id'] in self.pending:
+            return ('pending',)
+        return ('ready',) if tm.is_ready(m) else ()
+
+    def set_winner(self, winner):
+        for iid in self.tree.selection():
+            m = self.matches.get(int(iid)) if iid.isdigit() else None
+            if not m or not tm.is_ready(m):
+                continue
+            if winner:
+                self.pending[m['id']] = winner
+            else:
+                self.pending.pop(m['id'], None)
+            self.tree.item(iid, values=self.match_values(m), tags=self.match_tags(m))
+
+    def record_results(self):
+        tournament = self.selected_tournament()
+        if not tournament or not self.pending:
+            messagebox.showerror("Error", "Select matches and set their winners first.")
+            return
+        try:
+            recorded = tm.record_round(tournament['id'], self.pending)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.pending = {}
+        messagebox.showinfo("Results Recorded", f"{len(recorded)} match(es) recorded.")
+        self.app.refresh_all_views()
+
+    def open_new_tournament(self):
+        window = tk.Toplevel(self.tournament_tab)
+        window.title("New Tournament")
+
+        ttk.Label(window, text="Name:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        name_entry = ttk.Entry(window, width=30)
+        name_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+
+        ttk.Label(window, text="Format:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        formats = list(tm.FORMATS)
+        format_cb = ttk.Combobox(window, state="readonly", values=[tm.FORMATS[f] for f in formats])
+        format_cb.current(0)
+        format_cb.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+
+        ttk.Label(window, text="Players (seeded by Elo):").grid(row=2, column=0, padx=5, pady=5, sticky="ne")
+        players_list = tk.Listbox(window, selectmode=tk.EXTENDED, height=15, exportselection=False)
+        players_list.grid(row=2, column=1, padx=5, pady=5, sticky="nsew")
+        names = db.get_all_player_names()
+        for name in names:
+            players_list.insert(tk.END, name)
+
+        def create():
+            name = name_entry.get().strip()
+            if not name:
+                messagebox.showerror("Invalid Input", "Enter a tournament name.", parent=window)
+                return
+            selected = [names[i] for i in players_list.curselection()]
+            try:
+                tournament_id = tm.create_tournament(name, formats[format_cb.current()], selected)
+            except ValueError as e:
+                messagebox.showerror("Invalid Input", str(e), parent=window)
+                return
+            window.destroy()
+            self.refresh_tournaments()
+            ids = [t['id'] for t in self.tournaments]
+            if tournament_id in ids:
+                self.tournament_cb.current(ids.index(tournament_id))
+                self.show_tournament()
+
+        ttk.Button(window, text="Create", command=create).grid(row=3, column=0, columnspan=2, pady=10)